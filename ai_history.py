@@ -0,0 +1,266 @@
+"""Measured AI queries per day from exported chat histories, in place of the guesses.
+
+Usage: python ai_history.py FILE [FILE ...] [--since-days 365]
+
+FILE is a ChatGPT export (``conversations.json`` or the whole export zip), a Claude
+export (``conversations.json``) or a JSONL file with one conversation or one message per
+line. Only the user's own prompts are counted.
+
+The file is read as a stream of JSON values, optionally wrapped in one top-level array,
+and decoded one conversation at a time, so memory stays flat however large the export.
+Each prompt goes to the first task in ``TASK_KEYWORDS`` with a keyword in its opening
+(or closing) lines, and to ``DEFAULT_TASK`` when nothing matches. Counts are averaged
+per work day over the last ``since_days``, like the email counts in ``mail_scan.py``.
+The keywords are English only and are a heuristic.
+"""
+import argparse
+import codecs
+import json
+import string
+import sys
+import zipfile
+from datetime import datetime
+
+import numpy as np
+
+import engine
+from engine import AI_TASKS
+
+# Checked in this order; the first task with a keyword in the prompt wins. Keywords with a
+# space are phrases, matched on whole words after punctuation is dropped
+TASK_KEYWORDS = [
+    ("Explain code step-by-step", ["explain this code", "explain the code", "explain my code", "explain this function",
+                                   "explain this script", "explain the following code", "what does this code",
+                                   "what does this function", "how does this code", "walk me through this code",
+                                   "line by line"]),
+    ("Generate images", ["dall e", "dalle", "midjourney", "image of", "picture of", "draw a", "draw an", "an image",
+                         "a logo", "an illustration", "a poster", "an icon"]),
+    ("Analyze long PDF documents", ["pdf", "attached paper", "attached document", "attached file", "attached report",
+                                    "uploaded file", "uploaded document"]),
+    ("Summarize texts or articles", ["summarize", "summarise", "summary", "summarizing", "summarising", "tldr",
+                                     "tl dr", "key points", "main points", "synopsis", "condense"]),
+    ("Translate sentences or texts", ["translate", "translation", "translating", "into english", "into italian",
+                                      "into french", "into spanish", "into german", "into chinese", "into portuguese",
+                                      "in english", "in italian", "in french", "in spanish", "in german"]),
+    ("Generate quizzes or questions", ["quiz", "quizzes", "multiple choice", "exam questions", "test questions",
+                                       "flashcards", "flashcard", "practice questions", "questions about"]),
+    ("Prepare lessons or presentations", ["lesson", "lessons", "lecture", "lectures", "slides", "slide",
+                                          "presentation", "syllabus", "powerpoint", "curriculum", "course outline"]),
+    ("Brainstorm for thesis or projects", ["brainstorm", "brainstorming", "ideas for", "idea for", "thesis",
+                                           "research question", "research questions", "research topic",
+                                           "project ideas"]),
+    ("Correct grammar or style", ["grammar", "proofread", "typo", "typos", "rephrase", "reword", "paraphrase",
+                                  "polish", "improve the writing", "improve my writing", "improve the style",
+                                  "improve the wording", "correct this text", "correct the spelling"]),
+    ("Write formal emails or messages", ["email", "e mail", "cover letter", "letter to", "message to my",
+                                         "message to the", "reply to"]),
+    ("Write or test code", ["python", "javascript", "typescript", "sql", "java", "c++", "regex", "script", "code",
+                            "function", "debug", "traceback", "compile", "compiler", "unit test", "unit tests"]),
+    ("Explain a concept", ["explain", "what is", "what are", "why do", "why does", "why is", "how do", "how does",
+                           "define", "definition", "difference between", "meaning of"]),
+]
+DEFAULT_TASK = "Explain a concept"
+CODE_MARKERS = ("```", "def ", "#include", "traceback (most recent call last)")  # in the raw text
+HEAD_CHARS, TAIL_CHARS = 1000, 300  # instructions sit before or after any pasted text
+
+_TASK_CODES = [AI_TASKS.index(task) for task, _ in TASK_KEYWORDS]
+_WORDS = [frozenset(k for k in keywords if " " not in k) for _, keywords in TASK_KEYWORDS]
+_PHRASES = []  # per task: first word -> phrases starting with it, so most phrases are never searched for
+for _, keywords in TASK_KEYWORDS:
+    _PHRASES.append({})
+    for k in keywords:
+        if " " in k:
+            _PHRASES[-1].setdefault(k.split()[0], []).append(f" {k} ")
+_CODE = [task for task, _ in TASK_KEYWORDS].index("Write or test code")
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation if c not in "+#"})
+
+READ_CHARS = 1 << 20
+USER_ROLES = {"user", "human"}
+CHATGPT_PROMPTS = {"text", "multimodal_text"}  # not custom instructions and other context
+
+
+# --- CLASSIFICATION ---
+def classify(text):
+    """Index into ``AI_TASKS`` of one prompt, or -1 when no keyword matches."""
+    if len(text) > HEAD_CHARS + TAIL_CHARS:
+        text = text[:HEAD_CHARS] + "\n" + text[-TAIL_CHARS:]
+    text = text.lower()
+    tokens = text.translate(_PUNCTUATION).split()
+    words = set(tokens)
+    padded = None
+    for i, (keywords, phrases) in enumerate(zip(_WORDS, _PHRASES)):
+        if not keywords.isdisjoint(words):
+            return _TASK_CODES[i]
+        for first in phrases.keys() & words:
+            padded = padded or f" {' '.join(tokens)} "
+            if any(phrase in padded for phrase in phrases[first]):
+                return _TASK_CODES[i]
+        if i == _CODE and any(marker in text for marker in CODE_MARKERS):
+            return _TASK_CODES[i]
+    return -1
+
+
+# --- PARSING ---
+def json_values(f):
+    """Decode a text stream holding JSON values (e.g. JSONL) or one array of them, one value at a time."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof, in_array = "", 0, False, None
+    want = READ_CHARS
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf) or (not eof and len(buf) - pos < 64):
+            if eof:
+                if in_array:
+                    raise ValueError("Export ends inside its top-level array")
+                return
+            chunk = f.read(want)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        if in_array is None:
+            in_array = buf[pos] == "["
+            pos += in_array
+            continue
+        if in_array and buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Export is not valid JSON or JSONL") from None
+            # Value continues past the buffer: read more, growing the read so large values stay linear
+            chunk = f.read(max(want, len(buf) - pos))
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        pos = end
+        yield value
+
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict):
+        return _text(content.get("parts", content.get("text", "")))
+    if isinstance(content, list):
+        return "\n".join(_text(part) for part in content if isinstance(part, (str, dict)))
+    return ""
+
+
+def _timestamp(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value / 1000 if value > 1e11 else value  # milliseconds
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def _when(item, fallback=None):
+    for key in ("create_time", "created_at", "timestamp", "time"):
+        ts = _timestamp(item.get(key))
+        if ts is not None:
+            return ts
+    return fallback
+
+
+def prompts(value):
+    """``(timestamp or None, text)`` of each user prompt in one exported conversation or message."""
+    if not isinstance(value, dict):
+        return
+    if value.get("role") in USER_ROLES:  # one message per line
+        yield _when(value), _text(value.get("content"))
+        return
+    start = _when(value)
+    if isinstance(value.get("mapping"), dict):  # ChatGPT
+        for node in value["mapping"].values():
+            message = node.get("message") if isinstance(node, dict) else None
+            if not isinstance(message, dict) or (message.get("author") or {}).get("role") != "user":
+                continue
+            content = message.get("content")
+            if not isinstance(content, dict) or content.get("content_type", "text") in CHATGPT_PROMPTS:
+                yield _when(message, start), _text(content)
+    elif isinstance(value.get("chat_messages"), list):  # Claude
+        for message in value["chat_messages"]:
+            if isinstance(message, dict) and message.get("sender") == "human":
+                yield _when(message, start), _text(message.get("text") or message.get("content"))
+    elif isinstance(value.get("messages"), list):
+        for message in value["messages"]:
+            if isinstance(message, dict) and message.get("role") in USER_ROLES:
+                yield _when(message, start), _text(message.get("content"))
+
+
+def tally(f, counts=None):
+    """Add the prompts of a binary or text stream to ``counts``: {day number: per-task counts}."""
+    if counts is None:
+        counts = {}
+    if not hasattr(f, "encoding"):
+        f = codecs.getreader("utf-8-sig")(f)
+    for value in json_values(f):
+        for ts, text in prompts(value):
+            day = int(ts // 86400) if ts is not None else -1
+            row = counts.get(day)
+            if row is None:
+                row = counts[day] = np.zeros(len(AI_TASKS) + 1, dtype=np.int64)
+            row[classify(text)] += 1  # -1 is the unmatched column
+    return counts
+
+
+def tally_file(source, counts=None):
+    """``tally`` of an export (a path or binary file), or of ``conversations.json`` inside an export zip."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = [name for name in archive.namelist() if name.rsplit("/", 1)[-1] == "conversations.json"]
+            if not names:
+                raise ValueError("No conversations.json in the export zip")
+            with archive.open(names[0]) as f:
+                return tally(f, counts)
+    if hasattr(source, "read"):
+        source.seek(0)
+        return tally(source, counts)
+    with open(source, "rb") as f:
+        return tally(f, counts)
+
+
+# --- SUMMARY ---
+def summarize(counts, since_days=365):
+    """Queries per work day for each of ``AI_TASKS`` over the last ``since_days``."""
+    dated = sorted(day for day in counts if day >= 0)
+    if not dated:
+        raise ValueError("No dated prompts found")
+    last = dated[-1]
+    recent = [day for day in dated if day > last - since_days]
+    span = last - recent[0] + 1
+    work_days = max(span / 365.25 * engine.DAYS, 1.0)
+    totals = np.sum([counts[day] for day in recent], axis=0)
+    matched = totals[:-1].copy()
+    matched[AI_TASKS.index(DEFAULT_TASK)] += totals[-1]
+    return {
+        "prompts": int(totals.sum()),
+        "unmatched": int(totals[-1]),
+        "undated": int(counts[-1].sum()) if -1 in counts else 0,
+        "days": span,
+        "per_day": {task: float(n / work_days) for task, n in zip(AI_TASKS, matched)}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--since-days", type=int, default=365, help="only count the last N days of prompts")
+    args = parser.parse_args(argv)
+    try:
+        counts = {}
+        for path in args.paths:
+            tally_file(path, counts)
+        summary = summarize(counts, args.since_days)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
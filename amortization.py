@@ -0,0 +1,150 @@
+"""Multi-year projection of a device fleet and the replacement schedule that minimises it.
+
+The Devices section charges each device a flat ``impact / adj_years`` per year. Here the
+same numbers are laid out year by year: a device is bought, kept for its lifespan, disposed
+of with its end-of-life option and replaced like-for-like. As in the flat model, used and
+shared devices carry 1/1.5, 1/3 or 1/4.5 of the embodied impact per owner.
+
+Totals over a horizon use straight-line amortization: every year in service is charged
+``embodied * (1 + eol_modifier) / life``, so a device still in use when the horizon ends
+is charged only for the years it served, and with no use phase the yearly average equals
+the flat model. The optional use phase (electricity) is ``use_kg`` per device and year,
+growing by ``ageing`` per year of age; without it keeping a device longer is always
+better, since a cycle costs the same whatever its length.
+"""
+import numpy as np
+
+import engine
+
+COMPONENTS = ["Production", "End-of-life", "Use"]
+
+
+def embodied_share(fleet):
+    """Embodied kg CO₂e each owner is charged per device bought."""
+    return engine.DEVICE_EF[fleet.device] / engine.LIFESPAN_MULT[fleet.used, fleet.shared]
+
+
+def _ages(fleet, age):
+    return np.zeros(len(fleet), dtype=np.intp) if age is None else np.broadcast_to(np.asarray(age, dtype=np.intp), (len(fleet),))
+
+
+def _use_table(ageing, n):
+    # cum[a] = sum of (1 + ageing) ** i for i < a: use-phase kg per kg/year of a new device
+    return np.concatenate([[0.0], np.cumsum((1.0 + ageing) ** np.arange(n))])
+
+
+def timeline(fleet, horizon=20, age=None, use_kg=0.0, ageing=0.0, amortize=True, per_device=False):
+    """Year-by-year kg CO₂e of the fleet replaced like-for-like at the end of each planned lifespan.
+
+    ``age`` is how many whole years each device has already served (default: all bought at
+    the start of year 0). With ``amortize=False`` embodied emissions are booked in the year a
+    device is bought and end-of-life credits/penalties in the year it is disposed of.
+    Returns one array per ``COMPONENTS`` entry, of shape ``(horizon,)`` summed over the fleet
+    or ``(len(fleet), horizon)`` with ``per_device``.
+    """
+    embodied = embodied_share(fleet)[:, None]
+    years = fleet.years[:, None]
+    eol = (embodied * engine.EOL_MOD[fleet.eol][:, None])
+    age = _ages(fleet, age)[:, None]
+    t = np.arange(horizon)[None, :]
+
+    if amortize:
+        production = np.broadcast_to(embodied / years, (len(fleet), horizon))
+        end_of_life = np.broadcast_to(eol / years, (len(fleet), horizon))
+    else:
+        # Device j is bought at j * years - age; count those falling in [t, t + 1)
+        bought = np.ceil((t + 1 + age) / years) - np.ceil((t + age) / years)
+        disposed = bought - ((t == 0) & (age == 0))  # the first purchase disposes of nothing
+        production = embodied * bought
+        end_of_life = eol * disposed
+    use_age = np.floor((t + age) % years).astype(np.intp)
+    use = np.asarray(use_kg, dtype=float).reshape(-1, 1) * (1.0 + ageing) ** use_age * np.ones((len(fleet), 1))
+
+    parts = dict(zip(COMPONENTS, (production, end_of_life, use)))
+    if per_device:
+        return {name: np.array(values) for name, values in parts.items()}
+    return {name: values.sum(axis=0) for name, values in parts.items()}
+
+
+def _best_eol(eol_allowed, n):
+    """Lowest allowed modifier and its option code for disposing of a device aged 0..n-1."""
+    allowed = np.ones(len(engine.EOL_MOD), dtype=bool) if eol_allowed is None else np.asarray(eol_allowed, dtype=bool)
+    allowed = np.atleast_2d(allowed)
+    allowed = allowed[np.minimum(np.arange(n), len(allowed) - 1)]
+    if not allowed.any(axis=1).all():
+        raise ValueError("eol_allowed leaves no end-of-life option for some ages")
+    masked = np.where(allowed, engine.EOL_MOD, np.inf)
+    code = masked.argmin(axis=1)
+    return masked[np.arange(n), code], code
+
+
+def optimize(fleet, horizon=20, max_age=10, age=None, use_kg=0.0, ageing=0.0, eol_allowed=None):
+    """Minimum-emission replacement schedule over ``horizon`` years, by dynamic programming.
+
+    Each device may be kept up to ``max_age`` years. ``eol_allowed`` restricts the
+    end-of-life options: a boolean mask over ``EOL_OPTIONS``, or one row per device age
+    (the last row applies to older devices), e.g. to rule out selling old machines. An
+    end-of-life choice only affects the cycle it ends, so the recursion takes the best
+    allowed option for each disposal age and optimises over replacement years.
+
+    Devices with the same embodied share, age and use phase share one solution. Returns
+    ``replace`` (a new device is bought at the start of that year), ``eol`` (option code
+    of the device disposed of then, -1 otherwise), and ``total`` and ``planned``: kg CO₂e
+    over the horizon for the optimal schedule and for the planned lifespans.
+    """
+    n, K, H = len(fleet), int(max_age), int(horizon)
+    ages = _ages(fleet, age)
+    use = np.broadcast_to(np.asarray(use_kg, dtype=float), (n,))
+    params, inverse = np.unique(np.column_stack([embodied_share(fleet), ages, use]), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    embodied, group_age, group_use = params[:, 0:1], params[:, 1].astype(np.intp), params[:, 2:3]
+    G = len(params)
+
+    r_best, code_best = _best_eol(eol_allowed, max(K, int(ages.max(initial=0))) + 1)
+    cum = _use_table(ageing, int(ages.max(initial=0)) + K + H + 1)
+
+    # cost[t]: kg from year t to the horizon when a new device is bought at the start of year t
+    cost = np.zeros((G, H + 1))
+    keep = np.zeros((G, H), dtype=np.intp)
+    ks = np.arange(1, K + 1)
+    for t in range(H - 1, -1, -1):
+        covered = np.minimum(ks, H - t)
+        candidates = (embodied * (1 + r_best[ks]) * covered / ks + group_use * cum[covered]
+                      + cost[:, np.minimum(t + ks, H)])
+        best = candidates.argmin(axis=1)
+        keep[:, t] = ks[best]
+        cost[:, t] = candidates[np.arange(G), best]
+
+    # The device in service now: keep it k more years (k = 0 replaces it immediately)
+    ks0 = np.arange(0, K + 1)[None, :]
+    life = group_age[:, None] + ks0
+    covered = np.minimum(ks0, H)
+    valid = np.where(ks0 == 0, group_age[:, None] > 0, life <= K)
+    first = (embodied * (1 + r_best[np.minimum(life, len(r_best) - 1)]) * covered / np.maximum(life, 1)
+             + group_use * (cum[group_age[:, None] + covered] - cum[group_age[:, None]])
+             + cost[:, np.minimum(ks0[0], H)])
+    first = np.where(valid, first, np.inf)
+    kept = first.argmin(axis=1)
+    total = first[np.arange(G), kept]
+
+    # Walk the chosen cycles forward, all groups at once
+    replace = np.zeros((G, H), dtype=bool)
+    eol = np.full((G, H), -1, dtype=np.int8)
+    rows = np.arange(G)
+    pos, life = kept, group_age + kept
+    while True:
+        active = pos < H
+        if not active.any():
+            break
+        replace[rows[active], pos[active]] = True
+        eol[rows[active], pos[active]] = code_best[np.minimum(life[active], len(code_best) - 1)]
+        life = np.where(active, keep[rows, np.minimum(pos, H - 1)], 0)
+        pos = np.where(active, pos + life, H)
+
+    planned = timeline(fleet, H, ages, use, ageing, per_device=True)
+    return {
+        "replace": replace[inverse],
+        "eol": eol[inverse],
+        "total": total[inverse],
+        "planned": sum(planned.values()).sum(axis=1)
+    }
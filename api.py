@@ -0,0 +1,380 @@
+"""JSON scoring API for LMS integration, on plain asyncio (no web framework).
+
+Usage: python api.py [--host 127.0.0.1] [--port 8650]
+
+``POST /score`` takes one submission or a list of up to ``MAX_BATCH`` of them::
+
+    {"role": "Student",
+     "activities": {"Web browsing": 2, ...},          hours/day, keys of activity_factors[role]
+     "email_plain": "11–20", "email_attach": "1–10",   bucket labels or measured counts/day
+     "cloud": "<5GB",                                  bucket label or measured GB
+     "wifi": 4, "pages": 2,                            hours/day and pages/day, default 0
+     "idle": "I turn it off",
+     "ai": {"Explain a concept": 3, ...},              queries/day
+     "devices": [{"device": "Laptop Computer", "years": 4, "used": "New",
+                  "shared": "Personal", "eol": "I sell or donate it to someone else"}]}
+
+and answers with, per submission, the yearly kg CO₂e of each category, the total, the
+category the tips focus on, the everyday equivalences of the total and the version of the
+emission factors it was scored with (see factors.py). A list body gets
+a list back in the same order. Invalid submissions fail the whole request with 422 and
+one error per offending index. ``GET /schema`` lists every accepted key, option and numeric range,
+``GET /health`` is for load balancers.
+
+Submissions from all connections that arrive in the same event-loop pass are scored as
+one batch, so under load the numpy cost is paid once per pass instead of per request.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+import engine
+import factors
+from engine import CATEGORIES
+
+HOST = os.environ.get("CF50_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("CF50_API_PORT", 8650))
+MAX_BATCH = 1000
+MAX_BODY = 1 << 20
+IDLE_TIMEOUT = 30  # seconds a keep-alive connection may wait between requests
+
+ROLE_CODE = {role: i for i, role in enumerate(engine.ROLES)}
+DEVICE_CODE = {device: i for i, device in enumerate(engine.DEVICES)}
+EOL_CODE = {eol: i for i, eol in enumerate(engine.EOL_OPTIONS)}
+IDLE_CODE = {idle: i for i, idle in enumerate(engine.idle_options)}
+EMAIL_CODE = {bucket: i for i, bucket in enumerate(engine.EMAIL_BUCKETS)}
+CLOUD_CODE = {bucket: i for i, bucket in enumerate(engine.CLOUD_BUCKETS)}
+USED_CODE = {used: i for i, used in enumerate(engine.used_options)}
+SHARED_CODE = {shared: i for i, shared in enumerate(engine.shared_options)}
+FIELDS = {"role", "activities", "email_plain", "email_attach", "cloud", "wifi", "pages", "idle", "ai", "devices"}
+DEVICE_FIELDS = {"device", "years", "used", "shared", "eol"}
+# (low, high) of each numeric answer. The form's bounds, except hours per day: its sliders
+# stop at 8, the API takes up to a whole day
+RANGES = {
+    "hours": (0.0, 24.0),
+    "queries": (0.0, 100.0),
+    "pages": (0.0, 100.0),
+    "years": (0.5, 20.0),
+    "emails": (0.0, 10000.0),
+    "cloud_gb": (0.0, 100000.0)
+}
+
+SCHEMA = {
+    "activities": {role: list(acts) for role, acts in engine.activity_factors.items()},
+    "email_plain": engine.EMAIL_BUCKETS,
+    "email_attach": engine.EMAIL_BUCKETS,
+    "cloud": engine.CLOUD_BUCKETS,
+    "idle": engine.idle_options,
+    "ai": engine.AI_TASKS,
+    "devices": {"device": engine.DEVICES, "used": engine.used_options, "shared": engine.shared_options,
+                "eol": engine.EOL_OPTIONS},
+    "categories": CATEGORIES,
+    "equivalences": list(engine.EQUIVALENCE_KG),
+    "ranges": RANGES,
+    "max_batch": MAX_BATCH
+}
+BUCKETS = {"email_plain": (EMAIL_CODE, "EMAIL_COUNT"), "email_attach": (EMAIL_CODE, "EMAIL_COUNT"),
+           "cloud": (CLOUD_CODE, "CLOUD_COUNT")}
+
+
+# --- VALIDATION ---
+def _number(value, name, kind, whole=False):
+    # The range is checked first: it compares ints of any size exactly and fails NaN, while
+    # float() of a 400-digit int would overflow
+    low, high = RANGES[kind]
+    if (isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high
+            or not math.isfinite(value)):
+        raise ValueError(f"{name} must be a number between {low:g} and {high:g}")
+    if whole and not float(value).is_integer():
+        raise ValueError(f"{name} must be a whole number between {low:g} and {high:g}")
+    return float(value)
+
+
+def _option(value, name, codes):
+    try:
+        return codes[value]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown {name} {value!r}, expected one of {list(codes)}") from None
+
+
+def _bucket(value, name, codes):
+    # Like the engine: bucket labels map to their midpoint, numbers are measured amounts.
+    # Labels stay labels until scoring, which prices them with the factor version in use
+    if isinstance(value, str):
+        if value not in codes:
+            raise ValueError(f"Unknown {name} {value!r}, expected one of {list(codes)} or a number")
+        return value
+    return _number(value, name, "cloud_gb" if name == "cloud" else "emails")
+
+
+def _mapping(value, name):
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} must be an object")
+    return value
+
+
+def parse_submission(obj):
+    """Validate one submission; returns it with options replaced by their engine codes."""
+    obj = _mapping(obj, "Submission")
+    unknown = obj.keys() - FIELDS
+    if unknown:
+        raise ValueError(f"Unknown field(s) {sorted(unknown)}")
+    if "role" not in obj:
+        raise ValueError("Missing role")
+    role = _option(obj["role"], "role", ROLE_CODE)
+    allowed = engine.activity_factors[obj["role"]]
+
+    activities = {}
+    for act, hours in _mapping(obj.get("activities", {}), "activities").items():
+        if act not in allowed:
+            raise ValueError(f"Unknown activity {act!r} for {obj['role']}, expected one of {list(allowed)}")
+        activities[act] = _number(hours, act, "hours")
+    ai = {}
+    for task, queries in _mapping(obj.get("ai", {}), "ai").items():
+        if task not in engine.ai_factors:
+            raise ValueError(f"Unknown AI task {task!r}, expected one of {engine.AI_TASKS}")
+        ai[task] = _number(queries, task, "queries")
+
+    devices = obj.get("devices", [])
+    if not isinstance(devices, list):
+        raise ValueError("devices must be a list")
+    parsed_devices = []
+    for i, d in enumerate(devices):
+        d = _mapping(d, f"devices[{i}]")
+        unknown = d.keys() - DEVICE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown field(s) {sorted(unknown)} in devices[{i}]")
+        if "device" not in d or "years" not in d or "eol" not in d:
+            raise ValueError(f"devices[{i}] needs device, years and eol")
+        years = _number(d["years"], f"devices[{i}].years", "years")
+        parsed_devices.append((_option(d["device"], "device", DEVICE_CODE), years,
+                               _option(d.get("used", engine.used_options[0]), "used", USED_CODE),
+                               _option(d.get("shared", engine.shared_options[0]), "shared", SHARED_CODE),
+                               _option(d["eol"], "end-of-life option", EOL_CODE)))
+
+    for key in ("email_plain", "email_attach", "cloud", "idle"):
+        if key not in obj:
+            raise ValueError(f"Missing {key}")
+    return {
+        "role": role,
+        "activities": activities,
+        "email_plain": _bucket(obj["email_plain"], "email_plain", EMAIL_CODE),
+        "email_attach": _bucket(obj["email_attach"], "email_attach", EMAIL_CODE),
+        "cloud": _bucket(obj["cloud"], "cloud", CLOUD_CODE),
+        "wifi": _number(obj.get("wifi", 0), "wifi", "hours"),
+        "pages": _number(obj.get("pages", 0), "pages", "pages", whole=True),
+        "idle": _option(obj["idle"], "idle", IDLE_CODE),
+        "ai": ai,
+        "devices": parsed_devices
+    }
+
+
+# --- SCORING ---
+def score_submissions(subs, factor_set=None):
+    """Score parsed submissions as one columnar batch; one response dict per submission.
+
+    ``factor_set`` defaults to the active version.
+    """
+    f = factor_set or factors.active()
+    respondents = {key: np.array([s[key] for s in subs]) for key in ("role", "wifi", "pages", "idle")}
+    for key, (codes, counts) in BUCKETS.items():
+        counts = getattr(f, counts)
+        respondents[key] = np.array([counts[codes[v]] if isinstance(v, str) else v for v in (s[key] for s in subs)])
+    for group, names in (("activities", engine.ACTIVITIES), ("ai", engine.AI_TASKS)):
+        for name in names:
+            if any(name in s[group] for s in subs):
+                respondents[name] = np.array([s[group].get(name, 0.0) for s in subs])
+
+    rows = [(i, *d) for i, s in enumerate(subs) for d in s["devices"]]
+    devices = None
+    if rows:
+        columns = np.array(rows, dtype=float).T
+        devices = {"respondent": columns[0].astype(np.intp), "device": columns[1].astype(np.intp),
+                   "years": columns[2], "used": columns[3].astype(np.intp),
+                   "shared": columns[4].astype(np.intp), "eol": columns[5].astype(np.intp)}
+
+    res = engine.score(respondents, devices, f)
+    total = sum(res[cat] for cat in CATEGORIES)
+    per_cat = [res[cat].tolist() for cat in CATEGORIES]
+    tips = engine.most_impact_category(res).tolist()
+    equiv = {name: values.tolist() for name, values in engine.equivalences(total, f).items()}
+    total = total.tolist()
+    return [{
+        "results": {cat: values[i] for cat, values in zip(CATEGORIES, per_cat)},
+        "total": total[i],
+        "tips_category": tips[i],
+        "equivalences": {name: values[i] for name, values in equiv.items()},
+        "factors": f.version
+    } for i in range(len(subs))]
+
+
+class Batcher:
+    """Collects the submissions of every request that arrives in one event-loop pass and
+    scores them together on the next one."""
+
+    def __init__(self):
+        self.pending = []
+        self.scheduled = False
+
+    def score(self, subs):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((subs, future))
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+        return future
+
+    def _flush(self):
+        pending, self.pending, self.scheduled = self.pending, [], False
+        try:
+            scored = score_submissions([sub for subs, _ in pending for sub in subs], factors.poll())
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        start = 0
+        for subs, future in pending:
+            if not future.done():
+                future.set_result(scored[start:start + len(subs)])
+            start += len(subs)
+
+
+# --- HTTP ---
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error"}
+ROUTES = {"/score": "POST", "/schema": "GET", "/health": "GET"}
+HEALTH_BODY = b'{"status":"ok"}'
+
+
+@lru_cache(maxsize=16)
+def schema_body(version):
+    return json.dumps({**SCHEMA, "factors": version}, ensure_ascii=False).encode()
+
+
+def _response(status, body, keep_alive, extra=""):
+    if not keep_alive:
+        extra += "Connection: close\r\n"
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n{extra}\r\n")
+    return head.encode("latin-1") + body
+
+
+def _error(message):
+    return json.dumps({"error": message}).encode()
+
+
+async def _score(body, batcher):
+    try:
+        payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        return 400, _error(f"Body is not valid JSON: {e}")
+    batched = isinstance(payload, list)
+    items = payload if batched else [payload]
+    if not items or len(items) > MAX_BATCH:
+        return 400, _error(f"Send between 1 and {MAX_BATCH} submissions")
+    subs, errors = [], []
+    for i, item in enumerate(items):
+        try:
+            subs.append(parse_submission(item))
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+    if errors:
+        return 422, json.dumps({"errors": errors}, ensure_ascii=False).encode()
+    scored = await batcher.score(subs)
+    return 200, json.dumps(scored if batched else scored[0], ensure_ascii=False).encode()
+
+
+async def handle(reader, writer, batcher):
+    try:
+        while True:
+            try:
+                async with asyncio.timeout(IDLE_TIMEOUT):
+                    head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError, TimeoutError):
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(_response(431, _error("Headers too large"), False))
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ")
+            except ValueError:
+                writer.write(_response(400, _error("Malformed request line"), False))
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+            if "transfer-encoding" in headers:
+                writer.write(_response(411, _error("Send a Content-Length, chunked bodies aren't supported"), False))
+                break
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MAX_BODY:
+                writer.write(_response(413, _error(f"Body must be at most {MAX_BODY} bytes"), False))
+                break
+            body = await reader.readexactly(length)
+
+            path = target.split("?", 1)[0]
+            extra = ""
+            if path not in ROUTES:
+                status, payload = 404, _error(f"Unknown path, expected one of {list(ROUTES)}")
+            elif method != ROUTES[path]:
+                status, payload, extra = 405, _error(f"Use {ROUTES[path]} {path}"), f"Allow: {ROUTES[path]}\r\n"
+            elif path == "/score":
+                try:
+                    status, payload = await _score(body, batcher)
+                except Exception:
+                    status, payload = 500, _error("Scoring failed")
+            else:
+                status, payload = 200, schema_body(factors.poll().version) if path == "/schema" else HEALTH_BODY
+
+            writer.write(_response(status, payload, keep_alive, extra))
+            if writer.transport.get_write_buffer_size() > 1 << 16:
+                await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=HOST, port=PORT, ready=None):
+    batcher = Batcher()
+    server = await asyncio.start_server(lambda r, w: handle(r, w, batcher), host, port, backlog=1024)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+
+    def ready(server):
+        print(f"Scoring API listening on http://{args.host}:{server.sockets[0].getsockname()[1]}", flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,57 @@
 import streamlit as st
-import pandas as pd
-import random
-import plotly.express as px
-import time
+import functools
+import hashlib
+import os
+import queue
+import secrets
+from concurrent.futures import wait
+import factors
+from engine import (activity_factors, ai_factors, device_ef, eol_modifier, emails, cloud_gb,
+                    idle_options, CATEGORIES)
+from ledger import Ledger, HABITS, device_term, activity_term, habits_term, ai_term
+from uncertainty import bands_one
+from peers import PeerStore
+from reports import FORMATS, ReportPool, request as report_request
+import metrics
+from charts import breakdown_svg, breakdown_figure
+from cards import PLOT_KEYS, PLOT_LABELS, results_key, results_cards
+from share import encode as encode_share, results_from_token
+from session_store import SessionSync, backend_from_url, browser_secret
 
 st.set_page_config(page_title="Digital Carbon Footprint Calculator", layout="wide")
 
+
+@st.cache_resource
+def session_backend():
+    # One store connection per process, shared by every session
+    return backend_from_url()
+
+
+# --- SESSIONE ---
+# The session id lives in the URL, so whichever worker serves the next connection
+# can restore the session from the shared store. Only the browser that created it can:
+# someone given a copied address bar starts a session of their own
+sid = st.query_params.get("sid")
+secret = browser_secret(st.context.cookies)
+sync = SessionSync(session_backend(), sid, st.session_state, secret) if sid else None
+if sync is None or not sync.owned():
+    sid = secrets.token_urlsafe(12)
+    st.query_params["sid"] = sid
+    sync = SessionSync(session_backend(), sid, st.session_state, secret)
+    sync.owned()
+sync.load_page()
+
+
+def flush_after(func):
+    # Fragment reruns skip the end of the script, so they write their own changes back
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sync.flush()
+    return wrapper
+
 # Init session state
 if "page" not in st.session_state or st.session_state.page not in ["intro", "main", "results"]:
     st.session_state.page = "intro"
@@ -15,136 +61,83 @@ if "device_inputs" not in st.session_state:
     st.session_state.device_inputs = {}
 if "results" not in st.session_state:
     st.session_state.results = {}
-activity_factors = {
-    "Student": {
-        "MS Office (e.g. Excel, Word, PPT…)": 0.00901,
-        "Technical softwares (e.g. Matlab, Python…)": 0.00901,
-        "Web browsing": 0.0264,
-        "Watching lecture recordings": 0.0439,
-        "Online classes streaming or video call": 0.112,
-        "Reading study materials on your computer (e.g. slides, articles, digital textbooks)": 0.00901
-    },
-    "Professor": {
-        "MS Office (e.g. Excel, Word, PPT…)": 0.00901,
-        "Web browsing": 0.0264,
-        "Videocall (e.g. Zoom, Teams…)": 0.112,
-        "Online classes streaming": 0.112,
-        "Reading materials on your computer (e.g. slides, articles, digital textbooks)": 0.00901,
-        "Technical softwares (e.g. Matlab, Python…)": 0.00901
-    },
-    "Staff Member": {
-        "MS Office (e.g. Excel, Word, PPT…)": 0.00901,
-        "Management software (e.g. SAP)": 0.00901,
-        "Web browsing": 0.0264,
-        "Videocall (e.g. Zoom, Teams…)": 0.112,
-        "Reading materials on your computer (e.g. documents)": 0.00901
-    }
-}
-
-ai_factors = {
-    "Summarize texts or articles": 0.000711936,
-    "Translate sentences or texts": 0.000363008,
-    "Explain a concept": 0.000310784,
-    "Generate quizzes or questions": 0.000539136,
-    "Write formal emails or messages": 0.000107776,
-    "Correct grammar or style": 0.000107776,
-    "Analyze long PDF documents": 0.001412608,
-    "Write or test code": 0.002337024,
-    "Generate images": 0.00206,
-    "Brainstorm for thesis or projects": 0.000310784,
-    "Explain code step-by-step": 0.003542528,
-    "Prepare lessons or presentations": 0.000539136
-}
-
-device_ef = {
-    "Desktop Computer": 296,
-    "Laptop Computer": 170,
-    "Smartphone": 38.4,
-    "Tablet": 87.1,
-    "External Monitor": 235,
-    "Headphones": 12.17,
-    "Printer": 62.3,
-    "Router/Modem": 106
-}
-
-eol_modifier = {
-    "I bring it to a certified e-waste collection center": -0.224,
-    "I throw it away in general waste": 0.611,
-    "I return it to manufacturer for recycling or reuse": -0.3665,
-    "I sell or donate it to someone else": -0.445,
-    "I store it at home, unused": 0.402
-}
-
-DAYS = 250  # Typical number of work/study days per year
+if "sections" not in st.session_state:
+    st.session_state.sections = {}
+if "ledger" not in st.session_state:
+    st.session_state.ledger = Ledger(st.session_state)
+
+# --- FATTORI ---
+# A newly published factor version is picked up without a restart: the open form is
+# repriced with it, and each result keeps the version it was scored with
+factor_set = factors.poll()
+st.session_state.ledger.reprice(factor_set)
+
+# --- LINK CONDIVISO ---
+# A results URL carries every input, so a new session (or one evicted while idle)
+# rebuilds the results page from the URL alone
+share_param = st.query_params.get("r")
+if share_param and st.session_state.get("share_token") != share_param:
+    try:
+        st.session_state.inputs, st.session_state.results = results_from_token(share_param, factor_set)
+        st.session_state.factor_version = factor_set.version
+        st.session_state.role = st.session_state.inputs["role"]
+        st.session_state.pop("peer_rank", None)
+        st.session_state.page = "results"
+    except ValueError:
+        del st.query_params["r"]
+    st.session_state.share_token = share_param
 
-def show_main():
-    # --- STILE GLOBALE ---
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600&display=swap');
+MIN_PEERS = 10  # don't show a ranking against too few peers
+MAX_SHARE_LENGTH = 2000  # large fleets don't fit in a URL
+REPORT_WAIT_SECONDS = 2.0  # how long the results page waits for its report before offering a refresh
+STYLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "style.css")
 
-        html, body, [class*="css"] {
-            font-family: 'Inter', sans-serif;
-        }
 
-        h1, h2, h3, h4 {
-            color: #1d3557;
-        }
+@st.cache_resource
+def stylesheet():
+    # One small tag per rerun instead of the whole stylesheet: the file itself is served
+    # from static/, and the content hash in the URL lets browsers cache it across deploys
+    with open(STYLE_PATH, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:12]
+    return f"<style>@import url('app/static/style.css?v={version}');</style>"
 
-        .device-box {
-            background-color: #f1faee;
-            border-left: 6px solid #52b788;
-            padding: 20px;
-            border-radius: 12px;
-            margin-bottom: 20px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.05);
-        }
+# Each form section is a fragment: a widget change reruns only its own section. Widget
+# callbacks update just the ledger term that widget feeds (see ledger.py), so sections
+# read their subtotals instead of recomputing them.
+def input_changed(key):
+    st.session_state.ledger.changed(key)
 
-        .device-label {
-            font-weight: 600;
-            font-size: 0.95em;
-            margin-bottom: 4px;
-            color: #1d3557;
-        }
 
-        .device-hint {
-            font-size: 12px;
-            color: gray;
-        }
+def habits_changed():
+    # The habits term reads other widgets now; it is tracked again on the next run
+    st.session_state.ledger.untrack("habits")
 
-        .impact-text {
-            font-size: 1em;
-            color: #1b4332;
-            font-weight: 600;
-        }
-        </style>
-    """, unsafe_allow_html=True)
 
-    # --- TITOLO ---
-    st.markdown("""
-        <div style="background: linear-gradient(to right, #d8f3dc, #a8dadc);
-                    padding: 30px 20px;
-                    border-radius: 15px;
-                    text-align: center;
-                    box-shadow: 0 4px 18px rgba(0,0,0,0.06);
-                    margin-bottom: 30px;">
-            <h1 style="font-size: 2.4em;">☁️ Digital Usage Form</h1>
-        </div>
-    """, unsafe_allow_html=True)
+def device_changed(device_id, field):
+    st.session_state.device_inputs[device_id][field] = st.session_state[f"{device_id}_{field}"]
+    input_changed(f"{device_id}_{field}")
 
-    # === DEVICES ===
-    st.header("💻 Devices")
-    st.markdown("""
-Choose the digital devices you currently use, and for each one, provide a few details about how you use it and what you do when it's no longer needed.
-""")
 
+def live_total(section, label):
+    ledger = st.session_state.ledger
+    delta = ledger.take_delta(section)
+    delta = f"{delta:+.2f} kg" if delta is not None and abs(delta) >= 0.005 else None
+    col1, col2 = st.columns(2)
+    col1.metric(label, f"{sum(ledger.sections.get(section, {}).values()):.2f} kg CO₂e/year", delta, delta_color="inverse")
+    col2.metric("Running total", f"{ledger.total():.2f} kg CO₂e/year", delta, delta_color="inverse")
+
+@st.fragment
+@metrics.fragment("devices")
+@flush_after
+def devices_section():
     if "device_list" not in st.session_state:
         st.session_state.device_list = []
 
     device_to_add = st.selectbox("Select a device and click 'Add Device', repeat for all the devices you own", list(device_ef.keys()))
     if st.button("➕ Add Device"):
-        count = sum(d.startswith(device_to_add) for d in st.session_state.device_list)
-        new_id = f"{device_to_add}_{count}"
+        # Monotonic counter: ids stay unique after removals without scanning the list
+        st.session_state.device_seq = st.session_state.get("device_seq", 0) + 1
+        new_id = f"{device_to_add}_{st.session_state.device_seq}"
         st.session_state.device_list.append(new_id)
         st.session_state.device_inputs[new_id] = {
             "years": 1.0,
@@ -154,216 +147,478 @@ Choose the digital devices you currently use, and for each one, provide a few de
         }
         st.success(f"{device_to_add} added successfully!")
 
-    total_prod, total_eol = 0, 0
-
-    for device_id in st.session_state.device_list:
-        base_device = device_id.rsplit("_", 1)[0]
-        st.subheader(base_device)
-
-        prev = st.session_state.device_inputs[device_id]
-        col1, col2, col3, col4 = st.columns(4)
-
-        with col1:
-            st.markdown("**Device's lifespan**<br/><span class='device-hint'>How many years you plan to use the device in total</span>", unsafe_allow_html=True)
-            years = st.number_input("", 0.5, 20.0, step=0.5, format="%.1f", key=f"{device_id}_years")
+    ledger = st.session_state.ledger
+    with metrics.stage("devices"):
+        devices = []
+
+        for device_id in st.session_state.device_list:
+            base_device = device_id.rsplit("_", 1)[0]
+            st.subheader(base_device)
+
+            prev = st.session_state.device_inputs[device_id]
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.markdown("**Device's lifespan**<br/><span class='device-hint'>How many years you plan to use the device in total</span>", unsafe_allow_html=True)
+                years = st.number_input("", 0.5, 20.0, step=0.5, format="%.1f", key=f"{device_id}_years",
+                                        on_change=device_changed, args=(device_id, "years"))
+
+            with col2:
+                st.markdown("**Condition**<br/><span class='device-hint'>Was the device new or used when you got it?</span>", unsafe_allow_html=True)
+                used = st.selectbox("", ["New", "Used"], index=["New", "Used"].index(prev["used"]), key=f"{device_id}_used",
+                                    on_change=device_changed, args=(device_id, "used"))
+
+            with col3:
+                st.markdown("**Ownership**<br/><span class='device-hint'>Is this device used only by you or shared?</span>", unsafe_allow_html=True)
+                shared = st.selectbox("", ["Personal", "Shared"], index=["Personal", "Shared"].index(prev["shared"]), key=f"{device_id}_shared",
+                                      on_change=device_changed, args=(device_id, "shared"))
+
+            with col4:
+                st.markdown("**End-of-life behavior**<br/><span class='device-hint'>What do you usually do when the device reaches its end of life?</span>", unsafe_allow_html=True)
+                eol = st.selectbox("", list(eol_modifier.keys()), index=list(eol_modifier.keys()).index(prev["eol"]), key=f"{device_id}_eol",
+                                   on_change=device_changed, args=(device_id, "eol"))
+
+            if st.button(f"🗑 Remove {base_device}", key=f"remove_{device_id}"):
+                st.session_state.device_list.remove(device_id)
+                st.session_state.device_inputs.pop(device_id, None)
+                ledger.untrack(device_id)
+                st.rerun(scope="fragment")
+
+            devices.append({"device": base_device, "years": years, "used": used, "shared": shared, "eol": eol})
+            # Computed once when the device is added, then only by its widgets' callbacks
+            impact = ledger.track("devices", device_id, [f"{device_id}_{field}" for field in ["years", "used", "shared", "eol"]],
+                                  device_term(base_device))
+            st.markdown(f"<div class='impact-text'>📊 <strong>Production</strong>: {impact['Devices']:.2f} kg CO₂e/year &nbsp;&nbsp;&nbsp; <strong>End-of-life</strong>: {impact['E-Waste']:.2f} kg CO₂e/year</div>", unsafe_allow_html=True)
+
+    if devices and st.toggle("💡 Best options", key="best_options",
+                             help="Compare every condition, ownership and end-of-life choice for your devices"):
+        best_options_view(st.session_state.device_list, devices)
+
+    fleet = None
+    if st.toggle("🏢 Department fleet mode", key="fleet_mode",
+                 help="Import a CSV inventory of many devices instead of adding them one by one"):
+        fleet = fleet_editor()
+        if fleet is not None:
+            fleet_totals = fleet.totals(ledger.factors)
+            st.markdown(f"<div class='impact-text'>🏢 <strong>Fleet of {len(fleet)} devices</strong> — "
+                        f"<strong>Production</strong>: {fleet_totals['Devices']:.2f} kg CO₂e/year &nbsp;&nbsp;&nbsp; "
+                        f"<strong>End-of-life</strong>: {fleet_totals['E-Waste']:.2f} kg CO₂e/year</div>", unsafe_allow_html=True)
+            ledger.set("devices", "fleet", fleet_totals)
+            if st.toggle("📅 Plan replacements", key="fleet_plan",
+                         help="Project the fleet year by year and find the replacement schedule with the lowest emissions"):
+                replacement_planner(fleet)
+
+    if fleet is None:
+        ledger.untrack("fleet")
+
+    live_total("devices", "Devices subtotal")
+    st.session_state.sections["devices"] = {"inputs": devices, "fleet": fleet}
+
+
+FREE_CHOICES = {"Condition": "used", "Ownership": "shared", "End-of-life behavior": "eol"}
+
+def best_options_view(device_ids, devices):
+    import pandas as pd
+    from whatif import EXTRA_YEARS, best_options
+
+    free = st.multiselect("Choices you could change", list(FREE_CHOICES), default=list(FREE_CHOICES), key="best_free")
+    # All 2 x 2 x 5 combinations and lifespans for every device at once
+    best = best_options(*([d[k] for d in devices] for k in ["device", "years", "used", "shared", "eol"]),
+                        free=[FREE_CHOICES[label] for label in free])
+
+    saving = best["saving"][:, 0]
+    top = int(saving.argmax())
+    if saving[top] > 0.005:
+        changes = [option for option, current in zip(
+            (["New", "Used"][best["used"][top, 0]], ["Personal", "Shared"][best["shared"][top, 0]],
+             list(eol_modifier)[best["eol"][top, 0]]),
+            (devices[top]["used"], devices[top]["shared"], devices[top]["eol"])) if option != current]
+        st.markdown(f"<div class='impact-text'>💡 <strong>Largest reduction: {device_ids[top].replace('_', ' ')}</strong> — "
+                    f"{'; '.join(changes)}: <strong>−{saving[top]:.2f} kg CO₂e/year</strong> "
+                    f"({saving[top] / best['current'][top]:.0%} of its impact). All devices together: "
+                    f"{best['current'].sum():.2f} → {best['best'][:, 0].sum():.2f} kg CO₂e/year</div>", unsafe_allow_html=True)
+    else:
+        st.markdown("<div class='impact-text'>💡 Your devices already use the lowest-impact choices you could change.</div>",
+                    unsafe_allow_html=True)
+
+    table = pd.DataFrame({
+        "Now (kg CO₂e/year)": best["current"],
+        "Best (kg CO₂e/year)": best["best"][:, 0],
+        "Saving": saving,
+        "Condition": pd.Categorical.from_codes(best["used"][:, 0], ["New", "Used"]),
+        "Ownership": pd.Categorical.from_codes(best["shared"][:, 0], ["Personal", "Shared"]),
+        "End-of-life behavior": pd.Categorical.from_codes(best["eol"][:, 0], list(eol_modifier)),
+        **{f"Best, kept {extra:g} more year{'s' if extra > 1 else ''}": best["best"][:, k]
+           for k, extra in enumerate(EXTRA_YEARS) if extra}
+    }, index=pd.Index([device_id.replace("_", " ") for device_id in device_ids], name="Device"))
+    st.dataframe(table.sort_values("Saving", ascending=False), use_container_width=True,
+                 column_config={column: st.column_config.NumberColumn(format="%.2f")
+                                for column in table.columns if table[column].dtype.kind == "f"})
+
+
+FLEET_PAGE_SIZE = 50
+
+def fleet_editor():
+    # Fleet mode needs pandas; imported here so the regular form never loads it
+    from fleet import Fleet, IMPACT_COLUMNS
+
+    upload = st.file_uploader("Upload a CSV with columns device, years, used, shared, eol (optional: quantity)",
+                              type="csv", key="fleet_csv")
+    if upload is not None and st.session_state.get("fleet_file") != upload.file_id:
+        try:
+            st.session_state.fleet = Fleet.from_csv(upload)
+            st.session_state.fleet_file = upload.file_id
+        except ValueError as e:
+            st.error(f"Could not import the inventory: {e}")
+
+    fleet = st.session_state.get("fleet")
+    if fleet is None or not len(fleet):
+        return None
+
+    # Impacts for the whole fleet in one vectorized pass, only the current page is rendered
+    impacts = fleet.impacts()
+    n_pages = -(-len(fleet) // FLEET_PAGE_SIZE)
+    page = st.number_input(f"Page (of {n_pages})", 1, n_pages, 1, key="fleet_page")
+    start = (page - 1) * FLEET_PAGE_SIZE
+    stop = min(start + FLEET_PAGE_SIZE, len(fleet))
+
+    edited = st.data_editor(
+        fleet.page(start, stop, impacts),
+        key=f"fleet_editor_{page}",
+        use_container_width=True,
+        disabled=IMPACT_COLUMNS,
+        column_config={
+            "device": st.column_config.SelectboxColumn("Device", options=list(device_ef.keys()), required=True),
+            "years": st.column_config.NumberColumn("Lifespan (years)", min_value=0.5, max_value=20.0, step=0.5, required=True),
+            "used": st.column_config.SelectboxColumn("Condition", options=["New", "Used"], required=True),
+            "shared": st.column_config.SelectboxColumn("Ownership", options=["Personal", "Shared"], required=True),
+            "eol": st.column_config.SelectboxColumn("End-of-life behavior", options=list(eol_modifier.keys()), required=True),
+            IMPACT_COLUMNS[0]: st.column_config.NumberColumn(format="%.2f"),
+            IMPACT_COLUMNS[1]: st.column_config.NumberColumn(format="%.2f")
+        }
+    )
+    if fleet.update(start, edited):
+        st.rerun(scope="fragment")
+    return fleet
+
+
+def replacement_planner(fleet):
+    import numpy as np
+    import pandas as pd
+    from amortization import optimize
+    from engine import DEVICES, EOL_OPTIONS
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        horizon = st.slider("Planning horizon (years)", 5, 30, 20, key="plan_horizon")
+    with col2:
+        max_age = st.slider("Longest usable lifespan (years)", 2, 15, 8, key="plan_max_age")
+    with col3:
+        use_kg = st.number_input("Use phase (kg CO₂e/year per device)", 0.0, 500.0, 0.0, step=5.0, key="plan_use_kg",
+                                 help="Electricity of one device in its first year; 0 leaves the use phase out")
+    with col4:
+        ageing = st.slider("Use phase growth with age (%/year)", 0, 20, 5, key="plan_ageing", disabled=not use_kg)
+
+    plan = optimize(fleet, horizon, max_age, use_kg=use_kg, ageing=ageing / 100)
+    planned, best = plan["planned"].sum(), plan["total"].sum()
+    st.markdown(f"<div class='impact-text'>📅 Over {horizon} years: <strong>{planned:,.0f} kg CO₂e</strong> with the planned lifespans, "
+                f"<strong>{best:,.0f} kg CO₂e</strong> with the schedule below</div>", unsafe_allow_html=True)
+
+    st.bar_chart(pd.DataFrame({"Devices replaced": plan["replace"].sum(axis=0)},
+                              index=pd.RangeIndex(1, horizon + 1, name="Year")), color="#52b788")
+
+    first = np.where(plan["replace"].any(axis=1), plan["replace"].argmax(axis=1) + 1, 0)
+    summary = pd.DataFrame({
+        "Device": np.array(DEVICES, dtype=object)[fleet.device],
+        "Planned lifespan (years)": fleet.years,
+        "First replacement (year)": np.where(first > 0, first, np.nan),
+        "Replacements": plan["replace"].sum(axis=1)
+    }).groupby("Device").agg({"Planned lifespan (years)": "mean", "First replacement (year)": "min", "Replacements": "sum"})
+    st.dataframe(summary, use_container_width=True, column_config={
+        "Planned lifespan (years)": st.column_config.NumberColumn(format="%.1f"),
+        "First replacement (year)": st.column_config.NumberColumn(format="%d", help="Empty if no device of this type needs replacing within the horizon")
+    })
+    disposals = plan["eol"][plan["eol"] >= 0]
+    if len(disposals):
+        st.caption(f"End of life at each replacement: “{EOL_OPTIONS[np.bincount(disposals).argmax()]}”")
+
+
+def mailbox_import():
+    upload = st.file_uploader("Optionally upload an mbox export to count them for you (for large or multi-folder "
+                              "mailboxes, run `python mail_scan.py PATH` and enter the numbers below)", key="mbox_file")
+    if upload is None:
+        return
+    if st.session_state.get("mbox_file_id") != upload.file_id:
+        read_mailbox(upload)
+    st.caption(st.session_state.mbox_summary)
+
+
+def read_mailbox(upload):
+    from mail_scan import scan_buffer, summarize
+    st.session_state.mbox_file_id = upload.file_id
+    try:
+        summary = summarize(scan_buffer(upload.getvalue()))
+    except ValueError as e:
+        st.session_state.mbox_summary = f"Could not read the mailbox: {e}"
+        return
+    st.session_state.email_plain_count = round(summary["email_plain"], 2)
+    st.session_state.email_attach_count = round(summary["email_attach"], 2)
+    st.session_state.mbox_summary = (f"Found {summary['messages']:,} emails over the last {summary['days']} days: "
+                                     f"{summary['plain']:,} without attachments and {summary['with_attachments']:,} with "
+                                     f"{summary['attachment_bytes'] / 1e6:,.1f} MB of attachments (spam excluded).")
+    habits_changed()
+
+
+def ai_mode_changed():
+    # The AI terms read other widgets now; they are tracked again on the next run
+    for task in ai_factors:
+        st.session_state.ledger.untrack(task)
+
+
+def chat_history_import():
+    upload = st.file_uploader("Optionally upload a chat-history export to count them for you: the ChatGPT export zip, "
+                              "a Claude conversations.json or a JSONL file (for very large exports, run "
+                              "`python ai_history.py FILE` and enter the numbers below)", key="chat_file")
+    if upload is None:
+        return
+    if st.session_state.get("chat_file_id") != upload.file_id:
+        read_chat_history(upload)
+    st.caption(st.session_state.chat_summary)
+
+
+def read_chat_history(upload):
+    from ai_history import DEFAULT_TASK, summarize, tally_file
+    st.session_state.chat_file_id = upload.file_id
+    try:
+        summary = summarize(tally_file(upload))
+    except ValueError as e:
+        st.session_state.chat_summary = f"Could not read the chat history: {e}"
+        return
+    for task, per_day in summary["per_day"].items():
+        st.session_state[f"{task} (measured)"] = min(round(per_day, 2), 100.0)
+    st.session_state.chat_summary = (f"Found {summary['prompts']:,} prompts over the last {summary['days']} days; "
+                                     f"{summary['unmatched']:,} matched no task and count as “{DEFAULT_TASK}”.")
+    ai_mode_changed()
+
+
+@st.fragment
+@metrics.fragment("activities")
+@flush_after
+def activities_section():
+    role = st.session_state.role
+    with metrics.stage("activities"):
+        ore_dict = {}
 
-        with col2:
-            st.markdown("**Condition**<br/><span class='device-hint'>Was the device new or used when you got it?</span>", unsafe_allow_html=True)
-            used = st.selectbox("", ["New", "Used"], index=["New", "Used"].index(prev["used"]), key=f"{device_id}_used")
+        col1, col2 = st.columns(2)
 
-        with col3:
-            st.markdown("**Ownership**<br/><span class='device-hint'>Is this device used only by you or shared?</span>", unsafe_allow_html=True)
-            shared = st.selectbox("", ["Personal", "Shared"], index=["Personal", "Shared"].index(prev["shared"]), key=f"{device_id}_shared")
+        for i, (act, ef) in enumerate(activity_factors[role].items()):
+            with (col1 if i % 2 == 0 else col2):
+                ore = st.slider(f"{act} (h/day)", min_value=0.0, max_value=8.0, value=0.0, step=0.5, key=act,
+                                on_change=input_changed, args=(act,))
+                ore_dict[act] = ore
 
-        with col4:
-            st.markdown("**End-of-life behavior**<br/><span class='device-hint'>What do you usually do when the device reaches its end of life?</span>", unsafe_allow_html=True)
-            eol = st.selectbox("", list(eol_modifier.keys()), index=list(eol_modifier.keys()).index(prev["eol"]), key=f"{device_id}_eol")
+        st.markdown("<br><br>", unsafe_allow_html=True)
 
-        st.session_state.device_inputs[device_id] = {
-            "years": years,
-            "used": used,
-            "shared": shared,
-            "eol": eol
-        }
-
-        if st.button(f"🗑 Remove {base_device}", key=f"remove_{device_id}"):
-            st.session_state.device_list.remove(device_id)
-            st.session_state.device_inputs.pop(device_id, None)
-            st.rerun()
+        st.markdown("""
+<span class='activity-desc'>
+Now tell us more about your habits related to email, cloud, printing and connectivity.
+</span>
+""", unsafe_allow_html=True)
 
-        impact = device_ef[base_device]
-        if used == "New" and shared == "Personal":
-            adj_years = years
-        elif used == "Used" and shared == "Personal":
-            adj_years = years + (years / 2)
-        elif used == "New" and shared == "Shared":
-            adj_years = years * 3
+        measured_mail = st.toggle("📬 Use measured email volumes", key="mail_measured", on_change=habits_changed,
+                                  help="Count your emails from a mailbox export instead of picking a range")
+        if measured_mail:
+            mailbox_import()
+            email_plain = st.number_input(
+                "Emails sent/received per work day **no attachments** (measured)",
+                0.0, 10000.0, step=1.0,
+                key="email_plain_count", on_change=input_changed, args=("email_plain_count",)
+            )
+            email_attach = st.number_input(
+                "Emails sent/received per work day **with attachments**, weighted by attachment size (measured)",
+                0.0, 10000.0, step=1.0,
+                key="email_attach_count", on_change=input_changed, args=("email_attach_count",)
+            )
+        else:
+            email_plain = st.selectbox(
+                "Emails sent/received during a typical 8-hour day **no attachments** - do not include spam emails",
+                list(emails.keys()),
+                key="email_plain", on_change=input_changed, args=("email_plain",)
+            )
+
+            email_attach = st.selectbox(
+                "Emails sent/received during a typical 8-hour day **with attachments** - do not include spam emails",
+                list(emails.keys()),
+                key="email_attach", on_change=input_changed, args=("email_attach",)
+            )
+
+        measured_cloud = st.toggle("☁️ Use measured cloud storage", key="cloud_measured", on_change=habits_changed,
+                                   help="Enter the size of your synced work folder instead of picking a range")
+        if measured_cloud:
+            cloud = st.number_input(
+                "Cloud storage you currently use **for academic or work-related files**, in GB (measured)",
+                0.0, 100000.0, step=1.0,
+                key="cloud_gb_measured", on_change=input_changed, args=("cloud_gb_measured",),
+                help="Run `python cloud_scan.py FOLDER` on your OneDrive, Google Drive or iCloud folder to measure it"
+            )
         else:
-            adj_years = years * 4.5
+            cloud = st.selectbox(
+                "Cloud storage you currently use **for academic or work-related files** (e.g., on iCloud, Google Drive, OneDrive)",
+                list(cloud_gb.keys()),
+                key="cloud", on_change=input_changed, args=("cloud",)
+            )
+
+        wifi = st.slider(
+            "Estimate your daily Wi-Fi connection time during a typical 8-hour study or work day, including hours when you're not actively using your device (e.g., background apps, idle mode)",
+            0.0, 8.0, 4.0, 0.5,
+            key="wifi", on_change=input_changed, args=("wifi",)
+        )
 
-        eol_mod = eol_modifier[eol]
-        prod_per_year = impact / adj_years
-        eol_impact = (impact * eol_mod) / adj_years
+        pages = st.number_input(
+            "Number of pages you print per day for academic or work purposes",
+            0, 100, 0,
+            key="pages", on_change=input_changed, args=("pages",)
+        )
 
-        total_prod += prod_per_year
-        total_eol += eol_impact
+        idle = st.radio(
+            "When you're not using your computer...",
+            idle_options,
+            key="idle", on_change=input_changed, args=("idle",)
+        )
 
-        st.markdown(f"<div class='impact-text'>📊 <strong>Production</strong>: {prod_per_year:.2f} kg CO₂e/year &nbsp;&nbsp;&nbsp; <strong>End-of-life</strong>: {eol_impact:.2f} kg CO₂e/year</div>", unsafe_allow_html=True)
+    inputs = {
+        "role": role,
+        "activities": ore_dict,
+        "email_plain": email_plain,
+        "email_attach": email_attach,
+        "cloud": cloud,
+        "wifi": wifi,
+        "pages": pages,
+        "idle": idle
+    }
+    ledger = st.session_state.ledger
+    for act in ore_dict:
+        ledger.track("activities", act, [act], activity_term(role, act))
+    measured = {"email_plain": "email_plain_count", "email_attach": "email_attach_count"} if measured_mail else {}
+    if measured_cloud:
+        measured["cloud"] = "cloud_gb_measured"
+    ledger.track("activities", "habits", [measured.get(key, key) for key in HABITS], habits_term)
+
+    live_total("activities", "Digital activities subtotal")
+    st.session_state.sections["activities"] = {"inputs": inputs}
+
+
+@st.fragment
+@metrics.fragment("ai")
+@flush_after
+def ai_section():
+    with metrics.stage("ai"):
+        ai_queries = {}
+        measured_ai = st.toggle("🤖 Use my AI chat history", key="ai_measured", on_change=ai_mode_changed,
+                                help="Count your prompts from a chat-history export instead of estimating them")
+        if measured_ai:
+            chat_history_import()
+        cols = st.columns(2)
+
+        for i, (task, ef) in enumerate(ai_factors.items()):
+            with cols[i % 2]:
+                if measured_ai:
+                    key = f"{task} (measured)"
+                    ai_queries[task] = st.number_input(f"{task} (queries/day, measured)", 0.0, 100.0, 0.0, step=1.0,
+                                                       key=key, on_change=input_changed, args=(key,))
+                else:
+                    ai_queries[task] = st.number_input(f"{task} (queries/day)", 0, 100, 0, key=task,
+                                                       on_change=input_changed, args=(task,))
+
+    ledger = st.session_state.ledger
+    for task in ai_queries:
+        ledger.track("ai", task, [f"{task} (measured)" if measured_ai else task], ai_term(task))
+
+    live_total("ai", "AI tools subtotal")
+    st.session_state.sections["ai"] = {"inputs": ai_queries}
+
+
+@st.cache_resource
+def peer_store():
+    # One store per process, shared by every session
+    return PeerStore()
+
+
+@st.cache_resource
+def report_pool():
+    # One pool per process: a report asked for by several sessions is rendered once
+    return ReportPool()
 
 
-    # === DIGITAL ACTIVITIES ===
+def show_main():
+    # --- TITOLO ---
     st.markdown("""
-        <style>
-        .section-header {
-            color: #1d3557;
-            font-size: 1.8em;
-            margin-top: 40px;
-        }
-
-        .activity-desc {
-            font-size: 18px;
-            color: #333;
-        }
-        </style>
+        <div style="background: linear-gradient(to right, #d8f3dc, #a8dadc);
+                    padding: 30px 20px;
+                    border-radius: 15px;
+                    text-align: center;
+                    box-shadow: 0 4px 18px rgba(0,0,0,0.06);
+                    margin-bottom: 30px;">
+            <h1 style="font-size: 2.4em;">☁️ Digital Usage Form</h1>
+        </div>
     """, unsafe_allow_html=True)
 
-    st.markdown("<div class='section-header'>🎓 Digital Activities</div>", unsafe_allow_html=True)
+    # === DEVICES ===
+    st.header("💻 Devices")
     st.markdown("""
-<span class='activity-desc'>
-Estimate how many hours per day you spend on each activity during a typical 8-hour study or work day.  
-You may exceed 8 hours if multitasking (e.g., watching a lecture while writing notes).
-</span>
-""", unsafe_allow_html=True)
-
-    role = st.session_state.role
-    ore_dict = {}
-    digital_total = 0
-
-    col1, col2 = st.columns(2)
+Choose the digital devices you currently use, and for each one, provide a few details about how you use it and what you do when it's no longer needed.
+""")
 
-    for i, (act, ef) in enumerate(activity_factors[role].items()):
-        with (col1 if i % 2 == 0 else col2):
-            ore = st.slider(f"{act} (h/day)", min_value=0.0, max_value=8.0, value=0.0, step=0.5, key=act)
-            ore_dict[act] = ore
-            digital_total += ore * ef * DAYS
+    devices_section()
 
-    st.markdown("<br><br>", unsafe_allow_html=True)
 
+    # === DIGITAL ACTIVITIES ===
+    st.markdown("<div class='section-header'>🎓 Digital Activities</div>", unsafe_allow_html=True)
     st.markdown("""
 <span class='activity-desc'>
-Now tell us more about your habits related to email, cloud, printing and connectivity.
+Estimate how many hours per day you spend on each activity during a typical 8-hour study or work day.  
+You may exceed 8 hours if multitasking (e.g., watching a lecture while writing notes).
 </span>
 """, unsafe_allow_html=True)
 
-    email_plain = st.selectbox(
-        "Emails sent/received during a typical 8-hour day **no attachments** - do not include spam emails",
-        ["1–10", "11–20", "21–30", "31–40", "> 40"]
-    )
-
-    email_attach = st.selectbox(
-        "Emails sent/received during a typical 8-hour day **with attachments** - do not include spam emails",
-        ["1–10", "11–20", "21–30", "31–40", "> 40"]
-    )
-
-    emails = {"1–10": 5, "11–20": 15, "21–30": 25, "31–40": 35, "> 40": 45}
-
-    cloud = st.selectbox(
-        "Cloud storage you currently use **for academic or work-related files** (e.g., on iCloud, Google Drive, OneDrive)",
-        ["<5GB", "5–20GB", "20–50GB", "50–100GB"]
-    )
-
-    cloud_gb = {"<5GB": 3, "5–20GB": 13, "20–50GB": 35, "50–100GB": 75}
-
-    wifi = st.slider(
-        "Estimate your daily Wi-Fi connection time during a typical 8-hour study or work day, including hours when you're not actively using your device (e.g., background apps, idle mode)",
-        0.0, 8.0, 4.0, 0.5
-    )
-
-    pages = st.number_input(
-        "Number of pages you print per day for academic or work purposes",
-        0, 100, 0
-    )
-
-    idle = st.radio(
-        "When you're not using your computer...",
-        ["I turn it off", "I leave it on (idle mode)", "I don’t have a computer"]
-    )
-
-    mail_total = emails[email_plain] * 0.004 * DAYS + emails[email_attach] * 0.035 * DAYS + cloud_gb[cloud] * 0.01
-    wifi_total = wifi * 0.00584 * DAYS
-    print_total = pages * 0.0045 * DAYS
-
-    if idle == "I leave it on (idle mode)":
-        idle_total = DAYS * 0.0104 * 16
-    elif idle == "I turn it off":
-        idle_total = DAYS * 0.0005204 * 16
-    else:  # "I don’t have a computer"
-        idle_total = 0
-
-    digital_total += mail_total + wifi_total + print_total + idle_total
-
+    activities_section()
 
 
     # === AI TOOLS ===
-    st.markdown("""
-        <style>
-        .section-header {
-            color: #1d3557;
-            font-size: 1.8em;
-            margin-top: 40px;
-        }
-
-        .ai-desc {
-            font-size: 17px;
-            color: #333;
-            margin-bottom: 15px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-
     st.markdown("<div class='section-header'>🤖 AI Tools</div>", unsafe_allow_html=True)
     st.markdown("<div class='ai-desc'>Estimate how many queries you make per day for each AI-powered task.</div>", unsafe_allow_html=True)
 
-    ai_total = 0
-    cols = st.columns(2)
-
-    for i, (task, ef) in enumerate(ai_factors.items()):
-        with cols[i % 2]:
-            q = st.number_input(f"{task} (queries/day)", 0, 100, 0, key=task)
-            ai_total += q * ef * DAYS
+    ai_section()
 
 
     # === FINAL BUTTON ===
-    st.markdown("""
-        <style>
-        .final-button {
-            margin-top: 50px;
-            text-align: center;
-        }
-
-        .final-button button {
-            background-color: #52b788 !important;
-            color: white !important;
-            font-size: 1.1em !important;
-            padding: 0.6em 1.2em !important;
-            border-radius: 8px !important;
-            border: none !important;
-        }
-
-        .final-button button:hover {
-            background-color: #40916c !important;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-
     st.markdown('<div class="final-button">', unsafe_allow_html=True)
     if st.button("🌍 Discover Your Digital Carbon Footprint!"):
-        st.session_state.results = {
-            "Devices": total_prod,
-            "E-Waste": total_eol,
-            "Digital Activities": digital_total,
-            "AI Tools": ai_total
+        # Grand total kept up to date by the ledger
+        sections = st.session_state.sections
+        st.session_state.results = {cat: st.session_state.ledger.totals[cat] for cat in CATEGORIES}
+        st.session_state.factor_version = st.session_state.ledger.factors.version
+        st.session_state.inputs = {
+            **sections["activities"]["inputs"],
+            "ai": sections["ai"]["inputs"],
+            "devices": sections["devices"]["inputs"],
+            "fleet": sections["devices"]["fleet"]
         }
+        try:
+            token = encode_share(st.session_state.inputs)
+        except ValueError:
+            token = None  # an answer outside what a token can hold: no link, and peers can't re-score it
+        # Ranked before it is stored, so the result is compared with other people's only
+        st.session_state.peer_rank = peer_store().percentile(st.session_state.role,
+                                                             sum(st.session_state.results.values()))
+        peer_store().submit(st.session_state.role, st.session_state.results, st.session_state.factor_version,
+                            token)
+        if token is not None and len(token) <= MAX_SHARE_LENGTH:
+            st.session_state.share_token = token
+            st.query_params["r"] = token
+        # The form state isn't needed on the results page, only inputs and results are
+        for key in ["sections", "ledger", "device_list", "device_inputs"]:
+            st.session_state.pop(key, None)
         st.session_state.page = "results"
         st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
@@ -371,42 +626,6 @@ Now tell us more about your habits related to email, cloud, printing and connect
 
 
 def show_intro():
-    # --- STILE GLOBALE ---
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600&display=swap');
-
-        html, body, [class*="css"] {
-            font-family: 'Inter', sans-serif;
-        }
-
-        h1, h2, h3, h4 {
-            color: #1d3557;
-        }
-
-        .intro-box {
-            background: linear-gradient(to right, #d8f3dc, #a8dadc);
-            padding: 40px 25px;
-            border-radius: 15px;
-            text-align: center;
-            box-shadow: 0 4px 18px rgba(0,0,0,0.06);
-            margin-bottom: 30px;
-        }
-
-        .selectbox-container {
-            background-color: #f1faee;
-            border-left: 5px solid #52b788;
-            border-radius: 10px;
-            padding: 20px;
-            margin-top: 25px;
-        }
-
-        .start-button {
-            margin-top: 20px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-
     # --- HERO INTUITIVO ---
     st.markdown("""
         <div class="intro-box">
@@ -444,268 +663,130 @@ This calculator is tailored for **university students, professors, and staff mem
 
 
 
-def show_results():
-
-    # --- STILE GLOBALE ---
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600&display=swap');
-
-        html, body, [class*="css"] {
-            font-family: 'Inter', sans-serif;
-        }
-
-        h1, h2, h3, h4 {
-            color: #1d3557;
-        }
-
-        .tip-card {
-            background-color: #e3fced;
-            border-radius: 10px;
-            padding: 15px;
-            margin-bottom: 10px;
-        }
+@st.fragment
+@metrics.fragment("report")
+def report_downloads(req):
+    # The report pool renders off the script thread; the page only waits a moment for it
+    jobs = {}
+    try:
+        for kind in FORMATS:
+            jobs[kind] = report_pool().submit(kind, req)
+    except queue.Full:
+        pass
+    wait(jobs.values(), timeout=REPORT_WAIT_SECONDS)
+    if len(jobs) < len(FORMATS) or not all(job.done() for job in jobs.values()):
+        st.caption("Your report is still being prepared.")
+        st.button("🔄 Check again", key="report_refresh")
+        return
+    if any(job.exception() for job in jobs.values()):
+        st.caption("The report could not be generated.")
+        return
+    for col, (kind, job) in zip(st.columns(len(jobs)), jobs.items()):
+        col.download_button(f"⬇️ Download {kind.upper()}", job.result(), file_name=f"digital_carbon_footprint.{kind}",
+                            mime=FORMATS[kind], key=f"report_{kind}", on_click="ignore")
 
-        .equiv-card {
-            background-color: white;
-            border-left: 6px solid #52b788;
-            border-radius: 12px;
-            padding: 20px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.08);
-            text-align: center;
-        }
 
-        .equiv-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
-            gap: 20px;
-        }
+def show_results():
 
-        footer {
-            text-align: center;
-            font-size: 0.8em;
-            color: #999;
-            margin-top: 40px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    # Everything except the peer ranking depends only on the role and the rounded results,
+    # so the HTML and the chart are built once per distinct result and shared by all sessions
+    version = st.session_state.get("factor_version", factor_set.version)
+    key = results_key(st.session_state.role, st.session_state.results, version)
+    role, values, _ = key
+
+    with metrics.stage("cards"):
+        view = results_cards(key)
+
+        # --- HERO SECTION ---
+        st.markdown("""
+            <div style="
+                background: linear-gradient(to right, #d8f3dc, #a8dadc);
+                padding: 40px 20px;
+                border-radius: 12px;
+                text-align: center;
+                box-shadow: 0 4px 20px rgba(0,0,0,0.08);
+                margin-bottom: 30px;
+            ">
+                <h1 style="font-size: 2.8em; margin-bottom: 0.1em;">🌍 Your Digital Carbon Footprint</h1>
+                <p style="font-size: 1.2em; color: #1b4332;">Discover your impact — and what to do about it.</p>
+            </div>
+        """, unsafe_allow_html=True)
 
-    # --- HERO SECTION ---
-    st.markdown("""
-        <div style="
-            background: linear-gradient(to right, #d8f3dc, #a8dadc);
-            padding: 40px 20px;
-            border-radius: 12px;
-            text-align: center;
-            box-shadow: 0 4px 20px rgba(0,0,0,0.08);
-            margin-bottom: 30px;
-        ">
-            <h1 style="font-size: 2.8em; margin-bottom: 0.1em;">🌍 Your Digital Carbon Footprint</h1>
-            <p style="font-size: 1.2em; color: #1b4332;">Discover your impact — and what to do about it.</p>
-        </div>
-    """, unsafe_allow_html=True)
+        # --- RISULTATO TOTALE ---
+        st.markdown(view["total_card"], unsafe_allow_html=True)
 
-    res = st.session_state.results
-    total = sum(res.values())
-
-    # --- CARICAMENTO ---
-    with st.spinner("🔍 Calculating your footprint..."):
-        time.sleep(1.2)
-
-    # --- RISULTATO TOTALE ---
-    st.markdown(f"""
-        <div style="background-color:#d8f3dc; border-left: 6px solid #1b4332;
-                    padding: 1em 1.5em; margin-top: 20px; border-radius: 10px;">
-            <h3 style="margin: 0; font-size: 1.6em;">🌱 Total CO₂e:</h3>
-            <p style="font-size: 2.2em; font-weight: bold; color: #1b4332; margin: 0;">
-                {total:.0f} kg/year
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
+        # --- CONFRONTO CON I PARI ---
+        rank = st.session_state.get("peer_rank")
+        share_below, n_peers = rank if rank is not None else peer_store().percentile(role, view["total"], stored=True)
+        if n_peers >= MIN_PEERS:
+            st.markdown(f"""
+                <div style="margin-top: 12px; font-size: 1.1em; color: #1b4332;">
+                    👥 Your footprint is lower than <b>{100 - share_below:.0f}%</b> of {n_peers} other {role}s who used the calculator.
+                </div>
+            """, unsafe_allow_html=True)
 
-    # --- METRICHE IN GRIGLIA ---
-    st.markdown("<br><h4>📦 Breakdown by source:</h4>", unsafe_allow_html=True)
-    st.markdown(f"""
-        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 15px;">
-            <div class="tip-card" style="text-align:center;">
-                <div style="font-size: 2em;">💻</div>
-                <div style="font-size: 1.2em;"><b>{res['Devices']:.2f} kg</b></div>
-                <div style="color: #555;">Devices</div>
-            </div>
-            <div class="tip-card" style="text-align:center;">
-                <div style="font-size: 2em;">🗑️</div>
-                <div style="font-size: 1.2em;"><b>{res['E-Waste']:.2f} kg</b></div>
-                <div style="color: #555;">E-Waste</div>
-            </div>
-            <div class="tip-card" style="text-align:center;">
-                <div style="font-size: 2em;">📡</div>
-                <div style="font-size: 1.2em;"><b>{res['Digital Activities']:.2f} kg</b></div>
-                <div style="color: #555;">Digital Activities</div>
-            </div>
-            <div class="tip-card" style="text-align:center;">
-                <div style="font-size: 2em;">🤖</div>
-                <div style="font-size: 1.2em;"><b>{res['AI Tools']:.2f} kg</b></div>
-                <div style="color: #555;">AI Tools</div>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+        # --- METRICHE IN GRIGLIA ---
+        st.markdown("<br><h4>📦 Breakdown by source:</h4>", unsafe_allow_html=True)
+        st.markdown(view["breakdown"], unsafe_allow_html=True)
 
     st.divider()
 
     # --- GRAFICO ---
     st.subheader("📊 Breakdown by Category")
-    df_plot = pd.DataFrame({
-        "Category": ["Devices", "Digital Activities", "Artificial Intelligence", "E-Waste"],
-        "CO₂e (kg)": [res["Devices"], res["Digital Activities"], res["AI Tools"], res["E-Waste"]]
-    })
+    show_bands = "inputs" in st.session_state and st.toggle("Show uncertainty ranges (P5–P95)", key="show_bands")
+    interactive = st.toggle("Interactive chart", key="interactive_chart",
+                            help="Zoom and hover with Plotly (downloads a larger chart library)")
+    res = dict(zip(CATEGORIES, values))
+    # Total and breakdown cards are already on screen; the spinner only appears if
+    # building the chart actually takes long, and shows the measured elapsed time.
+    with st.spinner("🔍 Drawing your breakdown...", show_time=True):
+        with metrics.stage("chart_build"):
+            low = high = None
+            if show_bands:
+                bands = bands_one(st.session_state.inputs, factors=factors.load(version))
+                low = tuple(round(bands[k][0], 2) for k in PLOT_KEYS)
+                high = tuple(round(bands[k][2], 2) for k in PLOT_KEYS)
+            chart = (breakdown_figure if interactive else breakdown_svg)(
+                tuple(PLOT_LABELS), tuple(res[k] for k in PLOT_KEYS), low, high)
+        with metrics.stage("chart_send"):
+            if interactive:
+                st.plotly_chart(chart, use_container_width=True)
+            else:
+                st.markdown(chart, unsafe_allow_html=True)
+        if show_bands:
+            st.caption("Whiskers span the 5th–95th percentile of 100,000 Monte Carlo draws of the emission factors.")
 
-    fig = px.bar(df_plot,
-                 x="CO₂e (kg)",
-                 y="Category",
-                 orientation="h",
-                 color="Category",
-                 color_discrete_sequence=["#95d5b2", "#74c69d", "#52b788", "#1b4332"],
-                 height=400)
-
-    fig.update_layout(showlegend=False, 
-                      plot_bgcolor="#f1faee", 
-                      paper_bgcolor="#f1faee",
-                      font_family="Inter")
-
-    fig.update_traces(marker=dict(line=dict(width=1.5, color='white')))
-    st.plotly_chart(fig, use_container_width=True)
-
-
-    # --- TIPS PERSONALIZZATI ---
-    detailed_tips = {
-        "Devices": [
-            "<b>Turn off devices when not in use</b> – Even in standby mode, they consume energy. Powering them off saves electricity and extends their lifespan.",
-            "<b>Update software regularly</b> – This enhances efficiency and performance, often reducing energy consumption.",
-            "<b>Activate power-saving settings, reduce screen brightness and enable dark mode</b> – This lower energy use.",
-            "<b>Choose accessories made from recycled or sustainable materials</b> – This minimizes the environmental impact of your tech choices."
-        ],
-        "E-Waste": [
-            "<b>Avoid upgrading devices every year</b> – Extending device lifespan significantly reduces environmental impact.",
-            "<b>Repair instead of replacing</b> – Fix broken electronics whenever possible to avoid unnecessary waste.",
-            "<b>Consider buying refurbished devices</b> – They’re often as good as new, but with a much lower environmental footprint.",
-            "<b>Recycle unused electronics properly</b> – Don’t store old devices at home or dispose of them in the environment! E-waste contains polluting and valuable materials that need specialized treatment."
-        ],
-        "Digital Activities": [
-            "<b>Use your internet mindfully</b> – Close unused apps, avoid sending large attachments, and turn off video during calls when not essential.",
-            "<b>Declutter your digital space</b> – Regularly delete unnecessary files, empty trash and spam folders, and clean up cloud storage to reduce digital pollution.",
-            "<b>Share links instead of attachments</b> – For example, link to a document on OneDrive or Google Drive instead of attaching it in an email.",
-            "<b>Use instant messaging for short, urgent messages</b> – It's more efficient than email for quick communications."
-        ],
-        "Artificial Intelligence": [
-            "<b>Use search engines for simple tasks</b> – They consume far less energy than AI tools.",
-            "<b>Disable AI-generated results in search engines</b> – (e.g., on Bing: go to Settings > Search > Uncheck \"Include AI-powered answers\" or similar option)",
-            "<b>Prefer smaller AI models when possible</b> – For basic tasks, use lighter versions like GPT-4o-mini instead of more energy-intensive models.",
-            "<b>Be concise in AI prompts and require concise answers</b> – Short inputs and outputs require less processing."
-        ]
-    }
 
     # --- TITOLO + TIPS PER LA CATEGORIA PRINCIPALE ---
-    most_impact_cat = df_plot.sort_values("CO₂e (kg)", ascending=False).iloc[0]["Category"]
+    st.markdown(f"### 💡 Your biggest impact comes from: <b>{view['most_impact_cat']}</b>", unsafe_allow_html=True)
 
-    st.markdown(f"### 💡 Your biggest impact comes from: <b>{most_impact_cat}</b>", unsafe_allow_html=True)
+    with metrics.stage("tips"):
+        with st.expander("📌 Tips to reduce your footprint"):
+            for tip in view["tips"]:
+                st.markdown(tip, unsafe_allow_html=True)
 
-    with st.expander("📌 Tips to reduce your footprint"):
-        for tip in detailed_tips[most_impact_cat]:
-            st.markdown(f"""
-                <div style="background-color: #e3fced; padding: 15px; border-radius: 10px; margin-bottom: 10px;">
-                    {tip}
-                </div>
-            """, unsafe_allow_html=True)
+        # --- EXTRA TIPS ---
+        st.markdown("### 💡 Some Extra Tips:")
 
-    # --- EXTRA TIPS ---
-    other_categories = [cat for cat in detailed_tips if cat != most_impact_cat]
-    extra_tips = [random.choice(detailed_tips[cat]) for cat in random.sample(other_categories, 3)]
+        with st.expander("📌 Bonus advice from other categories"):
+            for tip in view["extra_tips"]:
+                st.markdown(tip, unsafe_allow_html=True)
 
-    st.markdown("### 💡 Some Extra Tips:")
 
-    with st.expander("📌 Bonus advice from other categories"):
-        for tip in extra_tips:
-            st.markdown(f"""
-                <div style="background-color: #e3fced; padding: 15px; border-radius: 10px; margin-bottom: 10px;">
-                    {tip}
-                </div>
-            """, unsafe_allow_html=True)
 
+        st.divider()
 
+        # --- EQUIVALENZE VISUALI ---
+        st.markdown("### ♻️ With the same emissions, you could…")
+        st.markdown(view["equivalences"], unsafe_allow_html=True)
 
-    st.divider()
+    st.caption(f"Emission factors: version {version}.")
+    if st.session_state.get("share_token"):
+        st.caption(f"🔗 [Link to these results]({'?r=' + st.session_state.share_token}) — anyone with it sees the same page.")
 
-    # --- EQUIVALENZE VISUALI ---
-    st.markdown("### ♻️ With the same emissions, you could…")
-
-    burger_eq = total / 4.6
-    led_days_eq = (total / 0.256) / 24
-    car_km_eq = total / 0.17
-    netflix_hours_eq = total / 0.055
-
-    st.markdown(f"""
-        <style>
-        .equiv-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 25px;
-            margin-top: 25px;
-        }}
-        .equiv-card {{
-            background-color: white;
-            border-radius: 15px;
-            padding: 25px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.08);
-            border-left: 6px solid #52b788;
-            text-align: center;
-            transition: transform 0.2s ease;
-        }}
-        .equiv-card:hover {{
-            transform: scale(1.02);
-        }}
-        .equiv-emoji {{
-            font-size: 3.5em;
-            margin-bottom: 15px;
-        }}
-        .equiv-text {{
-            font-size: 1.05em;
-            line-height: 1.6;
-            color: #333;
-        }}
-        .equiv-value {{
-            font-weight: 600;
-            font-size: 1.2em;
-            color: #1b4332;
-        }}
-        </style>
-
-        <div class="equiv-grid">
-            <div class="equiv-card">
-                <div class="equiv-emoji">🍔</div>
-                <div class="equiv-text">
-                    Produce <span class="equiv-value">~{burger_eq:.0f}</span> beef burgers
-                </div>
-            </div>
-            <div class="equiv-card">
-                <div class="equiv-emoji">💡</div>
-                <div class="equiv-text">
-                    Keep 100 LED bulbs (10W) on for <span class="equiv-value">~{led_days_eq:.0f}</span> days
-                </div>
-            </div>
-            <div class="equiv-card">
-                <div class="equiv-emoji">🚗</div>
-                <div class="equiv-text">
-                    Drive a gasoline car for <span class="equiv-value">~{car_km_eq:.0f}</span> km
-                </div>
-            </div>
-            <div class="equiv-card">
-                <div class="equiv-emoji">📺</div>
-                <div class="equiv-text">
-                    Watch Netflix for <span class="equiv-value">~{netflix_hours_eq:.0f}</span> hours
-                </div>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+    # --- REPORT ---
+    st.markdown("### 📄 Take your results with you")
+    report_downloads(report_request(res, version, subtitle=role))
 
     # --- FINALE MOTIVAZIONALE ---
 
@@ -720,7 +801,9 @@ def show_results():
     # --- PULSANTE RESTART ---
     st.markdown("### ")
     if st.button("🔁 Restart the Calculator"):
+        session_backend().drop(sid)
         st.session_state.clear()
+        st.query_params.clear()
         st.session_state.page = "intro"
         st.rerun()
 
@@ -728,9 +811,15 @@ def show_results():
 
 
 # === PAGE NAVIGATION ===
-if st.session_state.page == "intro":
-    show_intro()
-elif st.session_state.page == "main":
-    show_main()
-elif st.session_state.page == "results":
-    show_results()
+with metrics.rerun(st.session_state.page):
+    try:
+        st.markdown(stylesheet(), unsafe_allow_html=True)
+        if st.session_state.page == "intro":
+            show_intro()
+        elif st.session_state.page == "main":
+            show_main()
+        elif st.session_state.page == "results":
+            show_results()
+    finally:
+        # One batched write per rerun, also when the run ends with st.rerun()
+        sync.flush()
@@ -0,0 +1,301 @@
+"""Score exported survey responses offline.
+
+Usage: python batch.py responses.csv --out results.parquet [--aggregates roles.csv]
+
+The input has one row per respondent with the calculator's questions as columns:
+``role``, one column per activity (hours/day) and AI task (queries/day) named as in
+the form, ``email_plain``, ``email_attach``, ``cloud``, ``wifi``, ``pages``, ``idle``
+and, for each device k, ``device_k``, ``device_k_years``, ``device_k_used``,
+``device_k_shared`` and ``device_k_eol``. Optional ``respondent_id`` and ``department``
+columns are carried through to the output (reports.py writes one report per department).
+
+With ``--hourly [COUNTRY]`` usage is scored by the hourly model (hourly.py) against
+that country's grid-intensity table, optionally shifted by a ``start_hour`` column, and
+the flat model's total is kept next to it as ``Flat Total``.
+
+Parquet input or output (``.parquet`` paths) needs pyarrow, an optional extra that
+requirements.txt leaves out since the app doesn't use it: ``pip install pyarrow``.
+
+Results are scored with the active emission-factor version (factors.py), or the one
+named by ``--factors``, and each row records it in a ``Factors`` column.
+
+The file is split into byte ranges on line boundaries and each range is parsed and
+scored in a worker process, with only a few ranges in flight at once, so memory
+stays flat regardless of file size. Records must not contain embedded newlines.
+"""
+import argparse
+import io
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import engine
+import factors
+import hourly
+import uncertainty
+from engine import CATEGORIES
+
+REQUIRED = {"role": engine.ROLES, "email_plain": engine.EMAIL_BUCKETS, "email_attach": engine.EMAIL_BUCKETS,
+            "cloud": engine.CLOUD_BUCKETS, "idle": engine.idle_options}
+DEVICE_COLUMN = re.compile(r"^device_(\d+)$")
+DEVICE_FIELDS = {"used": engine.used_options, "shared": engine.shared_options, "eol": engine.EOL_OPTIONS}
+CARRIED = ["respondent_id", "department"]
+
+
+def _clean(label):
+    # LMS exports often flatten "1–10" to "1-10" and "don’t" to "don't"
+    return re.sub(r"(?<=\d)\s*-\s*(?=\d)", "–", str(label).strip()).replace("'", "’")
+
+
+def _codes(series, options, default=-1):
+    """Option indices for a text column, hashing only its distinct values; missing -> ``default``."""
+    codes, uniques = pd.factorize(series)
+    lookup = {label: i for i, label in enumerate(options)}
+    mapped = np.empty(len(uniques) + 1, dtype=np.intp)
+    mapped[-1] = default
+    for i, label in enumerate(uniques):
+        try:
+            mapped[i] = lookup[_clean(label)]
+        except KeyError:
+            raise ValueError(f"Unknown {series.name} answer {label!r}, expected one of {list(options)}") from None
+    return mapped[codes]
+
+
+def _devices(frame):
+    parts = []
+    for column in frame.columns:
+        if not DEVICE_COLUMN.match(column):
+            continue
+        present = frame[column].notna().to_numpy()
+        if not present.any():
+            continue
+        part = {
+            "respondent": np.flatnonzero(present),
+            "device": _codes(frame[column], engine.DEVICES)[present],
+            "years": pd.to_numeric(frame[f"{column}_years"], errors="coerce").to_numpy(dtype=float)[present]
+        }
+        for field, options in DEVICE_FIELDS.items():
+            name = f"{column}_{field}"
+            part[field] = _codes(frame[name], options, default=0)[present] if name in frame else np.zeros(present.sum(), dtype=np.intp)
+        parts.append(part)
+    if not parts:
+        return None
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def score_frame(frame, n_samples=0, grid=None, version=None):
+    """Score one parsed chunk; rows missing a required answer get NaN results.
+
+    With ``n_samples`` each row also gets Monte Carlo P5/P95 bands per category; with a
+    ``grid`` table usage is scored hourly. ``version`` names the factor version (default:
+    the active one).
+    """
+    f = factors.load(version) if version else factors.active()
+    codes = {column: _codes(frame[column], options) for column, options in REQUIRED.items()}
+    valid = np.logical_and.reduce([c >= 0 for c in codes.values()])
+    respondents = frame.loc[valid].reset_index(drop=True)
+
+    columns = {column: c[valid] for column, c in codes.items()}
+    # Bucket answers are passed as their midpoint counts, the engine's numeric path
+    columns["email_plain"] = f.EMAIL_COUNT[columns["email_plain"]]
+    columns["email_attach"] = f.EMAIL_COUNT[columns["email_attach"]]
+    columns["cloud"] = f.CLOUD_COUNT[columns["cloud"]]
+    for column in engine.ACTIVITIES + engine.AI_TASKS + ["wifi", "pages"]:
+        if column in respondents:
+            columns[column] = pd.to_numeric(respondents[column], errors="coerce").fillna(0).to_numpy(dtype=float)
+    devices = _devices(respondents)
+    res = engine.score(columns, devices, f)
+    flat_total = sum(res.values())
+    if grid is not None:
+        start_hour = None
+        if "start_hour" in respondents:
+            start_hour = pd.to_numeric(respondents["start_hour"], errors="coerce").fillna(hourly.WORK_START).to_numpy()
+        res = hourly.score(columns, devices, grid, start_hour, factors=f)
+
+    out = pd.DataFrame(index=frame.index)
+    for column in CARRIED:
+        if column in frame:
+            out[column] = frame[column]
+    out["role"] = pd.Categorical.from_codes(codes["role"], engine.ROLES)
+    for cat in CATEGORIES:
+        column = np.full(len(frame), np.nan)
+        column[valid] = res[cat]
+        out[cat] = column
+    out["Total"] = out[CATEGORIES].sum(axis=1, min_count=len(CATEGORIES))
+    if grid is not None:
+        column = np.full(len(frame), np.nan)
+        column[valid] = flat_total
+        out["Flat Total"] = column
+    out["Factors"] = pd.Categorical([f.version] * len(frame))
+
+    if n_samples:
+        bands = uncertainty.bands(uncertainty.coefficients(columns, devices, f), n_samples)
+        for k, cat in enumerate(CATEGORIES):
+            for p, name in [(0, "P5"), (2, "P95")]:
+                column = np.full(len(frame), np.nan)
+                column[valid] = bands[:, k, p]
+                out[f"{name} {cat}"] = column
+    return out
+
+
+def _partial_aggregates(out):
+    scored = out.dropna(subset=["Total"])
+    grouped = scored.groupby("role", observed=True)
+    return {
+        "count": grouped.size(),
+        "sum": grouped[CATEGORIES + ["Total"]].sum(),
+        "min": grouped["Total"].min(),
+        "max": grouped["Total"].max(),
+        "skipped": int(len(out) - len(scored))
+    }
+
+
+def _score_range(path, header, start, stop, n_samples, grid, version):
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    # Carried columns stay text: a range where they are all blank would otherwise parse as float
+    frame = pd.read_csv(io.BytesIO(header + data), dtype=dict.fromkeys(CARRIED, str))
+    out = score_frame(frame, n_samples, grid, version)
+    return out, _partial_aggregates(out)
+
+
+def _ranges(path, chunk_bytes):
+    # Yield (start, stop) byte offsets that always end on a line boundary
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            if f.tell() < size:
+                f.readline()
+            stop = f.tell()
+            yield header, start, stop
+            start = stop
+
+
+class _Writer:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.writer = None
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.writer is None:
+                # Fixed from the first chunk on, with carried columns as text even if that chunk has none
+                schema = pa.schema([pa.field(field.name, pa.string()) if field.name in CARRIED else field
+                                    for field in table.schema], metadata=table.schema.metadata)
+                self.writer = pq.ParquetWriter(self.path, schema)
+            self.writer.write_table(table.cast(self.writer.schema))
+        else:
+            frame.to_csv(self.path, mode="a" if self.writer else "w", header=not self.writer, index=False)
+            self.writer = True
+
+    def close(self):
+        if self.parquet and self.writer is not None:
+            self.writer.close()
+
+
+def require_parquet(*paths):
+    """Fail up front, before any scoring, when a ``.parquet`` path is given without pyarrow."""
+    if any(path and path.endswith(".parquet") for path in paths):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet files need pyarrow (pip install pyarrow); use .csv paths otherwise") from None
+
+
+def _write_table(frame, path):
+    if path.endswith(".parquet"):
+        frame.to_parquet(path)
+    else:
+        frame.to_csv(path)
+
+
+def run(path, out_path, aggregates_path=None, chunk_bytes=32 << 20, workers=None, n_samples=0, grid=None,
+        version=None):
+    """Score ``path`` chunk by chunk and return the per-role aggregate table."""
+    require_parquet(out_path, aggregates_path)
+    workers = workers or os.cpu_count()
+    # Every worker maps the same compiled factors; the version is fixed for the whole file
+    version = version or factors.active().version
+    writer = _Writer(out_path)
+    count, sums, mins, maxs, skipped = [], [], [], [], 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def drain():
+            nonlocal skipped
+            out, partial = pending.popleft().result()
+            writer.write(out)
+            count.append(partial["count"])
+            sums.append(partial["sum"])
+            mins.append(partial["min"])
+            maxs.append(partial["max"])
+            skipped += partial["skipped"]
+
+        for header, start, stop in _ranges(path, chunk_bytes):
+            pending.append(pool.submit(_score_range, path, header, start, stop, n_samples, grid, version))
+            if len(pending) >= 2 * workers:
+                drain()
+        while pending:
+            drain()
+    writer.close()
+
+    if not count:
+        aggregates = pd.DataFrame(columns=["respondents"] + [f"mean {c}" for c in CATEGORIES + ["Total"]])
+    else:
+        n = pd.concat(count).groupby(level=0).sum()
+        aggregates = pd.concat(sums).groupby(level=0).sum().div(n, axis=0).add_prefix("mean ")
+        aggregates.insert(0, "respondents", n)
+        aggregates["min Total"] = pd.concat(mins).groupby(level=0).min()
+        aggregates["max Total"] = pd.concat(maxs).groupby(level=0).max()
+    aggregates.index.name = "role"
+    aggregates.attrs["skipped"] = skipped
+    if aggregates_path:
+        _write_table(aggregates, aggregates_path)
+    return aggregates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score survey exports with the footprint engine.")
+    parser.add_argument("input", help="CSV export, one respondent per row")
+    parser.add_argument("--out", required=True, help="per-respondent results (.csv or .parquet)")
+    parser.add_argument("--aggregates", help="per-role aggregates (.csv or .parquet)")
+    parser.add_argument("--chunk-mb", type=int, default=32, help="size of each byte range handed to a worker")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--samples", type=int, default=0,
+                        help="Monte Carlo samples per respondent for P5/P95 bands (0 disables, e.g. 100000)")
+    parser.add_argument("--hourly", nargs="?", const="", metavar="COUNTRY",
+                        help="score usage hourly against grid_intensity/COUNTRY.csv (placeholder shape if omitted)")
+    parser.add_argument("--factors", metavar="VERSION", help="emission-factor version (default: the newest)")
+    args = parser.parse_args(argv)
+    if args.hourly is not None and args.samples:
+        parser.error("--samples bands are of the flat model and can't be combined with --hourly")
+
+    try:
+        require_parquet(args.out, args.aggregates)
+        version = factors.load(args.factors).version if args.factors else None
+        grid = hourly.load_table(args.hourly) if args.hourly is not None else None
+    except (ImportError, ValueError) as e:
+        parser.error(str(e))
+    aggregates = run(args.input, args.out, args.aggregates, args.chunk_mb << 20, args.workers, args.samples, grid,
+                     version)
+    print(aggregates.to_string())
+    if grid is not None and grid.placeholder:
+        print("Hourly results use the PLACEHOLDER grid-intensity shape, not measured data")
+    if aggregates.attrs["skipped"]:
+        print(f"{aggregates.attrs['skipped']} rows skipped because of missing answers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Throughput and memory of ai_history.py on synthetic chat-history exports.
+
+Writes a ChatGPT-style ``conversations.json`` (one top-level array, messages in a
+``mapping``) and a JSONL file with one message per line, each holding ``--messages``
+user prompts (plus as many assistant replies), then times ``tally_file`` on each and
+checks the counts and the classification of the templated prompts.
+
+Usage: python benchmarks/ai_history.py [--messages 300000] [--max-seconds 10]
+Prints one JSON object and exits with status 1 if a file takes longer than the budget.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ai_history  # noqa: E402
+from engine import AI_TASKS  # noqa: E402
+
+PROMPTS = {
+    "Summarize texts or articles": "Can you summarize this article for me?\n\n{filler}",
+    "Translate sentences or texts": "Translate the following into Italian: {filler}",
+    "Explain a concept": "What is {topic} and why does it matter?",
+    "Generate quizzes or questions": "Make a 10 question multiple-choice quiz about {topic}",
+    "Write formal emails or messages": "Draft an email to my professor asking for an extension on {topic}",
+    "Correct grammar or style": "Please proofread this paragraph: {filler}",
+    "Analyze long PDF documents": "Here is the attached paper, what are its limitations? {filler}",
+    "Write or test code": "Write a Python function that parses {topic} and add unit tests",
+    "Generate images": "Generate an image of a lecture hall full of {topic}",
+    "Brainstorm for thesis or projects": "Brainstorm some research questions on {topic}",
+    "Explain code step-by-step": "Explain this code line by line:\n```\ndef f(x):\n    return x * 2\n```",
+    "Prepare lessons or presentations": "Outline slides for a 45 minute lecture on {topic}"
+}
+TOPICS = ["entropy", "photosynthesis", "Bayesian inference", "the French revolution", "supply chains", "graph theory"]
+WORDS = "the of data results model energy students campus analysis method sample policy value".split()
+
+
+def prompt(rng):
+    task = rng.choice(AI_TASKS)
+    # Mostly short prompts, one in ten with a pasted text
+    filler = " ".join(rng.choices(WORDS, k=rng.randint(300, 1500) if rng.random() < 0.1 else rng.randint(5, 60)))
+    return task, PROMPTS[task].format(topic=rng.choice(TOPICS), filler=filler)
+
+
+def write_chatgpt(path, n, rng, per_conversation=20):
+    labels = []
+    t0 = 1.70e9
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for c in range(0, n, per_conversation):
+            mapping = {}
+            for i in range(min(per_conversation, n - c)):
+                task, text = prompt(rng)
+                labels.append(task)
+                ts = t0 + (c + i) * 60
+                mapping[f"u{i}"] = {"id": f"u{i}", "message": {"author": {"role": "user"}, "create_time": ts,
+                                                               "content": {"content_type": "text", "parts": [text]}}}
+                mapping[f"a{i}"] = {"id": f"a{i}", "message": {"author": {"role": "assistant"}, "create_time": ts + 5,
+                                                               "content": {"content_type": "text",
+                                                                           "parts": ["Sure. " * 60]}}}
+            f.write(("," if c else "") + json.dumps({"title": f"chat {c}", "create_time": t0 + c * 60,
+                                                     "mapping": mapping}))
+        f.write("]")
+    return labels
+
+
+def write_jsonl(path, n, rng):
+    labels = []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            task, text = prompt(rng)
+            labels.append(task)
+            ts = f"2024-{1 + i * 12 // n:02d}-{1 + i % 28:02d}T10:00:00Z"
+            f.write(json.dumps({"role": "user", "content": text, "timestamp": ts}) + "\n")
+            f.write(json.dumps({"role": "assistant", "content": "Sure. " * 60, "timestamp": ts}) + "\n")
+    return labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=300_000)
+    parser.add_argument("--max-seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    report, ok = {"messages": args.messages}, True
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, writer in (("chatgpt_json", write_chatgpt), ("jsonl", write_jsonl)):
+            path = os.path.join(tmp, name)
+            labels = writer(path, args.messages, rng)
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.perf_counter()
+            counts = ai_history.tally_file(path)
+            seconds = time.perf_counter() - start
+            totals = sum(counts.values())
+            expected = [labels.count(task) for task in AI_TASKS]
+            report[name] = {
+                "file_mb": round(os.path.getsize(path) / 1e6, 1),
+                "seconds": round(seconds, 2),
+                "prompts_per_s": round(args.messages / seconds),
+                "peak_rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+                "counted": int(totals.sum()),
+                "classified_as_generated": bool((totals[:-1] == expected).all())
+            }
+            ok &= seconds <= args.max_seconds and totals.sum() == args.messages
+    print(json.dumps(report, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
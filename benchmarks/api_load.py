@@ -0,0 +1,131 @@
+"""Throughput of api.py: requests per second on keep-alive connections.
+
+Starts the API in a child process, then drives it from an asyncio client with
+``--connections`` concurrent keep-alive connections, each sending ``--batch`` random
+(but valid) submissions per request, one request at a time. Client and server share the
+machine, so on one core the numbers are a lower bound for the server alone.
+
+Usage: python benchmarks/api_load.py [--requests 20000] [--connections 64] [--batch 1] [--min-rps 2000]
+Prints one JSON object and exits with status 1 if the throughput budget isn't met.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import engine  # noqa: E402
+
+
+def submission(rng):
+    role = rng.choice(engine.ROLES)
+    return {
+        "role": role,
+        "activities": {act: rng.randint(0, 16) / 2 for act in engine.activity_factors[role]},
+        "email_plain": rng.choice(engine.EMAIL_BUCKETS),
+        "email_attach": rng.choice(engine.EMAIL_BUCKETS),
+        "cloud": rng.choice(engine.CLOUD_BUCKETS),
+        "wifi": rng.randint(0, 16) / 2,
+        "pages": rng.randint(0, 20),
+        "idle": rng.choice(engine.idle_options),
+        "ai": {task: rng.randint(0, 10) for task in engine.AI_TASKS if rng.random() < 0.3},
+        "devices": [{"device": rng.choice(engine.DEVICES), "years": rng.randint(2, 12) / 2,
+                     "used": rng.choice(engine.used_options), "shared": rng.choice(engine.shared_options),
+                     "eol": rng.choice(engine.EOL_OPTIONS)} for _ in range(rng.randint(1, 4))]
+    }
+
+
+def request(body, port):
+    return (f"POST /score HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+
+async def connection(port, requests, latencies, statuses):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for req in requests:
+        start = time.perf_counter()
+        writer.write(req)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.split(b"Content-Length: ", 1)[1].split(b"\r\n", 1)[0])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        status = int(head[9:12])
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+
+async def drive(port, requests, connections):
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(port, requests[i::connections], latencies, statuses) for i in range(connections)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=1, help="submissions per request body")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-rps", type=float, default=None, help="fail below this many requests per second")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    port = free_port()
+    bodies = []
+    for _ in range(min(args.requests, 500)):
+        subs = [submission(rng) for _ in range(args.batch)]
+        bodies.append(json.dumps(subs if args.batch > 1 else subs[0], ensure_ascii=False).encode())
+    requests = [request(bodies[i % len(bodies)], port) for i in range(args.requests)]
+
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "api.py"), "--port", str(port)],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "listening on ..."
+        asyncio.run(drive(port, requests[:min(1000, len(requests))], args.connections))  # warm-up
+        elapsed, latencies, statuses = asyncio.run(drive(port, requests, args.connections))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    rps = len(latencies) / elapsed
+    report = {
+        "requests": len(latencies),
+        "connections": args.connections,
+        "batch": args.batch,
+        "statuses": statuses,
+        "requests_per_s": round(rps),
+        "submissions_per_s": round(rps * args.batch),
+        "latency_ms": {
+            "p50": round(statistics.median(latencies) * 1000, 2),
+            "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2)
+        }
+    }
+    failures = []
+    if set(statuses) != {200}:
+        failures.append(f"non-200 responses {statuses}")
+    if args.min_rps is not None and rps < args.min_rps:
+        failures.append(f"{rps:.0f} requests/s < {args.min_rps:.0f}")
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Batch scoring throughput, and multi-chunk output that must match a single-chunk run.
+
+Writes ``--rows`` random responses (with ``respondent_id`` and a ``department`` that is
+blank for the first half of the file, as in partial LMS exports) and scores them with
+``batch.run`` to Parquet in ``--chunk-kb`` byte ranges and to CSV in one range. Checks
+that the Parquet file has one schema across chunks, keeps every row and gives the same
+totals as the CSV run.
+
+Usage: python benchmarks/batch.py [--rows 20000] [--chunk-kb 50] [--workers 2]
+Prints one JSON object and exits with status 1 if a check fails.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import batch  # noqa: E402
+import engine  # noqa: E402
+
+
+def responses(n, rng):
+    frame = pd.DataFrame({"respondent_id": np.arange(n), "role": rng.choice(engine.ROLES, n)})
+    frame["department"] = np.where(np.arange(n) < n // 2, None, rng.choice(["Law", "Physics", "R&D"], n))
+    for act in engine.ACTIVITIES:
+        frame[act] = rng.integers(0, 16, n) / 2
+    for task in engine.AI_TASKS:
+        frame[task] = rng.integers(0, 10, n)
+    frame["email_plain"] = rng.choice(engine.EMAIL_BUCKETS, n)
+    frame["email_attach"] = rng.choice(engine.EMAIL_BUCKETS, n)
+    frame["cloud"] = rng.choice(engine.CLOUD_BUCKETS, n)
+    frame["wifi"] = rng.integers(0, 16, n) / 2
+    frame["pages"] = rng.integers(0, 20, n)
+    frame["idle"] = rng.choice(engine.idle_options, n)
+    frame["device_1"] = rng.choice(engine.DEVICES, n)
+    frame["device_1_years"] = rng.integers(1, 10, n)
+    return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--chunk-kb", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = {"rows": args.rows, "chunk_kb": args.chunk_kb, "workers": args.workers}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "responses.csv")
+        responses(args.rows, np.random.default_rng(args.seed)).to_csv(source, index=False)
+        report["chunks"] = sum(1 for _ in batch._ranges(source, args.chunk_kb << 10))
+
+        start = time.perf_counter()
+        batch.run(source, os.path.join(tmp, "chunked.parquet"), chunk_bytes=args.chunk_kb << 10, workers=args.workers)
+        report["parquet_seconds"] = round(time.perf_counter() - start, 3)
+        report["rows_per_s"] = round(args.rows / report["parquet_seconds"])
+        start = time.perf_counter()
+        batch.run(source, os.path.join(tmp, "whole.csv"), chunk_bytes=os.path.getsize(source), workers=1)
+        report["csv_one_chunk_seconds"] = round(time.perf_counter() - start, 3)
+
+        chunked = pd.read_parquet(os.path.join(tmp, "chunked.parquet"))
+        whole = pd.read_csv(os.path.join(tmp, "whole.csv"), dtype=dict.fromkeys(batch.CARRIED, str))
+    report["department_dtype"] = str(chunked["department"].dtype)
+    report["rows_written"] = len(chunked)
+    report["blank_departments"] = int(chunked["department"].isna().sum())
+    report["max_abs_diff"] = float((chunked["Total"] - whole["Total"]).abs().max())
+    ok = (report["chunks"] > 1 and len(chunked) == args.rows and report["blank_departments"] == args.rows // 2
+          and chunked["department"].equals(whole["department"]) and report["max_abs_diff"] < 1e-6)
+    report["ok"] = bool(ok)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Hourly model vs flat model: time and memory for a large batch of users.
+
+Scores ``--users`` random respondents (each with its own start of work day) with
+``engine.score`` and with ``hourly.score`` against the placeholder grid table, both by
+folding the weights per hour of day and by building the full (users x 8760) usage in
+chunks. Checks that the two hourly evaluations agree and that a constant-intensity table
+reproduces the flat model.
+
+Usage: python benchmarks/hourly.py [--users 100000] [--chunk 256]
+Prints one JSON object.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import engine  # noqa: E402
+import hourly  # noqa: E402
+
+
+def respondents(n, rng):
+    columns = {
+        "role": rng.integers(0, len(engine.ROLES), n),
+        "email_plain": engine.EMAIL_COUNT[rng.integers(0, len(engine.EMAIL_BUCKETS), n)],
+        "email_attach": engine.EMAIL_COUNT[rng.integers(0, len(engine.EMAIL_BUCKETS), n)],
+        "cloud": engine.CLOUD_COUNT[rng.integers(0, len(engine.CLOUD_BUCKETS), n)],
+        "wifi": rng.integers(0, 17, n) / 2,
+        "pages": rng.integers(0, 20, n).astype(float),
+        "idle": rng.integers(0, len(engine.idle_options), n)
+    }
+    columns.update({act: rng.integers(0, 9, n) / 2 for act in engine.ACTIVITIES})
+    columns.update({task: rng.integers(0, 10, n).astype(float) for task in engine.AI_TASKS})
+    return columns
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {"seconds": round(seconds, 3), "peak_mb": round(peak / 1e6, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--chunk", type=int, default=hourly.CHUNK_USERS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    columns = respondents(args.users, rng)
+    start_hour = rng.integers(7, 12, args.users)
+    table = hourly.load_table()
+    report = {"users": args.users, "chunk": args.chunk, "grid": table.name}
+
+    flat, report["flat"] = measure(lambda: engine.score(columns))
+    folded, report["hourly_folded"] = measure(lambda: hourly.score(columns, table=table, start_hour=start_hour,
+                                                                   chunk=args.chunk))
+    full, report["hourly_8760"] = measure(lambda: hourly.score(columns, table=table, start_hour=start_hour,
+                                                               chunk=args.chunk, fold=False))
+    constant = hourly.GridTable("constant", np.ones(8760), table.year)
+    same = hourly.score(columns, table=constant, start_hour=start_hour, chunk=args.chunk)
+
+    usage = ["Digital Activities", "AI Tools"]
+    report["max_abs_diff_folded_vs_8760"] = max(float(np.abs(folded[c] - full[c]).max()) for c in usage)
+    report["max_abs_diff_constant_vs_flat"] = max(float(np.abs(same[c] - flat[c]).max()) for c in usage)
+    report["mean_usage_ratio_hourly_vs_flat"] = round(float((sum(folded[c] for c in usage)
+                                                             / sum(flat[c] for c in usage)).mean()), 4)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Incremental ledger vs full recompute: cost of one input change in the main form.
+
+Builds a form state with ``--devices`` devices plus every activity, habit and AI input,
+then times a single change (one AI query count, one device's end-of-life choice) two
+ways: recomputing every section from its inputs, as the sections did before ledger.py,
+and updating only the affected ledger term. Checks that both give the same totals.
+
+Usage: python benchmarks/ledger.py [--devices 50 200 500] [--repeat 2000]
+Prints one JSON object.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import engine  # noqa: E402
+from ledger import HABITS, Ledger, activity_term, ai_term, device_term, habits_term  # noqa: E402
+
+FIELDS = ["years", "used", "shared", "eol"]
+
+
+def form(n_devices, rng):
+    role = "Student"
+    state = {act: rng.choice([0.0, 1.0, 2.5]) for act in engine.activity_factors[role]}
+    state.update({task: rng.randint(0, 10) for task in engine.AI_TASKS})
+    state.update(email_plain="11–20", email_attach="1–10", cloud="5–20GB", wifi=4.0, pages=2, idle=engine.idle_options[0])
+    devices = {}
+    for i in range(n_devices):
+        device_id = f"{rng.choice(engine.DEVICES)}_{i}"
+        devices[device_id] = device_id.rsplit("_", 1)[0]
+        state.update({f"{device_id}_years": rng.choice([2.0, 3.5, 5.0]), f"{device_id}_used": rng.choice(engine.used_options),
+                      f"{device_id}_shared": rng.choice(engine.shared_options),
+                      f"{device_id}_eol": rng.choice(engine.EOL_OPTIONS)})
+    return role, state, devices
+
+
+def full_recompute(role, state, devices):
+    inputs = {"role": role, "activities": {act: state[act] for act in engine.activity_factors[role]},
+              **{key: state[key] for key in HABITS}}
+    device_rows = [{"device": device, **{field: state[f"{device_id}_{field}"] for field in FIELDS}}
+                   for device_id, device in devices.items()]
+    return {**engine.score_one_devices(device_rows), **engine.score_one_digital(inputs),
+            **engine.score_one_ai({task: state[task] for task in engine.AI_TASKS})}
+
+
+def build_ledger(role, state, devices):
+    ledger = Ledger(state)
+    for device_id, device in devices.items():
+        ledger.track("devices", device_id, [f"{device_id}_{field}" for field in FIELDS], device_term(device))
+    for act in engine.activity_factors[role]:
+        ledger.track("activities", act, [act], activity_term(role, act))
+    ledger.track("activities", "habits", HABITS, habits_term)
+    for task in engine.AI_TASKS:
+        ledger.track("ai", task, [task], ai_term(task))
+    return ledger
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    report = []
+    for n in args.devices:
+        role, state, devices = form(n, rng)
+        ledger = build_ledger(role, state, devices)
+        device_id = next(iter(devices))
+        changes = {"ai_query": (engine.AI_TASKS[0], [3, 7]),
+                   "device_eol": (f"{device_id}_eol", engine.EOL_OPTIONS[:2])}
+        row = {"devices": n}
+        for name, (key, values) in changes.items():
+            flip = itertools.cycle(values)
+
+            def full():
+                state[key] = next(flip)
+                full_recompute(role, state, devices)
+
+            def incremental():
+                state[key] = next(flip)
+                ledger.changed(key)
+
+            full_us = min(timeit.repeat(full, number=max(1, args.repeat // 20), repeat=5)) / max(1, args.repeat // 20) * 1e6
+            incr_us = min(timeit.repeat(incremental, number=args.repeat, repeat=5)) / args.repeat * 1e6
+            row[name] = {"full_us": round(full_us, 1), "incremental_us": round(incr_us, 2), "speedup": round(full_us / incr_us, 1)}
+        reference = full_recompute(role, state, devices)
+        row["max_abs_diff"] = max(abs(reference[cat] - ledger.totals[cat]) for cat in engine.CATEGORIES)
+        report.append(row)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Load test for app.py: rerun latency per page and session state memory per session.
+
+Drives the real app headlessly with Streamlit's AppTest through intro -> main -> results
+for N simulated sessions, all in one process so they share caches like sessions on one
+worker do. Each session picks a role, a number of devices, slider values and AI query
+counts from a seeded RNG, and every widget interaction is one rerun, as in the browser.
+
+Usage: python benchmarks/loadtest.py [--sessions 50] [--seed 0] [--max-p95-ms 500] [--max-session-kb 64]
+Prints one JSON object and exits with status 1 if a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+sys.path.insert(0, ROOT)
+
+import engine  # noqa: E402
+
+STATE_GROUPS = ["device_list", "device_inputs", "results", "sections", "inputs"]
+
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by ``obj`` and everything it references."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(v, seen) for v in obj)
+    elif isinstance(obj, np.ndarray):
+        size += 0 if obj.base is None else obj.nbytes
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def session_memory(at):
+    state = at.session_state.to_dict()
+    seen = set()
+    out = {group: deep_size(state[group], seen) for group in STATE_GROUPS if group in state}
+    out["widgets"] = sum(deep_size(v, seen) for k, v in state.items() if k not in STATE_GROUPS)
+    out["total"] = sum(out.values())
+    return out
+
+
+class Session:
+    """One simulated user; ``step`` reruns the app and records the latency of the page it was on."""
+
+    def __init__(self, rng, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.rng = rng
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.latencies = []
+        self.reruns = 0
+
+    def step(self):
+        page = self.at.session_state.get("page", "intro") if self.reruns else "intro"
+        t = time.perf_counter()
+        self.at.run()
+        self.latencies.append((page, (time.perf_counter() - t) * 1000))
+        self.reruns += 1
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def button(self, prefix):
+        return next(b for b in self.at.button if b.label.startswith(prefix))
+
+    def run(self):
+        rng, at = self.rng, self.at
+        self.step()
+
+        # --- intro ---
+        at.selectbox[0].set_value(rng.choice(engine.ROLES))
+        self.step()
+        self.button("➡️").click()
+        self.step()
+
+        # --- main ---
+        for _ in range(rng.randint(0, 5)):
+            at.selectbox[0].set_value(rng.choice(engine.DEVICES))
+            self.step()
+            self.button("➕").click()
+            self.step()
+        for device_id in at.session_state.device_list:
+            if rng.random() < 0.5:
+                at.number_input(key=f"{device_id}_years").set_value(rng.choice([2.0, 3.5, 5.0, 8.0]))
+                self.step()
+            if rng.random() < 0.3:
+                at.selectbox(key=f"{device_id}_eol").set_value(rng.choice(engine.EOL_OPTIONS))
+                self.step()
+        role = at.session_state.role
+        for act in rng.sample(list(engine.activity_factors[role]), rng.randint(1, 4)):
+            at.slider(key=act).set_value(rng.choice([0.5, 1.0, 2.0, 3.0, 4.5]))
+            self.step()
+        for task in rng.sample(engine.AI_TASKS, rng.randint(0, 3)):
+            at.number_input(key=task).set_value(rng.randint(1, 40))
+            self.step()
+        self.button("🌍").click()
+        self.step()
+        reruns = self.reruns
+
+        # --- results ---
+        if at.session_state.page != "results":
+            raise RuntimeError(f"calculation ended on page {at.session_state.page!r}")
+        if rng.random() < 0.3:
+            at.toggle(key="show_bands").set_value(True)
+            self.step()
+        return reruns, session_memory(at)
+
+
+def percentiles(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"reruns": len(values), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": max(values)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed for a single rerun")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="budget for the p95 rerun latency of every page")
+    parser.add_argument("--max-session-kb", type=float, default=None, help="budget for session state held per session")
+    args = parser.parse_args(argv)
+
+    latencies, reruns, memory, errors = {}, [], [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        # peers.py reads this when the app first imports it
+        os.environ["CF50_PEERS_DB"] = os.path.join(tmp, "peers.sqlite3")
+        for i in range(args.sessions):
+            session = Session(random.Random(args.seed * 1_000_003 + i), args.timeout)
+            try:
+                n, mem = session.run()
+                reruns.append(n)
+                memory.append(mem)
+            except Exception as e:  # noqa: BLE001 - reported, not raised
+                errors.append(f"session {i}: {e}")
+            for page, ms in session.latencies:
+                latencies.setdefault(page, []).append(ms)
+
+    report = {
+        "sessions": args.sessions,
+        "completed": len(reruns),
+        "pages": {page: percentiles(values) for page, values in latencies.items()},
+        "reruns_per_calculation": {"mean": float(np.mean(reruns)) if reruns else None,
+                                   "max": max(reruns, default=None)},
+        "session_state_bytes": {
+            "p50": float(np.percentile([m["total"] for m in memory], 50)) if memory else None,
+            "max": max((m["total"] for m in memory), default=None),
+            "mean_by_key": {key: float(np.mean([m.get(key, 0) for m in memory]))
+                            for key in STATE_GROUPS + ["widgets"]} if memory else {}
+        },
+        "errors": errors
+    }
+
+    failures = []
+    if errors:
+        failures.append(f"{len(errors)} sessions failed")
+    if args.max_p95_ms is not None:
+        failures += [f"{page} p95 {stats['p95_ms']:.0f} ms > {args.max_p95_ms:.0f}"
+                     for page, stats in report["pages"].items() if stats["p95_ms"] > args.max_p95_ms]
+    if args.max_session_kb is not None and memory and report["session_state_bytes"]["max"] > args.max_session_kb * 1024:
+        failures.append(f"session state {report['session_state_bytes']['max'] / 1024:.1f} KB > {args.max_session_kb:.0f}")
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Payload budget for app.py: bytes sent over the websocket per page.
+
+Renders the intro, main and results pages headlessly with AppTest and counts the bytes
+of every message the app sends, using the metrics hooks. The results page is measured
+with the default SVG chart and with the interactive Plotly chart. Plotly.js itself is a
+static asset the browser downloads once the first Plotly chart appears, on top of these
+numbers.
+
+Usage: python benchmarks/payload.py [--devices 3] [--max-results-kb 30]
+Prints one JSON object and exits with status 1 if a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+sys.path.insert(0, ROOT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=3, help="devices added on the main page")
+    parser.add_argument("--max-results-kb", type=float, default=None, help="budget for the default results page")
+    parser.add_argument("--max-page-kb", type=float, default=None, help="budget for the intro and main pages")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CF50_PEERS_DB"] = os.path.join(tmp, "peers.sqlite3")
+        os.environ["CF50_METRICS"] = "1"
+        os.environ.pop("CF50_METRICS_PORT", None)
+        import metrics
+        from streamlit.testing.v1 import AppTest
+
+        def sent(at):
+            before = sum(v for (name, _), v in metrics.REGISTRY.counters.items() if name == "payload_bytes_total")
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            return sum(v for (name, _), v in metrics.REGISTRY.counters.items() if name == "payload_bytes_total") - before
+
+        at = AppTest.from_file(APP, default_timeout=120)
+        report = {"intro": sent(at)}
+        at.selectbox[0].set_value("Student")
+        at.button[0].click()
+        at.run()
+        report["main"] = sent(at)
+        for _ in range(args.devices):
+            at.button[0].click()
+            at.run()
+        report[f"main_{args.devices}_devices"] = sent(at)
+        next(b for b in at.button if b.label.startswith("🌍")).click()
+        at.run()
+        report["results_svg"] = sent(at)
+        at.toggle(key="interactive_chart").set_value(True)
+        report["results_plotly"] = sent(at)
+        at.toggle(key="interactive_chart").set_value(False)
+        at.toggle(key="show_bands").set_value(True)
+        report["results_svg_bands"] = sent(at)
+
+    failures = []
+    if args.max_results_kb is not None and report["results_svg"] > args.max_results_kb * 1024:
+        failures.append(f"results_svg {report['results_svg'] / 1024:.1f} KB > {args.max_results_kb:.0f}")
+    if args.max_page_kb is not None:
+        failures += [f"{page} {report[page] / 1024:.1f} KB > {args.max_page_kb:.0f}"
+                     for page in report if not page.startswith("results") and report[page] > args.max_page_kb * 1024]
+    print(json.dumps({"bytes": report, "failures": failures}, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Report throughput: ``--reports`` department reports through ``ReportPool``.
+
+Builds ``--reports`` random department requests and renders each as PDF and CSV through
+a thread pool and through a process pool, submitting every request twice so the
+duplicates share the pending job. A second pass over the same requests is served from
+the cache. Reports are kept in memory; ``reports.write_reports`` adds only file writes.
+
+Usage: python benchmarks/reports.py [--reports 1000] [--workers 2]
+Prints one JSON object.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import factors  # noqa: E402
+import reports  # noqa: E402
+from engine import CATEGORIES  # noqa: E402
+
+
+def department(i, rng, version):
+    respondents = rng.randint(5, 500)
+    totals = {cat: respondents * rng.uniform(-20 if cat == "E-Waste" else 0, 600) for cat in CATEGORIES}
+    return reports.request(totals, version, title=f"Department: {i:04d}",
+                           subtitle=f"Digital carbon footprint of {respondents:,} respondents",
+                           respondents=respondents)
+
+
+def run(requests, pool, passes=1):
+    start = time.perf_counter()
+    jobs = []
+    for _ in range(passes):
+        for req in requests:
+            for kind in reports.FORMATS:
+                jobs.append(pool.submit(kind, req, block=True))
+    done, _ = wait(jobs)
+    seconds = time.perf_counter() - start
+    size = sum(len(job.result()) for job in done)
+    return {"jobs": len(jobs), "seconds": round(seconds, 3), "reports_per_s": round(len(jobs) / seconds, 1),
+            "mb": round(size / 1e6, 1), **pool.stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=reports.WORKERS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    version = factors.active().version
+    requests = [department(i, rng, version) for i in range(args.reports)]
+    report = {"reports": args.reports, "formats": list(reports.FORMATS), "workers": args.workers}
+
+    pool = reports.ReportPool(args.workers, cache_size=2 * args.reports)
+    report["threads"] = run(requests, pool, passes=2)
+    pool.stats.update(dict.fromkeys(pool.stats, 0))
+    report["threads_cached"] = run(requests, pool)
+    pool.close()
+
+    pool = reports.ReportPool(args.workers, cache_size=2 * args.reports, processes=True)
+    report["processes"] = run(requests, pool, passes=2)
+    pool.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Re-scoring stored peer results under a new factor version: one vectorized pass vs row by row.
+
+Fills a temporary peer store with ``--results`` random submissions (each with its share
+token) scored with the active factor version, publishes a copy of that version with every
+number changed as ``bench``, then times ``PeerStore.rescore`` against scoring each stored
+token on its own with ``engine.score_one``. Checks that both give the same totals.
+
+Usage: python benchmarks/rescore.py [--results 20000]
+Prints one JSON object.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import engine  # noqa: E402
+import factors  # noqa: E402
+import peers  # noqa: E402
+import share  # noqa: E402
+
+
+def submission(rng):
+    role = rng.choice(engine.ROLES)
+    return {
+        "role": role,
+        "activities": {act: rng.randint(0, 8) / 2 for act in engine.activity_factors[role]},
+        "email_plain": rng.choice(engine.EMAIL_BUCKETS),
+        "email_attach": rng.choice(engine.EMAIL_BUCKETS),
+        "cloud": rng.choice(engine.CLOUD_BUCKETS),
+        "wifi": rng.randint(0, 8),
+        "pages": rng.randint(0, 10),
+        "idle": rng.choice(engine.idle_options),
+        "ai": {task: rng.randint(0, 5) for task in engine.AI_TASKS},
+        "devices": [{"device": rng.choice(engine.DEVICES), "years": rng.randint(1, 8),
+                     "used": rng.choice(engine.used_options), "shared": rng.choice(engine.shared_options),
+                     "eol": rng.choice(engine.EOL_OPTIONS)} for _ in range(rng.randint(1, 4))]
+    }
+
+
+def scaled(data, rng):
+    # Every number of the dataset times a random factor, labels unchanged
+    if isinstance(data, dict):
+        return {key: scaled(value, rng) for key, value in data.items()}
+    if isinstance(data, (int, float)) and not isinstance(data, bool):
+        return data * rng.uniform(0.5, 1.5)
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    base = factors.active()
+    report = {"results": args.results, "from": base.version}
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(factors.FACTOR_DIR, f"{base.version}.json"), tmp)
+        with open(os.path.join(tmp, "bench.json"), "w", encoding="utf-8") as f:
+            json.dump({**scaled(base.data, rng), "days": base.DAYS, "idle_hours": base.data["idle_hours"]}, f,
+                      ensure_ascii=False)
+        new = factors.load("bench", tmp)
+        store = peers.PeerStore(os.path.join(tmp, "peers.sqlite3"))
+        tokens = []
+        for _ in range(args.results):
+            inputs = submission(rng)
+            tokens.append(share.encode(inputs))
+            store.submit(inputs["role"], engine.score_one(inputs, base), base.version, tokens[-1])
+        store.flush()
+
+        start = time.perf_counter()
+        report["rescored"] = store.rescore(new)
+        report["vectorized_seconds"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        row_totals = [sum(engine.score_one(share.decode(token), new).values()) for token in tokens]
+        report["row_by_row_seconds"] = round(time.perf_counter() - start, 3)
+
+        with sqlite3.connect(store.path) as conn:
+            stored = [row[0] for row in conn.execute("SELECT total FROM results ORDER BY id")]
+        store.close()
+        report["speedup"] = round(report["row_by_row_seconds"] / report["vectorized_seconds"], 1)
+        report["max_abs_diff"] = max(abs(a - b) for a, b in zip(stored, row_totals))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Startup budget for app.py: time-to-first-paint of the intro page and memory per worker.
+
+Every run starts a fresh interpreter so already-imported modules can't hide import
+costs. The intro page is rendered headlessly with Streamlit's AppTest, then the
+results page, recording resident memory and whether pandas/Plotly got loaded.
+
+Usage: python benchmarks/startup.py [--runs 5] [--max-paint-ms 2500] [--max-rss-mb 250]
+Prints one JSON object and exits with status 1 if a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def heavy():
+    return {name: name in sys.modules for name in ["pandas", "plotly.express"]}
+
+
+t_import = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+t_intro = time.perf_counter()
+out = {
+    "import_ms": (t_import - t0) * 1000,
+    "intro_paint_ms": (t_intro - t0) * 1000,
+    "intro_run_ms": (t_intro - t_import) * 1000,
+    "intro_rss_mb": rss_mb(),
+    "intro_modules": heavy(),
+}
+at.session_state.page = "results"
+at.session_state.role = "Student"
+at.session_state.results = {"Devices": 120.0, "E-Waste": -20.0, "Digital Activities": 300.0, "AI Tools": 8.0}
+t = time.perf_counter()
+at.run()
+out["results_run_ms"] = (time.perf_counter() - t) * 1000
+out["results_rss_mb"] = rss_mb()
+out["results_modules"] = heavy()
+out["errors"] = [str(e.value) for e in at.exception]
+print(json.dumps(out))
+"""
+
+
+def run_once(env):
+    proc = subprocess.run([sys.executable, "-c", CHILD, APP], env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-paint-ms", type=float, default=None, help="budget for the intro time-to-first-paint")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="budget for worker memory after the intro page")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, CF50_PEERS_DB=os.path.join(tmp, "peers.sqlite3"))
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    report = {key: statistics.median(r[key] for r in runs)
+              for key in ["import_ms", "intro_paint_ms", "intro_run_ms", "intro_rss_mb", "results_run_ms", "results_rss_mb"]}
+    report["intro_loads_charting"] = any(any(r["intro_modules"].values()) for r in runs)
+    report["errors"] = sorted({e for r in runs for e in r["errors"]})
+    report["runs"] = args.runs
+
+    failures = []
+    if report["intro_loads_charting"]:
+        failures.append("intro page imported pandas or plotly.express")
+    if args.max_paint_ms is not None and report["intro_paint_ms"] > args.max_paint_ms:
+        failures.append(f"intro_paint_ms {report['intro_paint_ms']:.0f} > {args.max_paint_ms:.0f}")
+    if args.max_rss_mb is not None and report["intro_rss_mb"] > args.max_rss_mb:
+        failures.append(f"intro_rss_mb {report['intro_rss_mb']:.0f} > {args.max_rss_mb:.0f}")
+    if report["errors"]:
+        failures.append("app raised exceptions")
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""HTML fragments of the results page, built once per distinct result and shared by all sessions."""
+import random
+from functools import lru_cache
+
+from engine import CATEGORIES, equivalences, most_impact_category
+from factors import active as active_factors, load as load_factors
+
+PLOT_KEYS = ["Devices", "Digital Activities", "AI Tools", "E-Waste"]
+PLOT_LABELS = ["Devices", "Digital Activities", "Artificial Intelligence", "E-Waste"]
+
+DETAILED_TIPS = {
+    "Devices": [
+        "<b>Turn off devices when not in use</b> – Even in standby mode, they consume energy. Powering them off saves electricity and extends their lifespan.",
+        "<b>Update software regularly</b> – This enhances efficiency and performance, often reducing energy consumption.",
+        "<b>Activate power-saving settings, reduce screen brightness and enable dark mode</b> – This lower energy use.",
+        "<b>Choose accessories made from recycled or sustainable materials</b> – This minimizes the environmental impact of your tech choices."
+    ],
+    "E-Waste": [
+        "<b>Avoid upgrading devices every year</b> – Extending device lifespan significantly reduces environmental impact.",
+        "<b>Repair instead of replacing</b> – Fix broken electronics whenever possible to avoid unnecessary waste.",
+        "<b>Consider buying refurbished devices</b> – They’re often as good as new, but with a much lower environmental footprint.",
+        "<b>Recycle unused electronics properly</b> – Don’t store old devices at home or dispose of them in the environment! E-waste contains polluting and valuable materials that need specialized treatment."
+    ],
+    "Digital Activities": [
+        "<b>Use your internet mindfully</b> – Close unused apps, avoid sending large attachments, and turn off video during calls when not essential.",
+        "<b>Declutter your digital space</b> – Regularly delete unnecessary files, empty trash and spam folders, and clean up cloud storage to reduce digital pollution.",
+        "<b>Share links instead of attachments</b> – For example, link to a document on OneDrive or Google Drive instead of attaching it in an email.",
+        "<b>Use instant messaging for short, urgent messages</b> – It's more efficient than email for quick communications."
+    ],
+    "Artificial Intelligence": [
+        "<b>Use search engines for simple tasks</b> – They consume far less energy than AI tools.",
+        "<b>Disable AI-generated results in search engines</b> – (e.g., on Bing: go to Settings > Search > Uncheck \"Include AI-powered answers\" or similar option)",
+        "<b>Prefer smaller AI models when possible</b> – For basic tasks, use lighter versions like GPT-4o-mini instead of more energy-intensive models.",
+        "<b>Be concise in AI prompts and require concise answers</b> – Short inputs and outputs require less processing."
+    ]
+}
+
+
+TIP_CARD = """
+    <div style="background-color: #e3fced; padding: 15px; border-radius: 10px; margin-bottom: 10px;">
+        {tip}
+    </div>
+"""
+
+
+def results_key(role, results, version=None):
+    """Cache key of a results page: the role, the results rounded to the precision shown and
+    the factor version (its equivalences); ``version`` defaults to the active one."""
+    return role, tuple(round(float(results[cat]), 2) for cat in CATEGORIES), version or active_factors().version
+
+
+@lru_cache(maxsize=4096)
+def results_cards(key):
+    """Total card, breakdown grid, tips and equivalence cards for a ``results_key``."""
+    role, values, version = key
+    res = dict(zip(CATEGORIES, values))
+    total = sum(values)
+
+    total_card = f"""
+        <div style="background-color:#d8f3dc; border-left: 6px solid #1b4332;
+                    padding: 1em 1.5em; margin-top: 20px; border-radius: 10px;">
+            <h3 style="margin: 0; font-size: 1.6em;">🌱 Total CO₂e:</h3>
+            <p style="font-size: 2.2em; font-weight: bold; color: #1b4332; margin: 0;">
+                {total:.0f} kg/year
+            </p>
+        </div>
+    """
+
+    breakdown = f"""
+        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 15px;">
+            <div class="tip-card" style="text-align:center;">
+                <div style="font-size: 2em;">💻</div>
+                <div style="font-size: 1.2em;"><b>{res['Devices']:.2f} kg</b></div>
+                <div style="color: #555;">Devices</div>
+            </div>
+            <div class="tip-card" style="text-align:center;">
+                <div style="font-size: 2em;">🗑️</div>
+                <div style="font-size: 1.2em;"><b>{res['E-Waste']:.2f} kg</b></div>
+                <div style="color: #555;">E-Waste</div>
+            </div>
+            <div class="tip-card" style="text-align:center;">
+                <div style="font-size: 2em;">📡</div>
+                <div style="font-size: 1.2em;"><b>{res['Digital Activities']:.2f} kg</b></div>
+                <div style="color: #555;">Digital Activities</div>
+            </div>
+            <div class="tip-card" style="text-align:center;">
+                <div style="font-size: 2em;">🤖</div>
+                <div style="font-size: 1.2em;"><b>{res['AI Tools']:.2f} kg</b></div>
+                <div style="color: #555;">AI Tools</div>
+            </div>
+        </div>
+    """
+
+    most_impact_cat = dict(zip(PLOT_KEYS, PLOT_LABELS))[most_impact_category(res)]
+
+    # Seeded by the result itself, so the bonus tips don't change on every rerun
+    rng = random.Random(repr(key))
+    other_categories = [cat for cat in DETAILED_TIPS if cat != most_impact_cat]
+    extra_tips = [rng.choice(DETAILED_TIPS[cat]) for cat in rng.sample(other_categories, 3)]
+
+    eq = equivalences(total, load_factors(version))
+
+    equivalence_grid = f"""
+        <div class="equiv-grid">
+            <div class="equiv-card">
+                <div class="equiv-emoji">🍔</div>
+                <div class="equiv-text">
+                    Produce <span class="equiv-value">~{eq['burgers']:.0f}</span> beef burgers
+                </div>
+            </div>
+            <div class="equiv-card">
+                <div class="equiv-emoji">💡</div>
+                <div class="equiv-text">
+                    Keep 100 LED bulbs (10W) on for <span class="equiv-value">~{eq['led_days']:.0f}</span> days
+                </div>
+            </div>
+            <div class="equiv-card">
+                <div class="equiv-emoji">🚗</div>
+                <div class="equiv-text">
+                    Drive a gasoline car for <span class="equiv-value">~{eq['car_km']:.0f}</span> km
+                </div>
+            </div>
+            <div class="equiv-card">
+                <div class="equiv-emoji">📺</div>
+                <div class="equiv-text">
+                    Watch Netflix for <span class="equiv-value">~{eq['netflix_hours']:.0f}</span> hours
+                </div>
+            </div>
+        </div>
+    """
+
+    return {
+        "total": total,
+        "total_card": total_card,
+        "breakdown": breakdown,
+        "most_impact_cat": most_impact_cat,
+        "tips": [TIP_CARD.format(tip=tip) for tip in DETAILED_TIPS[most_impact_cat]],
+        "extra_tips": [TIP_CARD.format(tip=tip) for tip in extra_tips],
+        "equivalences": equivalence_grid
+    }
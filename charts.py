@@ -0,0 +1,107 @@
+"""Server-side SVG rendering of the results breakdown, so the default results page
+doesn't need Plotly: a few kilobytes of markup instead of the figure JSON and Plotly.js."""
+import math
+from functools import lru_cache
+from html import escape
+
+COLORS = ["#95d5b2", "#74c69d", "#52b788", "#1b4332"]
+BACKGROUND = "#f1faee"
+FONT = "Inter, 'Source Sans', sans-serif"
+
+WIDTH, HEIGHT = 700, 400
+LEFT, RIGHT, TOP, BOTTOM = 165, 25, 20, 55
+
+
+def _ticks(lo, hi, target=6):
+    step = 10 ** math.floor(math.log10((hi - lo) / target))
+    for mult in (1, 2, 2.5, 5, 10):
+        if (hi - lo) / (step * mult) <= target:
+            step *= mult
+            break
+    first = math.ceil(lo / step) * step
+    return [round(first + i * step, 10) for i in range(int((hi - first) / step + 1e-9) + 1)]
+
+
+def _fmt(v):
+    return f"{v:,.0f}" if abs(v) >= 10 or v == int(v) else f"{v:g}"
+
+
+@lru_cache(maxsize=2048)
+def breakdown_svg(labels, values, low=None, high=None):
+    """Horizontal bar chart of ``values`` as an inline SVG string, styled like the Plotly chart.
+
+    All arguments are tuples (so results can be cached); ``low``/``high`` draw whiskers.
+    The first label is drawn at the bottom, as Plotly does for horizontal bars.
+    """
+    ends = list(values) + list(low or ()) + list(high or ())
+    lo, hi = min(0.0, *ends), max(0.0, *ends)
+    if hi == lo:
+        hi = lo + 1.0
+    pad = (hi - lo) * 0.05
+    lo, hi = lo - (pad if lo < 0 else 0), hi + pad
+    plot_w, plot_h = WIDTH - LEFT - RIGHT, HEIGHT - TOP - BOTTOM
+
+    def x(v):
+        return LEFT + (v - lo) / (hi - lo) * plot_w
+
+    band = plot_h / len(values)
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" width="100%" '
+             f'role="img" aria-label="Breakdown by category" style="font-family:{FONT};font-size:13px">',
+             f'<rect width="{WIDTH}" height="{HEIGHT}" fill="{BACKGROUND}"/>']
+    for t in _ticks(lo, hi):
+        parts.append(f'<line x1="{x(t):.1f}" y1="{TOP}" x2="{x(t):.1f}" y2="{TOP + plot_h}" '
+                     f'stroke="{"#2a3f5f" if t == 0 else "white"}" stroke-width="{1 if t == 0 else 1.5}"/>')
+        parts.append(f'<text x="{x(t):.1f}" y="{TOP + plot_h + 18}" text-anchor="middle" fill="#2a3f5f">{_fmt(t)}</text>')
+    for i, (label, value) in enumerate(zip(labels, values)):
+        y = TOP + plot_h - (i + 1) * band
+        x0, x1 = sorted((x(0.0), x(value)))
+        tip = f"{label}: {value:.1f} kg CO₂e"
+        if low is not None:
+            tip += f" (P5 {low[i]:.1f}, P95 {high[i]:.1f})"
+        parts.append(f'<rect x="{x0:.1f}" y="{y + band * 0.1:.1f}" width="{x1 - x0:.1f}" height="{band * 0.8:.1f}" '
+                     f'fill="{COLORS[i % len(COLORS)]}" stroke="white" stroke-width="1.5"><title>{escape(tip)}</title></rect>')
+        parts.append(f'<text x="{LEFT - 8}" y="{y + band / 2 + 4:.1f}" text-anchor="end" fill="#2a3f5f">{escape(label)}</text>')
+        if low is not None:
+            cy, a, b = y + band / 2, x(low[i]), x(high[i])
+            parts.append(f'<path d="M{a:.1f} {cy - 6:.1f}v12M{a:.1f} {cy:.1f}H{b:.1f}M{b:.1f} {cy - 6:.1f}v12" '
+                         f'stroke="#2a3f5f" stroke-width="1.5" fill="none"/>')
+    parts.append(f'<text x="{LEFT + plot_w / 2:.1f}" y="{HEIGHT - 12}" text-anchor="middle" fill="#2a3f5f">CO₂e (kg)</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+@lru_cache(maxsize=256)
+def breakdown_figure(labels, values, low=None, high=None):
+    """The interactive Plotly version of ``breakdown_svg``; imports pandas and Plotly on first use."""
+    import pandas as pd
+    import plotly.express as px
+
+    df_plot = pd.DataFrame({
+        "Category": list(labels),
+        "CO₂e (kg)": list(values)
+    })
+
+    error_bars = {}
+    if low is not None:
+        df_plot["P5"] = list(low)
+        df_plot["P95"] = list(high)
+        df_plot["err_plus"] = (df_plot["P95"] - df_plot["CO₂e (kg)"]).clip(lower=0)
+        df_plot["err_minus"] = (df_plot["CO₂e (kg)"] - df_plot["P5"]).clip(lower=0)
+        error_bars = {"error_x": "err_plus", "error_x_minus": "err_minus", "hover_data": {"P5": ":.1f", "P95": ":.1f", "err_plus": False, "err_minus": False}}
+
+    fig = px.bar(df_plot,
+                 x="CO₂e (kg)",
+                 y="Category",
+                 orientation="h",
+                 color="Category",
+                 color_discrete_sequence=COLORS,
+                 height=400,
+                 **error_bars)
+
+    fig.update_layout(showlegend=False,
+                      plot_bgcolor=BACKGROUND,
+                      paper_bgcolor=BACKGROUND,
+                      font_family="Inter")
+
+    fig.update_traces(marker=dict(line=dict(width=1.5, color='white')))
+    return fig
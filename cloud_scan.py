@@ -0,0 +1,180 @@
+"""Measured cloud storage from a local sync folder, in place of the ``cloud`` bucket guess.
+
+Usage: python cloud_scan.py FOLDER [--top 10] [--depth 2] [--workers N] [--cache PATH | --no-cache]
+
+FOLDER is the local mirror of a OneDrive, Google Drive, iCloud or Dropbox account. Sizes
+are the logical file sizes, which is what the provider stores (online-only placeholders
+count at their full size). Symlinks are not followed, and a file hard-linked several
+times inside the folder is counted once.
+
+Directories are listed with ``os.scandir`` on a thread pool; only the directories waiting
+to be listed and one running total per directory near the top are kept in memory, never
+the file tree. Each directory's result is cached by its mtime in a SQLite file, so a
+rescan only re-lists directories whose entries changed. A file rewritten in place under
+the same name does not change its directory's mtime; sync clients normally write a
+temporary file and rename it, which does, and ``--no-cache`` forces a full scan.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import engine
+
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "cf50_cloud_scan.sqlite3")
+GB = 1e9  # providers quote decimal gigabytes
+QUEUED_PER_WORKER = 4
+
+
+# --- CACHE ---
+class DirCache:
+    """Per-directory listings keyed by path and mtime; used from one thread only."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER, bytes INTEGER,"
+                          " files INTEGER, subdirs TEXT, links TEXT, scan INTEGER)")
+        self.scan_id = (self.conn.execute("SELECT MAX(scan) FROM dirs").fetchone()[0] or 0) + 1
+        self.pending = []
+
+    def get(self, path):
+        row = self.conn.execute("SELECT mtime_ns, bytes, files, subdirs, links FROM dirs WHERE path = ?",
+                                (path,)).fetchone()
+        if row is None:
+            return None
+        mtime_ns, size, files, subdirs, links = row
+        return mtime_ns, size, files, subdirs.split("\0") if subdirs else [], [tuple(link) for link in json.loads(links)]
+
+    def put(self, path, listing):
+        mtime_ns, size, files, subdirs, links = listing
+        self.pending.append((path, mtime_ns, size, files, "\0".join(subdirs), json.dumps(links), self.scan_id))
+        if len(self.pending) >= 10_000:
+            self.flush()
+
+    def flush(self):
+        self.conn.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?, ?)", self.pending)
+        self.pending.clear()
+
+    def prune(self, root):
+        """Drop directories under ``root`` that the last scan didn't reach (deleted or renamed)."""
+        self.flush()
+        below = root.rstrip(os.sep) + os.sep
+        self.conn.execute("DELETE FROM dirs WHERE scan != ? AND (path = ? OR (path >= ? AND path < ?))",
+                          (self.scan_id, root, below, below[:-1] + chr(ord(os.sep) + 1)))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+# --- SCANNING ---
+def list_dir(path, cached=None):
+    """``(mtime_ns, bytes, files, subdirs, links)`` of one directory, or ``cached`` if it is unchanged.
+
+    ``bytes`` covers files with a single link; multiply-linked files are returned in
+    ``links`` as ``(device, inode, size)`` so the caller can count each one once.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    if cached is not None and cached[0] == mtime_ns:
+        return cached
+    size = files = 0
+    subdirs, links = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    if st.st_nlink > 1:
+                        links.append((st.st_dev, st.st_ino, st.st_size))
+                    else:
+                        size += st.st_size
+                    files += 1
+            except OSError:
+                continue  # vanished or unreadable while listing
+    return mtime_ns, size, files, subdirs, links
+
+
+def scan(root, workers=None, cache=None, depth=2, top=10):
+    """Total size of ``root`` and its largest directories up to ``depth`` levels below it."""
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise ValueError(f"Not a directory: {root}")
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    seen_links = set()
+    subtree = {}  # relative path (depth <= ``depth``) -> bytes
+    total = files = dirs = reused = errors = 0
+
+    with ThreadPoolExecutor(workers) as pool:
+        stack, running = [root], {}
+        while stack or running:
+            while stack and len(running) < workers * QUEUED_PER_WORKER:
+                path = stack.pop()
+                cached = cache.get(path) if cache is not None else None
+                running[pool.submit(list_dir, path, cached)] = path, cached
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, cached = running.pop(future)
+                try:
+                    listing = future.result()
+                except OSError:
+                    errors += 1
+                    continue
+                if cache is not None:
+                    cache.put(path, listing)
+                _, size, n_files, subdirs, links = listing
+                for device, inode, link_size in links:
+                    if (device, inode) not in seen_links:
+                        seen_links.add((device, inode))
+                        size += link_size
+                total += size
+                files += n_files
+                dirs += 1
+                reused += listing is cached
+                parts = os.path.relpath(path, root).split(os.sep) if path != root else []
+                for k in range(min(depth, len(parts)) + 1):
+                    key = os.sep.join(parts[:k]) or "."
+                    subtree[key] = subtree.get(key, 0) + size
+                stack.extend(os.path.join(path, name) for name in subdirs)
+
+    if cache is not None:
+        cache.prune(root)
+    largest = sorted(((path, size) for path, size in subtree.items() if path != "."), key=lambda item: -item[1])
+    gb = total / GB
+    return {
+        "folder": root,
+        "gb": round(gb, 3),
+        "kg_co2e": round(gb * engine.CLOUD_KG_PER_GB, 3),
+        "files": files,
+        "directories": dirs,
+        "cached_directories": reused,
+        "unreadable_directories": errors,
+        "largest": [{"path": path, "gb": round(size / GB, 3)} for path, size in largest[:top]]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--top", type=int, default=10, help="number of largest directories to list")
+    parser.add_argument("--depth", type=int, default=2, help="how many levels below FOLDER to break down")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+    cache = None if args.no_cache else DirCache(args.cache)
+    try:
+        print(json.dumps(scan(args.folder, args.workers, cache, args.depth, args.top), indent=2, ensure_ascii=False))
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import numpy as np
+
+import factors as _factors
+from factors import FACTOR_NAMES, active as active_factors
+
+# === EMISSION FACTORS ===
+# The numbers live in versioned datasets under factor_data/ (see factors.py). The labels
+# below are the questionnaire's options, the same in every version. ``engine.DAYS``,
+# ``engine.ACTIVITY_EF`` and the other numbers are read from the active version, and each
+# scoring function takes ``factors=`` to score with another one.
+_startup = _factors.startup()
+
+activity_factors = _startup.data["activity_factors"]
+ai_factors = _startup.data["ai_factors"]
+device_ef = _startup.data["device_ef"]
+eol_modifier = _startup.data["eol_modifier"]
+emails = _startup.data["emails"]
+cloud_gb = _startup.data["cloud_gb"]
+idle_options = list(_startup.data["idle_kg_per_hour"])
+used_options = list(_startup.data["lifespan_multiplier"])
+shared_options = list(_startup.data["lifespan_multiplier"][used_options[0]])
+
+CATEGORIES = ["Devices", "E-Waste", "Digital Activities", "AI Tools"]
+
+# === COMPILED LOOKUP ARRAYS ===
+# Option order of the arrays of every FactorSet
+ROLES = list(activity_factors)
+ACTIVITIES = list(dict.fromkeys(act for acts in activity_factors.values() for act in acts))
+AI_TASKS = list(ai_factors)
+DEVICES = list(device_ef)
+EOL_OPTIONS = list(eol_modifier)
+EMAIL_BUCKETS = list(emails)
+CLOUD_BUCKETS = list(cloud_gb)
+
+
+def __getattr__(name):
+    # ACTIVITY_EF, DAYS, EQUIVALENCE_KG...: the active version's, so a reload reaches every importer
+    if name in FACTOR_NAMES:
+        return getattr(active_factors(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def encode(values, options):
+    """Map labels (or integer codes) onto indices into ``options``."""
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iu":
+        return arr.astype(np.intp, copy=False)
+    uniq, inverse = np.unique(arr, return_inverse=True)
+    lookup = {label: i for i, label in enumerate(options)}
+    try:
+        codes = np.array([lookup[label] for label in uniq.tolist()], dtype=np.intp)
+    except KeyError as e:
+        raise ValueError(f"Unknown option {e.args[0]!r}, expected one of {list(options)}") from None
+    return codes[inverse.reshape(arr.shape)]
+
+
+def _bucket(values, options, counts):
+    # Bucket labels map to their midpoint, numeric values are taken as measured counts
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iuf":
+        return arr.astype(float, copy=False)
+    return counts[encode(arr, options)]
+
+
+def _column(batch, key, n):
+    if key in batch:
+        return np.asarray(batch[key], dtype=float)
+    return np.zeros(n)
+
+
+# === SECTION TOTALS ===
+# ``factors`` is a factors.FactorSet, the active version when omitted
+def device_impacts(device, years, used, shared, eol, factors=None):
+    """Per-device production and end-of-life impact in kg CO₂e/year."""
+    f = factors or active_factors()
+    impact = f.DEVICE_EF[encode(device, DEVICES)]
+    adj_years = np.asarray(years, dtype=float) * f.LIFESPAN_MULT[encode(used, used_options), encode(shared, shared_options)]
+    prod = impact / adj_years
+    eol_impact = (impact * f.EOL_MOD[encode(eol, EOL_OPTIONS)]) / adj_years
+    return prod, eol_impact
+
+
+def activities_total(role, hours, n, factors=None):
+    f = factors or active_factors()
+    role = encode(role, ROLES)
+    total = np.zeros(n)
+    for j, act in enumerate(ACTIVITIES):
+        if act in hours:
+            total += np.asarray(hours[act], dtype=float) * f.ACTIVITY_EF[role, j] * f.DAYS
+    return total
+
+
+def habits_total(email_plain, email_attach, cloud, wifi, pages, idle, factors=None):
+    f = factors or active_factors()
+    mail_total = (_bucket(email_plain, EMAIL_BUCKETS, f.EMAIL_COUNT) * f.EMAIL_PLAIN_KG * f.DAYS
+                  + _bucket(email_attach, EMAIL_BUCKETS, f.EMAIL_COUNT) * f.EMAIL_ATTACH_KG * f.DAYS
+                  + _bucket(cloud, CLOUD_BUCKETS, f.CLOUD_COUNT) * f.CLOUD_KG_PER_GB)
+    wifi_total = np.asarray(wifi, dtype=float) * f.WIFI_KG_PER_HOUR * f.DAYS
+    print_total = np.asarray(pages, dtype=float) * f.PRINT_KG_PER_PAGE * f.DAYS
+    idle_total = f.DAYS * f.IDLE_KWH[encode(idle, idle_options)]
+    return mail_total + wifi_total + print_total + idle_total
+
+
+def ai_total(queries, n, factors=None):
+    f = factors or active_factors()
+    total = np.zeros(n)
+    for j, task in enumerate(AI_TASKS):
+        if task in queries:
+            total += np.asarray(queries[task], dtype=float) * f.AI_EF[j] * f.DAYS
+    return total
+
+
+# === BATCH SCORING ===
+def score_devices(devices, n, factors=None):
+    """Per-respondent Devices and E-Waste totals from a long-format device table."""
+    total_prod, total_eol = np.zeros(n), np.zeros(n)
+    if devices is not None and len(devices["device"]):
+        prod, eol = device_impacts(devices["device"], devices["years"], devices["used"],
+                                   devices["shared"], devices["eol"], factors)
+        owner = np.asarray(devices["respondent"], dtype=np.intp)
+        total_prod = np.bincount(owner, weights=prod, minlength=n)
+        total_eol = np.bincount(owner, weights=eol, minlength=n)
+    return {"Devices": total_prod, "E-Waste": total_eol}
+
+
+def score_digital(respondents, factors=None):
+    n = len(respondents["role"])
+    digital = activities_total(respondents["role"], respondents, n, factors)
+    digital += habits_total(respondents["email_plain"], respondents["email_attach"], respondents["cloud"],
+                            _column(respondents, "wifi", n), _column(respondents, "pages", n),
+                            respondents["idle"], factors)
+    return {"Digital Activities": digital}
+
+
+def score_ai(respondents, factors=None):
+    return {"AI Tools": ai_total(respondents, len(respondents["role"]), factors)}
+
+
+def score(respondents, devices=None, factors=None):
+    """Score a columnar batch of respondents.
+
+    ``respondents`` maps column names to equal-length arrays: ``role``, one column
+    per activity and AI task (missing columns count as zero), ``email_plain``,
+    ``email_attach``, ``cloud``, ``wifi``, ``pages`` and ``idle``. ``devices`` holds
+    one row per device with a ``respondent`` row index plus ``device``, ``years``,
+    ``used``, ``shared`` and ``eol``. ``factors`` is the ``FactorSet`` to score with
+    (default: the active version). Returns one array per category.
+    """
+    f = factors or active_factors()
+    return {
+        **score_devices(devices, len(respondents["role"]), f),
+        **score_digital(respondents, f),
+        **score_ai(respondents, f)
+    }
+
+
+
+# === RESULT SUMMARIES ===
+def most_impact_category(results):
+    """Category with the largest footprint, which the tips focus on.
+
+    Works on floats or on arrays per category (one category name per row)."""
+    stacked = np.stack([np.asarray(results[cat], dtype=float) for cat in CATEGORIES])
+    names = np.array(CATEGORIES)[stacked.argmax(axis=0)]
+    return str(names) if names.ndim == 0 else names
+
+
+def equivalences(total, factors=None):
+    """Everyday equivalents of a yearly ``total`` (float or array) in kg CO₂e."""
+    return {name: total / kg for name, kg in (factors or active_factors()).EQUIVALENCE_KG.items()}
+
+
+# === SINGLE SUBMISSIONS ===
+# The Streamlit form scores each section on its own; these wrap one submission
+# into a batch of one so the UI runs exactly the same code as batch scoring.
+def device_columns(devs):
+    return {
+        "respondent": np.zeros(len(devs), dtype=np.intp),
+        "device": [d["device"] for d in devs],
+        "years": [d["years"] for d in devs],
+        "used": [d["used"] for d in devs],
+        "shared": [d["shared"] for d in devs],
+        "eol": [d["eol"] for d in devs]
+    }
+
+
+def respondent_columns(inputs):
+    respondents = {key: [inputs[key]] for key in ["role", "email_plain", "email_attach", "cloud", "wifi", "pages", "idle"]}
+    for act, hours in inputs["activities"].items():
+        respondents[act] = [hours]
+    for task, q in inputs.get("ai", {}).items():
+        respondents[task] = [q]
+    return respondents
+
+
+def batch_of_one(inputs):
+    """Convert one form submission into the columnar layout used by ``score``."""
+    devices = device_columns(inputs["devices"])
+    fleet = inputs.get("fleet")
+    if fleet is not None and len(fleet):
+        # Department fleet columns are already option codes
+        options = {"device": DEVICES, "used": used_options, "shared": shared_options, "eol": EOL_OPTIONS}
+        merged = {key: np.concatenate([encode(devices[key], options[key]), getattr(fleet, key)]) for key in options}
+        merged["years"] = np.concatenate([np.asarray(devices["years"], dtype=float), fleet.years])
+        merged["respondent"] = np.zeros(len(merged["years"]), dtype=np.intp)
+        devices = merged
+    return respondent_columns(inputs), devices
+
+
+def batch_of_many(submissions, factors=None):
+    """Stack form submissions into one batch for ``score``; respondent ``i`` is ``submissions[i]``.
+
+    Email and cloud answers become counts with ``factors`` (default: the active version),
+    since rows may mix bucket labels and measured counts; score with the same ``factors``.
+    """
+    f = factors or active_factors()
+    n = len(submissions)
+    buckets = {"email_plain": (EMAIL_BUCKETS, f.EMAIL_COUNT), "email_attach": (EMAIL_BUCKETS, f.EMAIL_COUNT),
+               "cloud": (CLOUD_BUCKETS, f.CLOUD_COUNT)}
+    options = {"device": DEVICES, "used": used_options, "shared": shared_options, "eol": EOL_OPTIONS}
+    respondents = {key: np.zeros(n) for key in ["wifi", "pages", *ACTIVITIES, *AI_TASKS]}
+    answers = {key: [] for key in ["role", "idle", *buckets]}
+    rows = {key: [] for key in ["respondent", "years", *options]}
+    fleets = []
+    # Labels are collected row by row and encoded once per column
+    for i, inputs in enumerate(submissions):
+        for key, values in answers.items():
+            values.append(inputs[key])
+        respondents["wifi"][i] = inputs["wifi"]
+        respondents["pages"][i] = inputs["pages"]
+        for group in (inputs["activities"], inputs.get("ai", {})):
+            for key, value in group.items():
+                respondents[key][i] = value
+        for d in inputs["devices"]:
+            rows["respondent"].append(i)
+            for key in ["years", *options]:
+                rows[key].append(d[key])
+        fleet = inputs.get("fleet")
+        if fleet is not None and len(fleet):
+            fleets.append((i, fleet))
+
+    respondents["role"] = encode(answers["role"], ROLES)
+    respondents["idle"] = encode(answers["idle"], idle_options)
+    for key, (labels, counts) in buckets.items():
+        values = answers[key]
+        is_label = np.array([isinstance(value, str) for value in values], dtype=bool)
+        column = np.zeros(n)
+        column[~is_label] = [value for value in values if not isinstance(value, str)]
+        column[is_label] = counts[encode([value for value in values if isinstance(value, str)], labels)]
+        respondents[key] = column
+
+    parts = [{"respondent": np.asarray(rows["respondent"], dtype=np.intp),
+              "years": np.asarray(rows["years"], dtype=float),
+              **{key: encode(rows[key], labels) if rows[key] else np.zeros(0, dtype=np.intp)
+                 for key, labels in options.items()}}]
+    # Department fleet columns are already option codes
+    parts += [{"respondent": np.full(len(fleet), i, dtype=np.intp), "years": fleet.years,
+               **{key: getattr(fleet, key) for key in options}} for i, fleet in fleets]
+    devices = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    return respondents, devices
+
+
+def _first(res):
+    return {cat: float(values[0]) for cat, values in res.items()}
+
+
+def score_one_devices(devs, factors=None):
+    return _first(score_devices(device_columns(devs), 1, factors))
+
+
+def score_one_digital(inputs, factors=None):
+    return _first(score_digital(respondent_columns(inputs), factors))
+
+
+def score_one_ai(ai, factors=None):
+    return {"AI Tools": float(ai_total({task: [q] for task, q in ai.items()}, 1, factors)[0])}
+
+
+def score_one(inputs, factors=None):
+    """Score a single form submission (department fleet included), returning plain floats per category."""
+    res = score(*batch_of_one(inputs), factors=factors)
+    return {cat: float(res[cat][0]) for cat in CATEGORIES}
@@ -0,0 +1,226 @@
+"""Versioned emission-factor datasets, compiled once into read-only arrays shared by every session.
+
+Each version is one JSON file in ``CF50_FACTOR_DIR`` (default ``factor_data/`` next to
+this file), named after the version: ``v1.json``, ``v2.json``... The first time a version
+is loaded its numbers are compiled into one flat float64 array laid out in the order of
+the questionnaire's options, written to ``compiled/<version>-<hash>.npy`` and memory-mapped
+read-only, so every session and worker process reads the same pages and none can change
+them. When the directory isn't writable the compiled array is kept in memory instead.
+
+``CF50_FACTORS`` pins a version; without it the newest (by natural sort of the names) is
+active. ``poll()`` looks for new files at most every ``CF50_FACTOR_RELOAD`` seconds and
+switches to the newest version without a restart. A version's labels (roles, activities,
+devices, answer options...) must match the ones the app started with, since they are the
+form's widgets; only the numbers may change. A published version is never edited in
+place: a changed file under a loaded name is ignored, publish it under a new name.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
+
+FACTOR_DIR = os.environ.get("CF50_FACTOR_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "factor_data"))
+PINNED = os.environ.get("CF50_FACTORS") or None
+RELOAD_SECONDS = float(os.environ.get("CF50_FACTOR_RELOAD", "5"))
+
+# Arrays of a FactorSet, in the order they sit in the compiled file
+ARRAYS = ["ACTIVITY_EF", "AI_EF", "DEVICE_EF", "EOL_MOD", "EMAIL_COUNT", "CLOUD_COUNT", "IDLE_KWH", "LIFESPAN_MULT"]
+# Scalars and their keys in the dataset
+SCALARS = {
+    "DAYS": "days",
+    "EMAIL_PLAIN_KG": "email_plain_kg",
+    "EMAIL_ATTACH_KG": "email_attach_kg",
+    "CLOUD_KG_PER_GB": "cloud_kg_per_gb",
+    "WIFI_KG_PER_HOUR": "wifi_kg_per_hour",
+    "PRINT_KG_PER_PAGE": "print_kg_per_page"
+}
+FACTOR_NAMES = frozenset(ARRAYS) | frozenset(SCALARS) | {"EQUIVALENCE_KG"}
+
+
+def _natural(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def _schema(data):
+    """Every label a dataset defines, in order; equal schemas compile to the same layout."""
+    lifespan = data["lifespan_multiplier"]
+    return (
+        tuple((role, tuple(acts)) for role, acts in data["activity_factors"].items()),
+        tuple(data["ai_factors"]),
+        tuple(data["device_ef"]),
+        tuple(data["eol_modifier"]),
+        tuple(data["emails"]),
+        tuple(data["cloud_gb"]),
+        tuple(data["idle_kg_per_hour"]),
+        tuple(lifespan),
+        tuple(next(iter(lifespan.values()))),
+        tuple(data["equivalence_kg"])
+    )
+
+
+def _compile(data):
+    """The dataset's numbers as ``{name: array}``, one per ``ARRAYS`` entry."""
+    roles = list(data["activity_factors"])
+    activities = list(dict.fromkeys(act for acts in data["activity_factors"].values() for act in acts))
+    lifespan = data["lifespan_multiplier"]
+    hours = data["idle_hours"]
+    return {
+        # Role x activity matrix, zero where the activity is not asked for that role
+        "ACTIVITY_EF": [[data["activity_factors"][role].get(act, 0.0) for act in activities] for role in roles],
+        "AI_EF": list(data["ai_factors"].values()),
+        "DEVICE_EF": list(data["device_ef"].values()),
+        "EOL_MOD": list(data["eol_modifier"].values()),
+        "EMAIL_COUNT": list(data["emails"].values()),
+        "CLOUD_COUNT": list(data["cloud_gb"].values()),
+        # Daily idle draw over the off-hours of each answer
+        "IDLE_KWH": [kg * hours for kg in data["idle_kg_per_hour"].values()],
+        # Indexed by [used, shared]
+        "LIFESPAN_MULT": [list(row.values()) for row in lifespan.values()]
+    }
+
+
+def _mapped(path, flat):
+    """``flat`` written to ``path`` once and memory-mapped read-only, or a read-only copy if it can't be."""
+    if not os.path.exists(path):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, flat)
+            os.replace(tmp, path)  # atomic, so other processes never map a partial file
+        except OSError:
+            flat.flags.writeable = False
+            return flat
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+class FactorSet:
+    """One version of the factors: its raw ``data``, compiled arrays and scalars, all read-only."""
+
+    def __init__(self, version, data, digest, compiled_dir=None):
+        self.version = version
+        self.data = data
+        self.digest = digest
+        self.schema = _schema(data)
+        arrays = {name: np.asarray(values, dtype=float) for name, values in _compile(data).items()}
+        flat = np.concatenate([arrays[name].ravel() for name in ARRAYS])
+        path = os.path.join(compiled_dir or os.path.join(FACTOR_DIR, "compiled"), f"{version}-{digest[:16]}.npy")
+        flat = _mapped(path, flat)
+        offset = 0
+        for name in ARRAYS:
+            shape = arrays[name].shape
+            size = arrays[name].size
+            setattr(self, name, flat[offset:offset + size].reshape(shape))
+            offset += size
+        for name, key in SCALARS.items():
+            setattr(self, name, data[key])
+        self.EQUIVALENCE_KG = MappingProxyType(dict(data["equivalence_kg"]))
+
+    def __repr__(self):
+        return f"FactorSet({self.version!r})"
+
+
+# --- REGISTRY ---
+_lock = threading.RLock()
+_loaded = {}        # version -> FactorSet
+_active = None
+_startup = None
+_signature = None
+_checked = 0.0
+
+
+def versions(factor_dir=None):
+    """Version names available in ``factor_dir``, oldest first."""
+    names = [name[:-5] for name in os.listdir(factor_dir or FACTOR_DIR) if name.endswith(".json")]
+    return sorted(names, key=_natural)
+
+
+def load(version, factor_dir=None):
+    """The ``FactorSet`` of ``version``, compiled on first use and cached for the life of the process."""
+    with _lock:
+        if version in _loaded:
+            return _loaded[version]
+        path = os.path.join(factor_dir or FACTOR_DIR, f"{version}.json")
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raise ValueError(f"Unknown factor version {version!r}, expected one of {versions(factor_dir)}") from None
+        try:
+            factor_set = FactorSet(version, json.loads(raw), hashlib.sha256(raw).hexdigest(),
+                                   os.path.join(factor_dir or FACTOR_DIR, "compiled"))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Factor version {version!r} is malformed: {e!r}") from None
+        if _startup is not None and factor_set.schema != _startup.schema:
+            raise ValueError(f"Factor version {version!r} changes the questionnaire's labels; only values may change")
+        _loaded[version] = factor_set
+        return factor_set
+
+
+def startup():
+    """The version active when the process started; its labels define the questionnaire."""
+    global _startup, _active
+    with _lock:
+        if _startup is None:
+            available = versions()
+            if not available and PINNED is None:
+                raise RuntimeError(f"No factor datasets in {FACTOR_DIR}")
+            _startup = _active = load(PINNED or available[-1])
+        return _startup
+
+
+def active():
+    """The ``FactorSet`` new results are scored with."""
+    return _active or startup()
+
+
+def activate(version):
+    """Switch every session to ``version`` (loading it if needed) and return it."""
+    global _active
+    with _lock:
+        startup()
+        _active = load(version)
+        return _active
+
+
+def _directory_signature():
+    with os.scandir(FACTOR_DIR) as entries:
+        return sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in entries if e.name.endswith(".json"))
+
+
+def poll(force=False):
+    """Activate the newest version if the directory changed since the last look; returns the active set.
+
+    Checks at most every ``RELOAD_SECONDS`` (never with a pinned version or a value of 0).
+    A version that fails to load is reported on stderr and the current one stays active.
+    """
+    global _signature, _checked
+    current = active()
+    if PINNED or (RELOAD_SECONDS <= 0 and not force):
+        return current
+    now = time.monotonic()
+    if not force and now - _checked < RELOAD_SECONDS:
+        return current
+    with _lock:
+        _checked = now
+        try:
+            signature = _directory_signature()
+        except OSError:
+            return current
+        if signature == _signature:
+            return current
+        _signature = signature
+        newest = versions()[-1] if signature else current.version
+        if newest == current.version:
+            return current
+        try:
+            return activate(newest)
+        except ValueError as e:
+            print(f"factors: keeping {current.version}: {e}", file=sys.stderr)
+            return current
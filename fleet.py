@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from engine import DEVICES, EOL_OPTIONS, used_options, shared_options, device_impacts, score_devices
+
+OPTIONS = {"device": DEVICES, "used": used_options, "shared": shared_options, "eol": EOL_OPTIONS}
+DEFAULTS = {"used": "New", "shared": "Personal", "eol": "I bring it to a certified e-waste collection center"}
+COLUMNS = ["device", "years", "used", "shared", "eol"]
+IMPACT_COLUMNS = ["Production (kg CO₂e/year)", "End-of-life (kg CO₂e/year)"]
+MIN_YEARS, MAX_YEARS = 0.5, 20.0  # the lifespan range of the form's device inputs
+
+
+def _codes(values, column):
+    cat = pd.Categorical(values, categories=OPTIONS[column])
+    if (cat.codes < 0).any():
+        bad = sorted(set(pd.Series(values)[cat.codes < 0].astype(str)))[:5]
+        raise ValueError(f"Unknown {column} value(s) {bad}, expected one of {OPTIONS[column]}")
+    return cat.codes.astype(np.int8)
+
+
+class Fleet:
+    """Department device inventory stored column-wise as int8 option codes plus float lifespans."""
+
+    __slots__ = ("device", "years", "used", "shared", "eol")
+
+    def __init__(self, device, years, used, shared, eol):
+        self.device = np.asarray(device, dtype=np.int8)
+        self.years = np.asarray(years, dtype=float)
+        self.used = np.asarray(used, dtype=np.int8)
+        self.shared = np.asarray(shared, dtype=np.int8)
+        self.eol = np.asarray(eol, dtype=np.int8)
+
+    def __len__(self):
+        return len(self.device)
+
+    @classmethod
+    def from_frame(cls, frame):
+        frame = frame.rename(columns=lambda c: str(c).strip().lower())
+        missing = [c for c in ["device", "years"] if c not in frame]
+        if missing:
+            raise ValueError(f"Missing column(s) {missing}, expected {COLUMNS} and optionally 'quantity'")
+        years = pd.to_numeric(frame["years"], errors="coerce").to_numpy(dtype=float)
+        if np.isnan(years).any() or (years < MIN_YEARS).any() or (years > MAX_YEARS).any():
+            raise ValueError(f"Every device needs a lifespan between {MIN_YEARS:g} and {MAX_YEARS:g} years")
+        columns = {"years": years}
+        for column in OPTIONS:
+            if column in frame:
+                values = frame[column].str.strip()
+                if column in DEFAULTS:
+                    values = values.fillna(DEFAULTS[column])
+            else:
+                values = pd.Series(DEFAULTS[column], index=frame.index)
+            columns[column] = _codes(values, column)
+        if "quantity" in frame:
+            quantity = pd.to_numeric(frame["quantity"], errors="coerce").fillna(1).astype(np.intp).to_numpy()
+            columns = {k: np.repeat(v, quantity) for k, v in columns.items()}
+        return cls(**columns)
+
+    @classmethod
+    def from_csv(cls, source):
+        return cls.from_frame(pd.read_csv(source, dtype=str, skipinitialspace=True))
+
+    def impacts(self, factors=None):
+        return device_impacts(self.device, self.years, self.used, self.shared, self.eol, factors)
+
+    def totals(self, factors=None):
+        devices = {"respondent": np.zeros(len(self), dtype=np.intp), "device": self.device, "years": self.years,
+                   "used": self.used, "shared": self.shared, "eol": self.eol}
+        return {cat: float(values[0]) for cat, values in score_devices(devices, 1, factors).items()}
+
+    def page(self, start, stop, impacts=None):
+        """Rows ``start:stop`` as labelled frame for the editor, with their computed impacts."""
+        prod, eol = impacts if impacts is not None else self.impacts()
+        rows = slice(start, stop)
+        return pd.DataFrame({
+            "device": np.array(DEVICES, dtype=object)[self.device[rows]],
+            "years": self.years[rows],
+            "used": np.array(used_options, dtype=object)[self.used[rows]],
+            "shared": np.array(shared_options, dtype=object)[self.shared[rows]],
+            "eol": np.array(EOL_OPTIONS, dtype=object)[self.eol[rows]],
+            IMPACT_COLUMNS[0]: prod[rows],
+            IMPACT_COLUMNS[1]: eol[rows]
+        }, index=pd.RangeIndex(start, stop))
+
+    def update(self, start, frame):
+        """Write an edited page back; returns True if anything changed."""
+        rows = slice(start, start + len(frame))
+        new = {column: _codes(frame[column], column) for column in OPTIONS}
+        new["years"] = frame["years"].to_numpy(dtype=float)
+        changed = False
+        for column, values in new.items():
+            current = getattr(self, column)
+            if not np.array_equal(current[rows], values):
+                current[rows] = values
+                changed = True
+        return changed
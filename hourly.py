@@ -0,0 +1,211 @@
+"""Hourly mode: usage placed on the hours it happens, each charged at that hour's grid intensity.
+
+The flat model charges every usage term ``daily kg * DAYS``, as if all energy were drawn
+at the grid's average carbon intensity. Here each user's work day is a 24-hour profile
+per usage term (when computer work, lectures, video calls, Wi-Fi, office tasks and idle
+time happen). The profiles are laid over the work days of a year and weighted by an hourly
+grid-intensity table:
+
+    annual kg = sum over the 8760 hours of usage[h] * intensity[h] / mean(intensity)
+
+Work days are Monday to Friday, scaled so they add up to ``engine.DAYS``. With a constant
+intensity the result is exactly the flat model's, so the two stay comparable: usage in
+dirtier-than-average hours comes out higher, in cleaner hours lower. Pass ``reference``
+(the gCO₂e/kWh the emission factors assume) to also rescale to the table's own level.
+Cloud storage runs around the clock and keeps its flat value; devices and e-waste are
+not usage and are unchanged.
+
+Intensity tables are read from ``CF50_GRID_DIR`` (default ``grid_intensity/`` next to
+this file): ``<CC>.csv`` with one gCO₂e/kWh value per line for each hour of a year in
+local time (8760 or 8784 lines, an optional header line). Called without a country,
+``load_table`` returns ``placeholder_table()``: an invented daily/seasonal shape for
+trying the mode out, not measured data; its results are labelled as placeholder. A named
+country without a table is an error, never the placeholder.
+"""
+import math
+import os
+from datetime import date
+
+import numpy as np
+
+import engine
+from engine import ACTIVITIES, AI_TASKS, CLOUD_BUCKETS, EMAIL_BUCKETS, ROLES, encode, idle_options
+
+GRID_DIR = os.environ.get("CF50_GRID_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "grid_intensity"))
+CHUNK_USERS = 256  # users per (users x 2 x 8760) usage block when evaluated hour by hour: 36 MB
+
+# --- USAGE PROFILES ---
+TERMS = ["computer", "lectures", "calls", "wifi", "office", "idle", "ai"]
+WORK_START = 9  # the typical 8-hour day runs 9:00-17:00; idle time fills the other 16 hours
+# Activities that follow a timetable rather than the whole work day; the rest are "computer"
+ACTIVITY_TERMS = {
+    "Watching lecture recordings": "lectures",
+    "Online classes streaming or video call": "lectures",
+    "Online classes streaming": "lectures",
+    "Videocall (e.g. Zoom, Teams…)": "calls"
+}
+
+
+def _hours(*hours):
+    profile = np.zeros(24)
+    profile[list(hours)] = 1.0
+    return profile / profile.sum()
+
+
+# Share of each term's daily use per hour of a day starting at WORK_START (assumptions)
+PROFILES = {
+    "computer": _hours(*range(9, 17)),
+    "lectures": _hours(9, 10, 11, 12, 14, 15),
+    "calls": _hours(10, 11, 14, 15, 16),
+    "wifi": _hours(*range(9, 17)),
+    "office": _hours(*range(9, 17)),  # emails and printing
+    "idle": _hours(*range(0, 9), *range(17, 24)),
+    "ai": _hours(*range(9, 17))
+}
+_ACTIVITY_TERM = np.array([TERMS.index(ACTIVITY_TERMS.get(act, "computer")) for act in ACTIVITIES])
+# Category each term's emissions are reported under
+TERM_CATEGORY = {term: "AI Tools" if term == "ai" else "Digital Activities" for term in TERMS}
+_CATEGORIES = list(dict.fromkeys(TERM_CATEGORY.values()))
+_TERM_TO_CATEGORY = np.array([[TERM_CATEGORY[term] == cat for cat in _CATEGORIES] for term in TERMS], dtype=float)
+
+
+# --- GRID INTENSITY ---
+class GridTable:
+    """Hourly gCO₂e/kWh for one year, starting on 1 January at midnight local time."""
+
+    def __init__(self, name, values, year, placeholder=False):
+        values = np.asarray(values, dtype=float)
+        if len(values) not in (8760, 8784) or not np.isfinite(values).all() or (values < 0).any() or not values.any():
+            raise ValueError(f"Grid table {name!r} needs 8760 or 8784 non-negative hourly values")
+        self.name = name
+        self.values = values
+        self.year = year
+        self.placeholder = placeholder
+
+    def weights(self, reference=None, factors=None):
+        """Per-hour multiplier of the flat model's usage on work days, scaled to ``DAYS`` days."""
+        days = (factors or engine.active_factors()).DAYS
+        n_days = len(self.values) // 24
+        weekday = (date(self.year, 1, 1).weekday() + np.arange(n_days)) % 7
+        work = (weekday < 5).astype(float)
+        level = self.values.mean() if reference is None else reference
+        return self.values / level * np.repeat(work * (days / work.sum()), 24)
+
+
+def placeholder_table(year=2025):
+    """Invented intensity shape: an evening peak, a midday solar dip deeper in summer, dirtier winters."""
+    hours = np.arange(365 * 24)
+    day, hod = hours // 24, hours % 24
+    seasonal = 1 + 0.15 * np.cos(2 * math.pi * (day - 15) / 365)
+    evening = 1 + 0.12 * np.cos(2 * math.pi * (hod - 19) / 24)
+    solar = 0.25 * np.clip(np.cos(2 * math.pi * (hod - 13) / 24), 0, None) ** 2 * (1 + 0.5 * np.cos(2 * math.pi * (day - 172) / 365))
+    return GridTable("placeholder", 300 * (seasonal * evening - solar), year, placeholder=True)
+
+
+def load_table(country=None, year=2025, grid_dir=None):
+    """``<country>.csv`` from ``grid_dir``, or the placeholder table when no country is named."""
+    if not country:
+        return placeholder_table(year)
+    grid_dir = grid_dir or GRID_DIR
+    path = os.path.join(grid_dir, f"{country}.csv")
+    if not os.path.exists(path):
+        names = os.listdir(grid_dir) if os.path.isdir(grid_dir) else []
+        available = sorted(name[:-4] for name in names if name.endswith(".csv"))
+        raise ValueError(f"No grid-intensity table {path}; available countries: {available}")
+    with open(path) as f:
+        lines = [line.split(",")[-1].strip() for line in f if line.strip()]
+    try:
+        float(lines[0])
+    except (IndexError, ValueError):
+        lines = lines[1:]  # header
+    try:
+        values = [float(value) for value in lines]
+    except ValueError:
+        raise ValueError(f"Grid table {path} holds a non-numeric value") from None
+    return GridTable(country, values, year)
+
+
+# --- SCORING ---
+def daily_terms(respondents, factors=None):
+    """kg CO₂e per work day of each of ``TERMS``, shape ``(n, len(TERMS))``."""
+    f = factors or engine.active_factors()
+    n = len(respondents["role"])
+    role = encode(respondents["role"], ROLES)
+    daily = np.zeros((n, len(TERMS)))
+    for j, act in enumerate(ACTIVITIES):
+        if act in respondents:
+            daily[:, _ACTIVITY_TERM[j]] += np.asarray(respondents[act], dtype=float) * f.ACTIVITY_EF[role, j]
+    daily[:, TERMS.index("office")] = (
+        engine._bucket(respondents["email_plain"], EMAIL_BUCKETS, f.EMAIL_COUNT) * f.EMAIL_PLAIN_KG
+        + engine._bucket(respondents["email_attach"], EMAIL_BUCKETS, f.EMAIL_COUNT) * f.EMAIL_ATTACH_KG
+        + engine._column(respondents, "pages", n) * f.PRINT_KG_PER_PAGE)
+    daily[:, TERMS.index("wifi")] = engine._column(respondents, "wifi", n) * f.WIFI_KG_PER_HOUR
+    daily[:, TERMS.index("idle")] = f.IDLE_KWH[encode(respondents["idle"], idle_options)]
+    for j, task in enumerate(AI_TASKS):
+        if task in respondents:
+            daily[:, TERMS.index("ai")] += np.asarray(respondents[task], dtype=float) * f.AI_EF[j]
+    return daily
+
+
+def profiles(start_hour=None, base=None):
+    """Usage profiles ``(len(TERMS), 24)``, or ``(n, len(TERMS), 24)`` shifted to each user's start of work.
+
+    ``base`` replaces the default ``PROFILES`` (one row per term, or one block per user).
+    """
+    if base is None:
+        base = np.stack([PROFILES[term] for term in TERMS])
+    if start_hour is None:
+        return base
+    shift = np.asarray(start_hour, dtype=np.intp).reshape(-1, 1) - WORK_START
+    hod = (np.arange(24)[None, :] - shift) % 24
+    if base.ndim == 2:
+        return base[:, hod].transpose(1, 0, 2)
+    return np.take_along_axis(base, hod[:, None, :], axis=2)
+
+
+def annual(daily, weights, start_hour=None, profile=None, chunk=CHUNK_USERS, fold=True):
+    """Yearly kg per category of usage ``daily[:, t] * profile[t, hour of day]``, weighted per hour.
+
+    ``start_hour`` and ``profile`` are passed to ``profiles`` (per user when they have
+    one entry per row). Users are evaluated ``chunk`` at a time, so memory stays bounded
+    for any number of them. Since usage repeats every day, the product with the 8760
+    weights equals the product with the weights summed per hour of day, which ``fold``
+    uses; ``fold=False`` builds each (users x categories x 8760) usage block instead.
+    Returns shape ``(n, 2)``: Digital Activities, AI Tools.
+    """
+    n = len(daily)
+    hod = np.arange(len(weights)) % 24
+    folded = np.bincount(hod, weights=weights, minlength=24)
+    start_hour = None if start_hour is None else np.broadcast_to(np.asarray(start_hour), (n,))
+    per_user = profile is not None and np.ndim(profile) == 3
+    out = np.empty((n, len(_CATEGORIES)))
+    for lo in range(0, n, chunk):
+        rows = slice(lo, lo + chunk)
+        block = profiles(None if start_hour is None else start_hour[rows], profile[rows] if per_user else profile)
+        if block.ndim == 2:
+            block = np.broadcast_to(block, (len(daily[rows]),) + block.shape)
+        day = np.einsum("nt,nth,tk->nkh", daily[rows], block, _TERM_TO_CATEGORY)
+        out[rows] = day @ folded if fold else day[:, :, hod] @ weights
+    return out
+
+
+def score(respondents, devices=None, table=None, start_hour=None, profile=None, reference=None, chunk=CHUNK_USERS,
+          fold=True, factors=None):
+    """``engine.score`` with Digital Activities and AI Tools from the hourly model.
+
+    ``start_hour`` (scalar or one per respondent) shifts each user's work day from
+    ``WORK_START``; ``profile`` replaces the default profiles (see ``profiles``).
+    ``table`` defaults to ``load_table()``.
+    """
+    f = factors or engine.active_factors()
+    table = table or load_table()
+    n = len(respondents["role"])
+    usage = annual(daily_terms(respondents, f), table.weights(reference, f), start_hour, profile, chunk, fold)
+    cloud = engine._bucket(respondents["cloud"], CLOUD_BUCKETS, f.CLOUD_COUNT) * f.CLOUD_KG_PER_GB
+    if reference is not None:
+        cloud = cloud * table.values.mean() / reference
+    return {
+        **engine.score_devices(devices, n, f),
+        "Digital Activities": usage[:, 0] + cloud,
+        "AI Tools": usage[:, 1]
+    }
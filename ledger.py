@@ -0,0 +1,141 @@
+"""Running totals of the form, updated one term at a time from widget callbacks.
+
+Every input widget feeds exactly one term: a small function of its widgets' values that
+returns kg CO₂e per category (one device, one activity, one AI task, the digital habits).
+The widgets' ``on_change`` callback recomputes just that term and adds the difference to
+its section and to the grand total, so a change costs the same with 1 device or 500.
+The terms run the engine's own section functions on a single row, with the ledger's
+factor version; ``reprice`` recomputes them all when a new version is activated.
+"""
+from engine import (CATEGORIES, DEVICES, EOL_OPTIONS, activities_total, ai_total, device_impacts, habits_total,
+                    shared_options, used_options)
+
+HABITS = ["email_plain", "email_attach", "cloud", "wifi", "pages", "idle"]
+
+
+class _Term:
+    __slots__ = ("section", "widgets", "compute", "values")
+
+    def __init__(self, section, widgets, compute):
+        self.section = section
+        self.widgets = widgets
+        self.compute = compute
+        self.values = {}
+
+
+class Ledger:
+    """Dependency graph from widget keys to terms, and from terms to section and grand totals."""
+
+    def __init__(self, state):
+        self.state = state
+        self.depends = {}   # widget key -> term key
+        self.terms = {}     # term key -> _Term
+        self.sections = {}  # section -> {category: kg}
+        self.totals = dict.fromkeys(CATEGORIES, 0.0)
+        self.shown = {}     # section -> total at its last take_delta()
+        self.factors = None  # FactorSet the terms are computed with, the active one until reprice()
+
+    def track(self, section, term, widgets, compute):
+        """Register ``term`` as ``compute(*widget values)`` unless it is already tracked.
+
+        Returns the term's current contribution per category.
+        """
+        if term not in self.terms:
+            self.terms[term] = _Term(section, list(widgets), compute)
+            for widget in widgets:
+                self.depends[widget] = term
+            self.sections.setdefault(section, dict.fromkeys(CATEGORIES, 0.0))
+            self._refresh(self.terms[term])
+        return self.terms[term].values
+
+    def changed(self, widget):
+        """``on_change`` callback: recompute the one term that reads ``widget``."""
+        term = self.depends.get(widget)
+        if term is not None:
+            self._refresh(self.terms[term])
+
+    def set(self, section, term, values):
+        """Contribution of a term that isn't driven by widgets (e.g. an imported fleet)."""
+        if term not in self.terms:
+            self.track(section, term, [], _unset)
+        t = self.terms[term]
+        if t.values != values:
+            self._apply(t, dict(values))
+
+    def untrack(self, term):
+        t = self.terms.pop(term, None)
+        if t is None:
+            return
+        for widget in t.widgets:
+            self.depends.pop(widget, None)
+        self._apply(t, {})
+
+    def reprice(self, factors):
+        """Recompute every term with ``factors`` if it isn't the version they were computed with.
+
+        Terms whose widgets aren't in the state any more are dropped; they are tracked
+        again when their widgets next render.
+        """
+        if self.factors is not None and factors.version == self.factors.version:
+            return False
+        self.factors = factors
+        for term, t in list(self.terms.items()):
+            if all(widget in self.state for widget in t.widgets):
+                self._refresh(t)
+            else:
+                self.untrack(term)
+        return True
+
+    def _refresh(self, t):
+        self._apply(t, t.compute(*(self.state[widget] for widget in t.widgets), factors=self.factors))
+
+    def _apply(self, t, values):
+        section = self.sections[t.section]
+        for cat in values.keys() | t.values.keys():
+            diff = values.get(cat, 0.0) - t.values.get(cat, 0.0)
+            section[cat] += diff
+            self.totals[cat] += diff
+        t.values = values
+
+    def total(self):
+        return sum(self.totals.values())
+
+    def take_delta(self, section):
+        """Change of a section's total since the previous call for it (None the first time)."""
+        total = sum(self.sections.get(section, {}).values())
+        last = self.shown.get(section)
+        self.shown[section] = total
+        return None if last is None else total - last
+
+
+# --- TERMS ---
+# Each compute takes its widgets' values and the ledger's ``factors``
+def _unset(factors=None):
+    return {}
+
+
+def device_term(device):
+    # Option codes skip the label lookup device_impacts would do for a single row
+    code = DEVICES.index(device)
+
+    def compute(years, used, shared, eol, factors=None):
+        prod, eol_impact = device_impacts([code], [years], [used_options.index(used)], [shared_options.index(shared)],
+                                          [EOL_OPTIONS.index(eol)], factors)
+        return {"Devices": float(prod[0]), "E-Waste": float(eol_impact[0])}
+    return compute
+
+
+def activity_term(role, activity):
+    def compute(hours, factors=None):
+        return {"Digital Activities": float(activities_total([role], {activity: [hours]}, 1, factors)[0])}
+    return compute
+
+
+def habits_term(*values, factors=None):
+    return {"Digital Activities": float(habits_total(*([value] for value in values), factors=factors)[0])}
+
+
+def ai_term(task):
+    def compute(queries, factors=None):
+        return {"AI Tools": float(ai_total({task: [queries]}, 1, factors)[0])}
+    return compute
@@ -0,0 +1,240 @@
+"""Opt-in rerun instrumentation.
+
+Off unless ``CF50_METRICS=1``; when off every hook is a no-op.
+When on, each rerun records its duration, the bytes and widgets it sent to the browser,
+and the time spent in each named stage. They are exposed as:
+
+- Prometheus text at ``/metrics`` (and a JSON snapshot at ``/metrics.json``) on
+  ``CF50_METRICS_PORT``, served from a daemon thread;
+- one JSON line per rerun appended to ``CF50_METRICS_LOG`` (``-`` for stderr).
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("CF50_METRICS", "").lower() in ("1", "true", "yes", "on")
+PORT = os.environ.get("CF50_METRICS_PORT")
+LOG_PATH = os.environ.get("CF50_METRICS_LOG")
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+
+_NULL = nullcontext()
+_local = threading.local()
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.sum += value
+        for i, edge in enumerate(BUCKETS):
+            if value <= edge:
+                self.counts[i] += 1
+                break
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class Registry:
+    """Process-wide counters and histograms, keyed by (metric, label value)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, label, value=1):
+        with self.lock:
+            self.counters[name, label] = self.counters.get((name, label), 0) + value
+
+    def observe(self, name, label, seconds):
+        with self.lock:
+            self.histograms.setdefault((name, label), Histogram()).observe(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": {f"{name}{{{label}}}": value for (name, label), value in self.counters.items()},
+                "histograms": {f"{name}{{{label}}}": {"count": h.count, "sum": h.sum}
+                               for (name, label), h in self.histograms.items()}
+            }
+
+    def prometheus(self):
+        lines, typed = [], set()
+        with self.lock:
+            for (name, label), value in sorted(self.counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE cf50_{name} counter")
+                lines.append(f'cf50_{name}{{{_label_of(name)}="{label}"}} {value}')
+            for (name, label), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE cf50_{name} histogram")
+                key = f'{_label_of(name)}="{label}"'
+                cumulative = 0
+                for edge, n in zip(BUCKETS, h.counts):
+                    cumulative += n
+                    le = "+Inf" if edge == float("inf") else repr(edge)
+                    lines.append(f'cf50_{name}_bucket{{{key},le="{le}"}} {cumulative}')
+                lines.append(f"cf50_{name}_sum{{{key}}} {h.sum}")
+                lines.append(f"cf50_{name}_count{{{key}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _label_of(name):
+    return "stage" if name.startswith("stage") else "page"
+
+
+REGISTRY = Registry()
+
+
+class _Rerun:
+    """Times one script run and counts what it sends through the session's message queue."""
+
+    def __init__(self, page):
+        self.page = page
+
+    def __enter__(self):
+        if getattr(_local, "rerun", None) is not None:
+            self.nested = True
+            return self
+        self.nested = False
+        self.stages, self.bytes, self.widgets = {}, 0, 0
+        self.ctx = _script_run_ctx()
+        if self.ctx is not None:
+            self.enqueue = self.ctx._enqueue
+            self.ctx._enqueue = self._count
+        _local.rerun = self
+        self.start = time.perf_counter()
+        return self
+
+    def _count(self, msg):
+        self.bytes += msg.ByteSize()
+        if msg.WhichOneof("type") == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            element = getattr(msg.delta.new_element, msg.delta.new_element.WhichOneof("type") or "empty")
+            if getattr(element, "id", ""):
+                self.widgets += 1
+        self.enqueue(msg)
+
+    def __exit__(self, *exc):
+        # st.rerun() and st.stop() end a run by raising; the run is still recorded
+        if self.nested:
+            return False
+        seconds = time.perf_counter() - self.start
+        _local.rerun = None
+        if self.ctx is not None:
+            self.ctx._enqueue = self.enqueue
+        REGISTRY.inc("reruns_total", self.page)
+        REGISTRY.observe("rerun_seconds", self.page, seconds)
+        REGISTRY.inc("payload_bytes_total", self.page, self.bytes)
+        REGISTRY.inc("widgets_total", self.page, self.widgets)
+        if LOG_PATH:
+            _log({"ts": time.time(), "page": self.page, "ms": round(seconds * 1000, 3), "payload_bytes": self.bytes,
+                  "widgets": self.widgets, "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()}})
+        return False
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        REGISTRY.observe("stage_seconds", self.name, seconds)
+        current = getattr(_local, "rerun", None)
+        if current is not None:
+            current.stages[self.name] = current.stages.get(self.name, 0.0) + seconds
+        return False
+
+
+def rerun(page):
+    """Context manager around a whole script run of ``page``."""
+    return _Rerun(page) if ENABLED else _NULL
+
+
+def stage(name):
+    """Context manager timing one named stage of the current run."""
+    return _Stage(name) if ENABLED else _NULL
+
+
+def fragment(name):
+    """Decorator for ``st.fragment`` bodies: a fragment rerunning on its own is recorded
+    as a rerun of page ``fragment:<name>``; inside a full run it adds nothing."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Rerun(f"fragment:{name}"):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _script_run_ctx():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx(suppress_warning=True)
+    except ImportError:
+        return None
+
+
+_log_lock = threading.Lock()
+
+
+def _log(record):
+    line = json.dumps(record) + "\n"
+    with _log_lock:
+        if LOG_PATH == "-":
+            sys.stderr.write(line)
+        else:
+            with open(LOG_PATH, "a") as f:
+                f.write(line)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = REGISTRY.prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(REGISTRY.snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port):
+    """Serve the registry over HTTP from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer(("0.0.0.0", int(port)), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# Streamlit re-executes app.py on every rerun but imports this module once per process
+if ENABLED and PORT:
+    serve(PORT)
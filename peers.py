@@ -0,0 +1,225 @@
+"""Anonymized peer results for the results page's ranking.
+
+Usage: python peers.py --rescore VERSION [--db PATH]
+
+Re-scores every stored result with emission-factor version VERSION (see factors.py).
+"""
+import argparse
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import numpy as np
+
+import engine
+import factors
+from engine import CATEGORIES
+from share import decode
+
+DB_PATH = os.environ.get("CF50_PEERS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "peer_results.sqlite3"))
+
+# Fixed histogram bins for the total in kg CO₂e/year: one bin for negative totals,
+# log-spaced bins up to 50 t, one overflow bin. Percentiles never scan the results table.
+EDGES = np.concatenate([[0.0], np.geomspace(1.0, 50_000.0, 255)])
+N_BINS = len(EDGES) + 1
+
+BATCH_SIZE = 500
+FLUSH_SECONDS = 0.05
+REFRESH_SECONDS = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    role TEXT NOT NULL,
+    devices REAL, ewaste REAL, digital REAL, ai REAL, total REAL,
+    factors TEXT,  -- factor version the result was scored with
+    token TEXT     -- share token of the inputs, so the result can be re-scored
+);
+CREATE TABLE IF NOT EXISTS rollup (
+    role TEXT NOT NULL,
+    bin INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (role, bin)
+) WITHOUT ROWID;
+"""
+
+
+def bin_of(total):
+    return int(np.searchsorted(EDGES, total, side="right"))
+
+
+class PeerStore:
+    """Anonymized results with per-role histogram rollups.
+
+    ``submit`` only enqueues; a single writer thread inserts results in batches and
+    bumps the rollup counts in the same WAL transaction. ``percentile`` reads the
+    in-memory rollup, refreshed from disk so other worker processes' writes show up.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._queue = queue.Queue()
+        self._counts = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+            for column in ("factors", "token"):
+                if column not in columns:  # stores created before results were versioned
+                    conn.execute(f"ALTER TABLE results ADD COLUMN {column} TEXT")
+        self._writer = threading.Thread(target=self._write_loop, name="peer-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, role, results, factors=None, token=None):
+        """Queue one result, tagged with the factor version it was scored with and its share token."""
+        self._queue.put((time.strftime("%Y-%m-%d"), role, *(float(results[c]) for c in CATEGORIES),
+                         float(sum(results.values())), factors, token))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            rows = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(rows) < BATCH_SIZE:
+                try:
+                    rows.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = None in rows
+            rows = [r for r in rows if r is not None]
+            if rows:
+                self._flush(conn, rows)
+            for _ in range(len(rows) + stop):
+                self._queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def _flush(self, conn, rows):
+        deltas = {}
+        for row in rows:
+            key = (row[1], bin_of(row[6]))
+            deltas[key] = deltas.get(key, 0) + 1
+        with conn:
+            conn.executemany("INSERT INTO results (day, role, devices, ewaste, digital, ai, total, factors, token) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("INSERT INTO rollup (role, bin, count) VALUES (?, ?, ?) "
+                             "ON CONFLICT (role, bin) DO UPDATE SET count = count + excluded.count",
+                             [(role, b, n) for (role, b), n in deltas.items()])
+        with self._lock:
+            for (role, b), n in deltas.items():
+                self._counts.setdefault(role, np.zeros(N_BINS, dtype=np.int64))[b] += n
+
+    def _refresh(self):
+        counts = {}
+        with closing(self._connect()) as conn:
+            for role, b, n in conn.execute("SELECT role, bin, count FROM rollup"):
+                counts.setdefault(role, np.zeros(N_BINS, dtype=np.int64))[b] = n
+        with self._lock:
+            self._counts = counts
+            self._loaded_at = time.monotonic()
+
+    def percentile(self, role, total, stored=False):
+        """Share of peers with the same role whose total is below ``total`` (0-100), and the peer count.
+
+        With ``stored`` the result with ``total`` is itself in the store (a shared result
+        page) and is left out, so it isn't compared with itself.
+        """
+        if time.monotonic() - self._loaded_at > REFRESH_SECONDS:
+            self._refresh()
+        b = bin_of(total)
+        with self._lock:
+            counts = self._counts.get(role)
+            if counts is None:
+                return None, 0
+            counts = counts.copy()
+        if stored and counts[b]:
+            counts[b] -= 1
+        n = int(counts.sum())
+        if not n:
+            return None, 0
+        below = counts[:b].sum() + counts[b] / 2
+        return float(100.0 * below / n), n
+
+    def rescore(self, factors):
+        """Re-score every stored result that has a share token with ``factors``, in one vectorized pass.
+
+        The tokens are decoded into one columnar batch and scored by a single ``engine.score``
+        call; the results, their version tag and the rollup are rewritten in one transaction.
+        Results stored without a token keep their values and version. Returns how many changed.
+        """
+        self.flush()
+        with closing(self._connect()) as conn:
+            ids, submissions = [], []
+            for row_id, token in conn.execute("SELECT id, token FROM results WHERE token IS NOT NULL"):
+                try:
+                    submissions.append(decode(token))
+                except ValueError:
+                    continue
+                ids.append(row_id)
+            if ids:
+                res = engine.score(*engine.batch_of_many(submissions, factors), factors=factors)
+                total = sum(res[c] for c in CATEGORIES)
+                with conn:
+                    conn.executemany("UPDATE results SET devices = ?, ewaste = ?, digital = ?, ai = ?, total = ?, "
+                                     "factors = ? WHERE id = ?",
+                                     zip(*(res[c].tolist() for c in CATEGORIES), total.tolist(),
+                                         [factors.version] * len(ids), ids))
+                    self._rebuild_rollup(conn)
+        self._refresh()
+        return len(ids)
+
+    def _rebuild_rollup(self, conn):
+        roles, totals = [], []
+        for role, total in conn.execute("SELECT role, total FROM results"):
+            roles.append(role)
+            totals.append(total)
+        names, role_code = np.unique(np.asarray(roles, dtype=object).astype(str), return_inverse=True)
+        bins = np.searchsorted(EDGES, np.asarray(totals, dtype=float), side="right")
+        counts = np.bincount(role_code * N_BINS + bins, minlength=len(names) * N_BINS).reshape(-1, N_BINS)
+        conn.execute("DELETE FROM rollup")
+        conn.executemany("INSERT INTO rollup (role, bin, count) VALUES (?, ?, ?)",
+                         [(str(names[r]), int(b), int(counts[r, b])) for r, b in zip(*np.nonzero(counts))])
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rescore", metavar="VERSION", required=True, help="factor version to re-score with")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args(argv)
+    try:
+        factor_set = factors.load(args.rescore)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    store = PeerStore(args.db)
+    start = time.perf_counter()
+    rescored = store.rescore(factor_set)
+    store.close()
+    print(json.dumps({"factors": factor_set.version, "rescored": rescored,
+                      "seconds": round(time.perf_counter() - start, 3)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Downloadable PDF/CSV reports of a result, rendered on a bounded worker pool.
+
+Usage: python reports.py RESULTS --out DIR [--by department] [--formats pdf,csv] [--workers N] [--processes]
+
+RESULTS is the per-respondent output of batch.py (.csv, or .parquet with pyarrow). One report is
+written to DIR per value of the ``--by`` column, with the group's total per category,
+the mean per respondent, the tips for its largest category and the everyday
+equivalences of its total.
+
+A report is described by a ``request`` tuple (titles, results rounded as displayed,
+factor version, respondents), which is also its cache key. ``ReportPool`` renders
+requests on a few worker threads fed by a bounded queue. Identical requests share one
+job while it is queued or running, and finished reports stay in an LRU cache, so a
+report is rendered once however many sessions ask for it. With ``processes=True`` the
+threads hand rendering to a process pool of the same size, for large offline runs.
+
+The PDF is written by hand (one or more A4 pages, the standard Helvetica fonts), so no
+PDF library is needed. Helvetica only covers Latin-1 text: CO₂ is written CO2.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import sys
+import textwrap
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+import engine
+import factors
+from cards import DETAILED_TIPS, PLOT_KEYS, PLOT_LABELS
+from engine import CATEGORIES
+
+WORKERS = int(os.environ.get("CF50_REPORT_WORKERS", 2))
+MAX_QUEUED = 256     # jobs waiting for a worker; submit raises queue.Full (or blocks) beyond that
+CACHE_SIZE = 1024    # finished reports kept
+FORMATS = {"pdf": "application/pdf", "csv": "text/csv"}
+
+TIP_LABEL = dict(zip(PLOT_KEYS, PLOT_LABELS))
+EQUIVALENCE_TEXT = {
+    "burgers": "Produce ~{:,.0f} beef burgers",
+    "led_days": "Keep 100 LED bulbs (10W) on for ~{:,.0f} days",
+    "car_km": "Drive a gasoline car for ~{:,.0f} km",
+    "netflix_hours": "Watch Netflix for ~{:,.0f} hours"
+}
+
+
+def request(results, version=None, title="Your Digital Carbon Footprint", subtitle="", respondents=1):
+    """Hashable description of one report; ``results`` are yearly kg per category (totals for a group)."""
+    values = tuple(round(float(results[cat]), 2) for cat in CATEGORIES)
+    return title, subtitle, values, version or factors.active().version, int(respondents)
+
+
+def _content(req):
+    # Everything both formats show, in order
+    title, subtitle, values, version, respondents = req
+    res = dict(zip(CATEGORIES, values))
+    total = sum(values)
+    category = TIP_LABEL[engine.most_impact_category(res)]
+    tips = [re.sub(r"<[^>]+>", "", tip) for tip in DETAILED_TIPS[category]]
+    eq = engine.equivalences(total, factors.load(version))
+    return {
+        "title": title,
+        "subtitle": subtitle,
+        "respondents": respondents,
+        "results": res,
+        "total": total,
+        "category": category,
+        "tips": tips,
+        "equivalences": {name: EQUIVALENCE_TEXT[name].format(value) for name, value in eq.items()},
+        "version": version
+    }
+
+
+# --- CSV ---
+def render_csv(req):
+    c = _content(req)
+    out = io.StringIO()
+    w = csv.writer(out, lineterminator="\n")
+    w.writerow(["section", "item", "value", "unit"])
+    w.writerow(["report", "title", c["title"], ""])
+    if c["subtitle"]:
+        w.writerow(["report", "subtitle", c["subtitle"], ""])
+    w.writerow(["report", "respondents", c["respondents"], ""])
+    w.writerow(["report", "factor version", c["version"], ""])
+    for cat, kg in c["results"].items():
+        w.writerow(["breakdown", cat, f"{kg:.2f}", "kg CO2e/year"])
+    w.writerow(["breakdown", "Total", f"{c['total']:.2f}", "kg CO2e/year"])
+    if c["respondents"] > 1:
+        for cat, kg in c["results"].items():
+            w.writerow(["per respondent", cat, f"{kg / c['respondents']:.2f}", "kg CO2e/year"])
+        w.writerow(["per respondent", "Total", f"{c['total'] / c['respondents']:.2f}", "kg CO2e/year"])
+    w.writerow(["tips", "biggest impact", c["category"], ""])
+    for i, tip in enumerate(c["tips"], 1):
+        w.writerow(["tips", i, tip, ""])
+    for name, text in c["equivalences"].items():
+        w.writerow(["equivalences", name, text, ""])
+    return out.getvalue().encode("utf-8")
+
+
+# --- PDF ---
+PAGE_W, PAGE_H = 595, 842  # A4 in points
+MARGIN = 56
+CHAR_WIDTH = 0.52          # average Helvetica glyph width per point of font size, for wrapping
+GREEN, DARK, GREY = (0.35, 0.65, 0.45), (0.11, 0.26, 0.2), (0.4, 0.4, 0.4)
+
+
+def _pdf_text(text):
+    data = text.replace("₂", "2").encode("cp1252", "replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class _PdfPages:
+    """Top-to-bottom layout onto as many pages as needed."""
+
+    def __init__(self):
+        self.pages = []
+        self._new_page()
+
+    def _new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+        self.y = PAGE_H - MARGIN
+
+    def _room(self, height):
+        if self.y - height < MARGIN:
+            self._new_page()
+
+    def _color(self, rgb, op):
+        self.ops.append(b"%.3f %.3f %.3f %s" % (*rgb, op))
+
+    def text(self, text, size=10, bold=False, x=MARGIN, gap=4, color=DARK):
+        self._room(size + gap)
+        self.y -= size
+        self._color(color, b"rg")
+        self.ops.append(b"BT /%s %d Tf %.1f %.1f Td (%s) Tj ET" % (b"F2" if bold else b"F1", size, x, self.y,
+                                                                 _pdf_text(text)))
+        self.y -= gap
+
+    def paragraph(self, text, size=10, x=MARGIN, gap=3):
+        width = int((PAGE_W - MARGIN - x) / (size * CHAR_WIDTH))
+        for line in textwrap.wrap(text, width) or [""]:
+            self.text(line, size, x=x, gap=gap)
+
+    def space(self, height):
+        self.y -= height
+
+    def bar(self, label, value, scale, size=10):
+        """``label``, a bar of ``abs(value) * scale`` points (lighter when negative) and the value."""
+        self._room(size + 8)
+        self.y -= size + 4
+        self._color(DARK, b"rg")
+        self.ops.append(b"BT /F1 %d Tf %.1f %.1f Td (%s) Tj ET" % (size, MARGIN, self.y, _pdf_text(label)))
+        self._color(GREEN if value >= 0 else (0.7, 0.85, 0.75), b"rg")
+        self.ops.append(b"%.1f %.1f %.1f %.1f re f" % (MARGIN + 130, self.y - 2, abs(value) * scale, size + 2))
+        self._color(DARK, b"rg")
+        self.ops.append(b"BT /F1 %d Tf %.1f %.1f Td (%s) Tj ET" % (size, PAGE_W - MARGIN - 90, self.y,
+                                                                 _pdf_text(f"{value:,.2f} kg")))
+        self.y -= 4
+
+    def output(self):
+        objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+                   b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+                   b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+        kids = []
+        for ops in self.pages:
+            stream = zlib.compress(b"\n".join(ops))
+            objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+            objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R "
+                           b"/F2 4 0 R >> >> /Contents %d 0 R >>" % (PAGE_W, PAGE_H, len(objects)))
+            kids.append(b"%d 0 R" % len(objects))
+        objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+        return bytes(out)
+
+
+def render_pdf(req):
+    c = _content(req)
+    pdf = _PdfPages()
+    pdf.text(c["title"], size=20, bold=True, gap=8)
+    if c["subtitle"]:
+        pdf.text(c["subtitle"], size=12, gap=8, color=GREY)
+    pdf.space(6)
+    pdf.text(f"Total: {c['total']:,.0f} kg CO2e/year", size=16, bold=True, gap=4)
+    if c["respondents"] > 1:
+        pdf.text(f"{c['respondents']:,} respondents, {c['total'] / c['respondents']:,.1f} kg CO2e/year each on average",
+                 size=11, gap=4, color=GREY)
+    pdf.space(10)
+    pdf.text("Breakdown by source (kg CO2e/year)", size=13, bold=True, gap=6)
+    largest = max((abs(v) for v in c["results"].values()), default=0.0)
+    scale = (PAGE_W - 2 * MARGIN - 230) / largest if largest else 0.0
+    for cat, kg in c["results"].items():
+        pdf.bar(cat, kg, scale)
+    pdf.space(12)
+    pdf.text(f"Your biggest impact comes from: {c['category']}", size=13, bold=True, gap=6)
+    for tip in c["tips"]:
+        pdf.paragraph(f"- {tip}", x=MARGIN + 8)
+        pdf.space(3)
+    pdf.space(10)
+    pdf.text("With the same emissions, you could...", size=13, bold=True, gap=6)
+    for text in c["equivalences"].values():
+        pdf.paragraph(f"- {text}", x=MARGIN + 8)
+    pdf.space(16)
+    pdf.text(f"Emission factors: version {c['version']}. Digital Carbon Footprint Calculator, Green DiLT project.",
+             size=8, color=GREY)
+    return pdf.output()
+
+
+RENDERERS = {"pdf": render_pdf, "csv": render_csv}
+
+
+def render(kind, req):
+    """Bytes of report ``req`` in format ``kind`` (a key of ``FORMATS``)."""
+    return RENDERERS[kind](req)
+
+
+# --- POOL ---
+class ReportPool:
+    """Renders ``(kind, request)`` jobs on ``workers`` threads fed by a bounded queue.
+
+    ``submit`` returns a ``concurrent.futures.Future`` of the report's bytes: already done
+    for a cached report, shared with the pending job for a request already in flight.
+    """
+
+    def __init__(self, workers=WORKERS, max_queued=MAX_QUEUED, cache_size=CACHE_SIZE, processes=False):
+        self._queue = queue.Queue(max_queued)
+        self._pending = {}            # (kind, request) -> Future, queued or running
+        self._cache = OrderedDict()   # (kind, request) -> bytes, least recently used first
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._processes = ProcessPoolExecutor(workers) if processes else None
+        self.stats = {"rendered": 0, "cached": 0, "deduplicated": 0, "failed": 0}
+        self._threads = [threading.Thread(target=self._work, name=f"report-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind, req, block=False):
+        """Queue a report; raises ``queue.Full`` when the queue is full, unless ``block``."""
+        if kind not in FORMATS:
+            raise ValueError(f"Unknown report format {kind!r}, expected one of {list(FORMATS)}")
+        key = kind, req
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.stats["cached"] += 1
+                future = Future()
+                future.set_result(data)
+                return future
+            future = self._pending.get(key)
+            if future is not None:
+                self.stats["deduplicated"] += 1
+                return future
+            future = self._pending[key] = Future()
+        try:
+            self._queue.put((key, future), block=block)
+        except queue.Full:
+            with self._lock:
+                del self._pending[key]
+            raise
+        return future
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            key, future = job
+            try:
+                if self._processes is not None:
+                    data = self._processes.submit(render, *key).result()
+                else:
+                    data = render(*key)
+            except Exception as e:
+                with self._lock:
+                    self._pending.pop(key, None)
+                    self.stats["failed"] += 1
+                future.set_exception(e)
+                continue
+            with self._lock:
+                self._cache[key] = data
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+                self._pending.pop(key, None)
+                self.stats["rendered"] += 1
+            future.set_result(data)
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._processes is not None:
+            self._processes.shutdown()
+
+
+# --- DEPARTMENT REPORTS ---
+def _read(path):
+    import pandas as pd
+    from batch import require_parquet
+    require_parquet(path)
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+
+def group_requests(frame, by="department"):
+    """One ``request`` per value of column ``by`` of a batch.py results table: ``{value: request}``."""
+    if by not in frame:
+        raise ValueError(f"Results have no {by!r} column")
+    scored = frame.dropna(subset=CATEGORIES)
+    requests = {}
+    for name, group in scored.groupby(by, sort=True):
+        versions = group["Factors"].unique() if "Factors" in group else [None]
+        if len(versions) > 1:
+            raise ValueError(f"{by} {name!r} mixes factor versions {sorted(versions)}; score it with one version")
+        totals = group[CATEGORIES].sum()
+        requests[name] = request(totals, versions[0], title=f"{by.capitalize()}: {name}",
+                                 subtitle=f"Digital carbon footprint of {len(group):,} respondents",
+                                 respondents=len(group))
+    return requests
+
+
+def _slug(name):
+    return re.sub(r"[^\w.-]+", "_", str(name)).strip("_") or "report"
+
+
+def _file_names(names):
+    """A distinct file name stem per group name; names that slug alike get a short hash of the name."""
+    slugs = {name: _slug(name) for name in names}
+    seen = Counter(slug.lower() for slug in slugs.values())  # some file systems ignore case
+    return {name: slug if seen[slug.lower()] == 1 else f"{slug}-{hashlib.sha1(str(name).encode()).hexdigest()[:8]}"
+            for name, slug in slugs.items()}
+
+
+def write_reports(requests, out_dir, formats=("pdf", "csv"), pool=None):
+    """Render every request through ``pool`` and write ``<name>.<format>`` files; returns the paths written."""
+    os.makedirs(out_dir, exist_ok=True)
+    own = pool is None
+    pool = pool or ReportPool()
+    stems = _file_names(requests)
+    jobs = defaultdict(list)  # identical requests share one future
+    written = []
+    try:
+        for name, req in requests.items():
+            for kind in formats:
+                # Blocks while the queue is full, so any number of reports flows through it
+                jobs[pool.submit(kind, req, block=True)].append(os.path.join(out_dir, f"{stems[name]}.{kind}"))
+        for future in as_completed(jobs):
+            for path in jobs[future]:
+                with open(path, "wb") as f:
+                    f.write(future.result())
+                written.append(path)
+    finally:
+        if own:
+            pool.close()
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("results", help="per-respondent output of batch.py (.csv or .parquet)")
+    parser.add_argument("--out", required=True, help="directory for the reports")
+    parser.add_argument("--by", default="department", help="column with one report per value")
+    parser.add_argument("--formats", default="pdf,csv")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--processes", action="store_true", help="render in worker processes")
+    args = parser.parse_args(argv)
+    formats = [kind.strip() for kind in args.formats.split(",") if kind.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"Unknown format(s) {sorted(unknown)}, expected {list(FORMATS)}")
+    try:
+        requests = group_requests(_read(args.results), args.by)
+    except (ImportError, ValueError) as e:
+        parser.exit(1, f"{e}\n")
+    start = time.perf_counter()
+    pool = ReportPool(args.workers, processes=args.processes)
+    paths = write_reports(requests, args.out, formats, pool)
+    pool.close()
+    seconds = time.perf_counter() - start
+    print(json.dumps({"groups": len(requests), "files": len(paths), "seconds": round(seconds, 2),
+                      "reports_per_s": round(len(paths) / seconds, 1) if seconds else None, **pool.stats}, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""Session state kept outside the worker process, so any worker can pick up a session.
+
+The session id travels in the ``sid`` query parameter. ``st.session_state`` stays the
+working copy while a browser is connected to a worker; this store is the copy another
+worker (or the same one, after the session was evicted) restores from. Each rerun loads
+only the keys its page needs and writes back only the keys that changed, in one batch.
+On the form page that is the whole form in progress (``SECTION_KEYS``): the device list
+and fleet, and the value of every answer widget, so a worker that takes a session over
+shows the same answers.
+
+A copied address bar carries the ``sid``, so a session is also bound to the browser that
+created it: the store keeps a digest of a secret from the browser's ``CF50_SESSION_COOKIE``
+cookie (default: Streamlit's XSRF cookie, which every browser gets on its first page
+load), and ``SessionSync.owned`` refuses a ``sid`` created under another secret. A
+deployment that turns XSRF protection off should name a cookie its proxy sets instead;
+without any cookie, anyone holding the URL can restore the session. Share links
+(``?r=``, share.py) never carry the ``sid``.
+
+``CF50_SESSION_STORE`` selects the backend:
+
+- ``memory`` (default): an LRU dict in this process;
+- ``sqlite:///path/to/sessions.sqlite3``: a local file shared by workers on one host;
+- ``redis://host:6379/0``: any server speaking the Redis protocol.
+
+Values are pickled; the store must only be reachable by the app's own workers.
+"""
+import hashlib
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from urllib.parse import urlparse
+
+import engine
+
+STORE_URL = os.environ.get("CF50_SESSION_STORE", "memory")
+TTL_SECONDS = int(os.environ.get("CF50_SESSION_TTL", 24 * 3600))
+COOKIE = os.environ.get("CF50_SESSION_COOKIE", "_streamlit_xsrf")
+MAX_MEMORY_SESSIONS = 10_000
+
+# The in-progress form, per section: its state and the keys of its answer widgets. A
+# widget's value restored under its key before the widget is created is what it shows.
+# File uploaders and buttons can't be set, so they are left out
+SECTION_KEYS = {
+    "devices": ["device_list", "device_inputs", "device_seq", "fleet", "fleet_file", "best_options", "best_free",
+                "fleet_mode", "fleet_plan", "plan_horizon", "plan_max_age", "plan_use_kg", "plan_ageing"],
+    "activities": engine.ACTIVITIES + ["mail_measured", "email_plain", "email_attach", "email_plain_count",
+                                       "email_attach_count", "cloud_measured", "cloud", "cloud_gb_measured",
+                                       "wifi", "pages", "idle"],
+    "ai": ["ai_measured"] + engine.AI_TASKS + [f"{task} (measured)" for task in engine.AI_TASKS]
+}
+# What each page reads from the store when the session isn't in this process yet
+PAGE_KEYS = {
+    "intro": ["role"],
+    "main": ["role"] + [key for keys in SECTION_KEYS.values() for key in keys],
+    "results": ["role", "results", "inputs", "share_token", "factor_version", "peer_rank"]
+}
+PERSISTED = ["page"] + list(dict.fromkeys(key for keys in PAGE_KEYS.values() for key in keys))
+OWNER = "_owner"  # stored next to the persisted keys: digest of the creating browser's secret
+
+
+def browser_secret(cookies, name=COOKIE):
+    """The secret of the ``name`` cookie in ``cookies`` (``st.context.cookies``), or None without one."""
+    value = cookies.get(name)
+    if not isinstance(value, str) or not value:
+        return None
+    parts = value.strip("\"'").split("|")
+    if len(parts) == 4 and parts[0] == "2":
+        # Version 2 XSRF cookie "2|mask|masked token|timestamp": the mask changes on every
+        # page load, the token doesn't
+        try:
+            mask, masked = bytes.fromhex(parts[1]), bytes.fromhex(parts[2])
+        except ValueError:
+            return None
+        return bytes(b ^ mask[i % len(mask)] for i, b in enumerate(masked)).hex() if mask else None
+    return value
+
+
+class MemoryBackend:
+    def __init__(self, max_sessions=MAX_MEMORY_SESSIONS, ttl=TTL_SECONDS):
+        self.sessions = OrderedDict()
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    def get(self, sid, keys):
+        with self.lock:
+            entry = self.sessions.get(sid)
+            if entry is None or entry[0] < time.time():
+                return {}
+            self.sessions.move_to_end(sid)
+            return {key: entry[1][key] for key in keys if key in entry[1]}
+
+    def put(self, sid, values, deleted=()):
+        with self.lock:
+            entry = self.sessions.pop(sid, (0, {}))
+            data = entry[1]
+            data.update(values)
+            for key in deleted:
+                data.pop(key, None)
+            self.sessions[sid] = (time.time() + self.ttl, data)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+    def drop(self, sid):
+        with self.lock:
+            self.sessions.pop(sid, None)
+
+
+class SQLiteBackend:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS session_values (
+        sid TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        expires REAL NOT NULL,
+        PRIMARY KEY (sid, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS session_values_expires ON session_values (expires);
+    """
+
+    def __init__(self, path, ttl=TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+        with closing(self._connect()) as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def conn(self):
+        # One connection per script thread; sqlite3 connections aren't shareable
+        if getattr(self.local, "conn", None) is None:
+            self.local.conn = self._connect()
+        return self.local.conn
+
+    def get(self, sid, keys):
+        marks = ",".join("?" * len(keys))
+        rows = self.conn.execute(f"SELECT key, value FROM session_values WHERE sid = ? AND expires > ? AND key IN ({marks})",
+                                 (sid, time.time(), *keys))
+        return dict(rows.fetchall())
+
+    def put(self, sid, values, deleted=()):
+        now = time.time()
+        with self.conn as conn:
+            conn.executemany("INSERT OR REPLACE INTO session_values (sid, key, value, expires) VALUES (?, ?, ?, ?)",
+                             [(sid, key, value, now + self.ttl) for key, value in values.items()])
+            conn.executemany("DELETE FROM session_values WHERE sid = ? AND key = ?", [(sid, key) for key in deleted])
+            # Keep the whole session alive as long as any of it is written
+            conn.execute("UPDATE session_values SET expires = ? WHERE sid = ?", (now + self.ttl, sid))
+            conn.execute("DELETE FROM session_values WHERE expires < ?", (now,))
+
+    def drop(self, sid):
+        with self.conn as conn:
+            conn.execute("DELETE FROM session_values WHERE sid = ?", (sid,))
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """Minimal RESP2 client: one hash per session, every batch sent as one pipeline."""
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, ttl=TTL_SECONDS, timeout=5.0):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.ttl = ttl
+        self.timeout = timeout
+        self.sock = None
+        self.buffer = b""
+        self.lock = threading.Lock()
+
+    def _open(self):
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.buffer = b""
+        setup = ([["AUTH", self.password]] if self.password else []) + ([["SELECT", self.db]] if self.db else [])
+        if setup:
+            self._pipeline_locked(setup)
+
+    @staticmethod
+    def _encode(args):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            arg = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _line(self):
+        while b"\r\n" not in self.buffer:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Redis connection closed")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\r\n", 1)
+        return line
+
+    def _exact(self, n):
+        while len(self.buffer) < n + 2:
+            chunk = self.sock.recv(max(65536, n + 2 - len(self.buffer)))
+            if not chunk:
+                raise ConnectionError("Redis connection closed")
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:n], self.buffer[n + 2:]
+        return data
+
+    def _reply(self):
+        line = self._line()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n < 0 else self._exact(n)
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._reply() for _ in range(n)]
+        raise RedisError(f"Unexpected reply {line[:20]!r}")
+
+    def _pipeline_locked(self, commands):
+        self.sock.sendall(b"".join(self._encode(c) for c in commands))
+        replies = [self._reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def pipeline(self, commands):
+        with self.lock:
+            for attempt in (0, 1):
+                try:
+                    if self.sock is None:
+                        self._open()
+                    return self._pipeline_locked(commands)
+                except (OSError, ConnectionError):
+                    # Reconnect once, e.g. after the server closed an idle connection
+                    if self.sock is not None:
+                        self.sock.close()
+                    self.sock = None
+                    if attempt:
+                        raise
+
+    def _key(self, sid):
+        return f"cf50:session:{sid}"
+
+    def get(self, sid, keys):
+        (values,) = self.pipeline([["HMGET", self._key(sid), *keys]])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def put(self, sid, values, deleted=()):
+        key = self._key(sid)
+        commands = []
+        if values:
+            commands.append(["HSET", key, *(part for item in values.items() for part in item)])
+        if deleted:
+            commands.append(["HDEL", key, *deleted])
+        commands.append(["EXPIRE", key, self.ttl])
+        self.pipeline(commands)
+
+    def drop(self, sid):
+        self.pipeline([["DEL", self._key(sid)]])
+
+
+def backend_from_url(url=STORE_URL):
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "memory") and parsed.path in ("", "memory"):
+        return MemoryBackend()
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(parsed.path or "sessions.sqlite3")
+    if parsed.scheme == "redis":
+        return RedisBackend(parsed.hostname or "localhost", parsed.port or 6379,
+                            int(parsed.path.strip("/") or 0), parsed.password)
+    raise ValueError(f"Unsupported CF50_SESSION_STORE {url!r}, expected memory, sqlite:///path or redis://host:port/db")
+
+
+class SessionSync:
+    """Mirrors the persisted keys of one session's ``st.session_state`` to a backend."""
+
+    DIGESTS = "_store_digests"
+    CLAIMED = "_store_claimed"
+
+    def __init__(self, backend, sid, state, secret=None):
+        self.backend = backend
+        self.sid = sid
+        self.state = state
+        self.owner = hashlib.blake2b((secret or "").encode(), digest_size=16).digest()
+        if self.DIGESTS not in state:
+            state[self.DIGESTS] = {}
+
+    def owned(self):
+        """Whether this browser may use the session: it created it, or the id is new.
+
+        A new id is claimed for this browser's secret on the spot. Checked once per
+        session; later reruns skip the store.
+        """
+        if self.state.get(self.CLAIMED) == self.sid:
+            return True
+        stored = self.backend.get(self.sid, [OWNER]).get(OWNER)
+        if stored is not None and stored != self.owner:
+            return False
+        if stored is None:
+            self.backend.put(self.sid, {OWNER: self.owner})
+        self.state[self.CLAIMED] = self.sid
+        return True
+
+    def load(self, keys):
+        """Fill in the keys this process doesn't hold yet; returns the keys restored."""
+        missing = [key for key in keys if key not in self.state]
+        if not missing:
+            return []
+        found = self.backend.get(self.sid, missing)
+        digests = self.state[self.DIGESTS]
+        for key, blob in found.items():
+            self.state[key] = pickle.loads(blob)
+            digests[key] = hashlib.blake2b(blob, digest_size=16).digest()
+        return list(found)
+
+    def load_page(self):
+        """Restore the page, then only the keys that page reads."""
+        self.load(["page"])
+        return self.load(PAGE_KEYS.get(self.state.get("page"), []))
+
+    def flush(self):
+        """Write back every persisted key that changed since it was loaded or last written."""
+        digests = self.state[self.DIGESTS]
+        changed, deleted = {}, []
+        for key in PERSISTED:
+            if key in self.state:
+                blob = pickle.dumps(self.state[key], protocol=pickle.HIGHEST_PROTOCOL)
+                digest = hashlib.blake2b(blob, digest_size=16).digest()
+                if digests.get(key) != digest:
+                    changed[key] = blob
+                    digests[key] = digest
+            elif digests.pop(key, None) is not None:
+                deleted.append(key)
+        if changed or deleted:
+            self.backend.put(self.sid, changed, deleted)
+        return len(changed) + len(deleted)
@@ -0,0 +1,229 @@
+"""Compact, versioned encoding of a full form submission for shareable result URLs.
+
+A token is the base64url (unpadded) form of::
+
+    byte 0   format version (low 7 bits); high bit set if the rest is zlib-compressed
+    B        role index
+    B * k    activity hours x 2, in the role's activity order
+    B B B    email (no attachments), email (attachments) and cloud bucket indices; 0xFF
+             instead of an index is followed by a measured amount, I in hundredths
+    B B B    Wi-Fi hours x 2, printed pages per day, idle option index
+    B * m    queries per day for each AI task; 0xFF is followed by a measured count as above
+    varint   number of devices, then per device: B device, B lifespan x 2,
+             B flags (used | shared << 1 | end-of-life << 2)
+    varint   number of fleet devices, then the fleet column-wise: B device codes,
+             H lifespans in hundredths of a year, B flags
+
+The form's widgets bound every value, so one byte each is enough; a typical
+submission is 30-60 characters.
+"""
+import base64
+import struct
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+import engine
+from factors import load as load_factors
+
+VERSION = 1
+_COMPRESSED = 0x80
+_MEASURED = 0xFF
+MAX_QUERIES = 100  # whole counts up to the form's limit take one byte, anything else the measured form
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def _index(options, value):
+    try:
+        return options.index(value)
+    except ValueError:
+        raise ValueError(f"Cannot share {value!r}, expected one of {options}") from None
+
+
+def _amount(options, value):
+    # Bucket label, or a measured count/size (mail_scan.py) after the _MEASURED marker
+    if isinstance(value, str):
+        return bytes([_index(options, value)])
+    return bytes([_MEASURED]) + struct.pack("<I", int(round(float(value) * 100)))
+
+
+def _count(value):
+    # Whole queries per day, or a measured average (ai_history.py) after the _MEASURED marker
+    value = float(value)
+    if value.is_integer() and 0 <= value <= MAX_QUERIES:
+        return bytes([int(value)])
+    return bytes([_MEASURED]) + struct.pack("<I", int(round(value * 100)))
+
+
+def _half(value):
+    return int(round(float(value) * 2))
+
+
+def _byte(value, name, limit, low=0):
+    # The bounds decode() enforces, so encode never writes a token it can't read back
+    if not low <= value < limit:
+        raise ValueError(f"Cannot share {name}: the answer is out of range")
+    return value
+
+
+def encode(inputs):
+    """Token for a submission in the layout of ``st.session_state.inputs``."""
+    role = inputs["role"]
+    out = bytearray([engine.ROLES.index(role)])
+    out += bytes(_byte(_half(inputs["activities"].get(act, 0)), act, 17) for act in engine.activity_factors[role])
+    out += _amount(engine.EMAIL_BUCKETS, inputs["email_plain"]) + _amount(engine.EMAIL_BUCKETS, inputs["email_attach"])
+    out += _amount(engine.CLOUD_BUCKETS, inputs["cloud"])
+    out += bytes([_byte(_half(inputs["wifi"]), "wifi", 17), _byte(int(inputs["pages"]), "pages", 101),
+                  _index(engine.idle_options, inputs["idle"])])
+    out += b"".join(_count(inputs["ai"].get(task, 0)) for task in engine.AI_TASKS)
+
+    devices = inputs["devices"]
+    out += _varint(len(devices))
+    for d in devices:
+        flags = (_index(engine.used_options, d["used"]) | _index(engine.shared_options, d["shared"]) << 1
+                 | _index(engine.EOL_OPTIONS, d["eol"]) << 2)
+        out += bytes([_index(engine.DEVICES, d["device"]), _byte(_half(d["years"]), "lifespan", 256, 1), flags])
+
+    fleet = inputs.get("fleet")
+    n_fleet = len(fleet) if fleet is not None else 0
+    out += _varint(n_fleet)
+    if n_fleet:
+        out += fleet.device.astype(np.uint8).tobytes()
+        hundredths = np.round(fleet.years * 100)
+        if not ((hundredths >= 1) & (hundredths < 1 << 16)).all():
+            raise ValueError("Cannot share a fleet lifespan outside 0.01-655.35 years")
+        out += hundredths.astype("<u2").tobytes()
+        out += (fleet.used | fleet.shared << 1 | fleet.eol << 2).astype(np.uint8).tobytes()
+
+    header = VERSION
+    packed = zlib.compress(bytes(out), 9)
+    if len(packed) < len(out):
+        out, header = packed, VERSION | _COMPRESSED
+    return base64.urlsafe_b64encode(bytes([header]) + bytes(out)).rstrip(b"=").decode("ascii")
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data, self.pos = data, 0
+
+    def take(self, n):
+        if self.pos + n > len(self.data):
+            raise ValueError("Share token is truncated")
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return chunk
+
+    def byte(self, limit=256):
+        value = self.take(1)[0]
+        if value >= limit:
+            raise ValueError("Share token holds an out-of-range answer")
+        return value
+
+    def varint(self):
+        n = shift = 0
+        while True:
+            byte = self.byte()
+            n |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return n
+            shift += 7
+
+
+def _option(options, reader):
+    return options[reader.byte(len(options))]
+
+
+def _measured_of(reader):
+    # Amount after a _MEASURED marker, or None without consuming anything
+    if reader.data[reader.pos:reader.pos + 1] != bytes([_MEASURED]):
+        return None
+    reader.take(1)
+    return struct.unpack("<I", reader.take(4))[0] / 100
+
+
+def _amount_of(options, reader):
+    value = _measured_of(reader)
+    return _option(options, reader) if value is None else value
+
+
+def _count_of(reader):
+    value = _measured_of(reader)
+    return reader.byte(MAX_QUERIES + 1) if value is None else value
+
+
+def decode(token):
+    """Inverse of ``encode``; raises ValueError for anything that isn't a valid token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        raise ValueError("Share token is not base64url") from None
+    if not raw or raw[0] & ~_COMPRESSED != VERSION:
+        raise ValueError("Unsupported share token version")
+    body = raw[1:]
+    if raw[0] & _COMPRESSED:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error:
+            raise ValueError("Share token is corrupted") from None
+    r = _Reader(body)
+
+    role = _option(engine.ROLES, r)
+    inputs = {
+        "role": role,
+        "activities": {act: r.byte(17) / 2 for act in engine.activity_factors[role]},
+        "email_plain": _amount_of(engine.EMAIL_BUCKETS, r),
+        "email_attach": _amount_of(engine.EMAIL_BUCKETS, r),
+        "cloud": _amount_of(engine.CLOUD_BUCKETS, r),
+        "wifi": r.byte(17) / 2,
+        "pages": r.byte(101),
+        "idle": _option(engine.idle_options, r),
+        "ai": {task: _count_of(r) for task in engine.AI_TASKS}
+    }
+
+    devices = []
+    for _ in range(r.varint()):
+        device, half_years, flags = _option(engine.DEVICES, r), r.byte(), r.byte()
+        if not half_years or flags >> 2 >= len(engine.EOL_OPTIONS):
+            raise ValueError("Share token holds an out-of-range answer")
+        devices.append({"device": device, "years": half_years / 2, "used": engine.used_options[flags & 1],
+                        "shared": engine.shared_options[flags >> 1 & 1], "eol": engine.EOL_OPTIONS[flags >> 2]})
+    inputs["devices"] = devices
+
+    inputs["fleet"] = None
+    n_fleet = r.varint()
+    if n_fleet:
+        # Only shared fleet links need pandas, through fleet.py
+        from fleet import Fleet
+        device = np.frombuffer(r.take(n_fleet), dtype=np.uint8)
+        years = np.frombuffer(r.take(2 * n_fleet), dtype="<u2") / 100
+        flags = np.frombuffer(r.take(n_fleet), dtype=np.uint8)
+        if (device >= len(engine.DEVICES)).any() or (flags >> 2 >= len(engine.EOL_OPTIONS)).any() or (years <= 0).any():
+            raise ValueError("Share token holds an out-of-range answer")
+        inputs["fleet"] = Fleet(device, years, flags & 1, flags >> 1 & 1, flags >> 2)
+
+    if r.pos != len(body):
+        raise ValueError("Share token has trailing data")
+    return inputs
+
+
+def results_from_token(token, factors=None):
+    """Decoded inputs and results for a token, scored with ``factors`` (default: the active
+    version). Cached per token and version, so identical URLs are served without decoding
+    or scoring again. Both are shared between sessions: treat as read-only."""
+    return _scored(token, (factors or engine.active_factors()).version)
+
+
+@lru_cache(maxsize=4096)
+def _scored(token, version):
+    inputs = decode(token)
+    res = engine.score(*engine.batch_of_one(inputs), factors=load_factors(version))
+    return inputs, {cat: float(res[cat][0]) for cat in engine.CATEGORIES}
@@ -0,0 +1,136 @@
+from functools import lru_cache
+
+import numpy as np
+
+import engine
+from engine import CATEGORIES
+
+# Every emission factor gets a lognormal multiplier with median 1, so P50 stays close to
+# the point estimate. Sigmas are the spread assumed for each group of factors.
+SIGMA = {
+    "device": 0.25,      # device_ef production footprints
+    "eol": 0.35,         # eol_modifier credits and penalties
+    "activity": 0.30,    # activity_factors (kWh x grid CO₂ per hour)
+    "email": 0.50,
+    "cloud": 0.50,
+    "wifi": 0.30,
+    "print": 0.20,
+    "idle": 0.30,
+    "ai": 0.60           # ai_factors per-query kWh x CO₂
+}
+
+PERCENTILES = [5, 50, 95]
+
+# Columns of the factor sample matrix, each tagged with the category it feeds
+_n_dev, _n_eol = len(engine.DEVICES), len(engine.EOL_OPTIONS)
+FACTORS = ([("Devices", ("device", d)) for d in range(_n_dev)]
+           + [("E-Waste", ("pair", d, e)) for d in range(_n_dev) for e in range(_n_eol)]
+           + [("Digital Activities", ("activity", j)) for j in range(len(engine.ACTIVITIES))]
+           + [("Digital Activities", ("email", 0)), ("Digital Activities", ("email", 1))]
+           + [("Digital Activities", (name,)) for name in ["cloud", "wifi", "print", "idle"]]
+           + [("AI Tools", ("ai", j)) for j in range(len(engine.AI_TASKS))])
+CATEGORY_OF = np.array([CATEGORIES.index(cat) for cat, _ in FACTORS])
+# Underlying random factors; an E-Waste pair is the product of a device and an EoL factor
+BASE_INDEX = {key: i for i, key in enumerate([("device", d) for d in range(_n_dev)]
+                                              + [("eol", e) for e in range(_n_eol)]
+                                              + [key for _, key in FACTORS if key[0] not in ("device", "pair")])}
+
+
+def coefficients(respondents, devices=None, factors=None):
+    """Per-respondent linear coefficients on each factor multiplier (n x len(FACTORS)).
+
+    With every multiplier at 1 the row sums per category reproduce ``engine.score`` with
+    the same ``factors`` (default: the active version).
+    """
+    f = factors or engine.active_factors()
+    n = len(respondents["role"])
+    coef = np.zeros((n, len(FACTORS)))
+
+    if devices is not None and len(devices["device"]):
+        prod, eol = engine.device_impacts(devices["device"], devices["years"], devices["used"],
+                                          devices["shared"], devices["eol"], f)
+        owner = np.asarray(devices["respondent"], dtype=np.intp)
+        dev = engine.encode(devices["device"], engine.DEVICES)
+        pair = dev * _n_eol + engine.encode(devices["eol"], engine.EOL_OPTIONS)
+        coef[:, :_n_dev] = np.bincount(owner * _n_dev + dev, weights=prod, minlength=n * _n_dev).reshape(n, _n_dev)
+        coef[:, _n_dev:_n_dev * (1 + _n_eol)] = np.bincount(owner * _n_dev * _n_eol + pair, weights=eol,
+                                                            minlength=n * _n_dev * _n_eol).reshape(n, -1)
+    col = _n_dev * (1 + _n_eol)
+
+    role = engine.encode(respondents["role"], engine.ROLES)
+    for j, act in enumerate(engine.ACTIVITIES):
+        if act in respondents:
+            coef[:, col + j] = np.asarray(respondents[act], dtype=float) * f.ACTIVITY_EF[role, j] * f.DAYS
+    col += len(engine.ACTIVITIES)
+
+    coef[:, col] = engine._bucket(respondents["email_plain"], engine.EMAIL_BUCKETS, f.EMAIL_COUNT) * f.EMAIL_PLAIN_KG * f.DAYS
+    coef[:, col + 1] = engine._bucket(respondents["email_attach"], engine.EMAIL_BUCKETS, f.EMAIL_COUNT) * f.EMAIL_ATTACH_KG * f.DAYS
+    coef[:, col + 2] = engine._bucket(respondents["cloud"], engine.CLOUD_BUCKETS, f.CLOUD_COUNT) * f.CLOUD_KG_PER_GB
+    coef[:, col + 3] = engine._column(respondents, "wifi", n) * f.WIFI_KG_PER_HOUR * f.DAYS
+    coef[:, col + 4] = engine._column(respondents, "pages", n) * f.PRINT_KG_PER_PAGE * f.DAYS
+    coef[:, col + 5] = f.DAYS * f.IDLE_KWH[engine.encode(respondents["idle"], engine.idle_options)]
+    col += 6
+
+    for j, task in enumerate(engine.AI_TASKS):
+        if task in respondents:
+            coef[:, col + j] = np.asarray(respondents[task], dtype=float) * f.AI_EF[j] * f.DAYS
+    return coef
+
+
+@lru_cache(maxsize=2)
+def base_draws(n_samples, seed=0):
+    """Lognormal multipliers for every underlying factor (len(BASE_INDEX) x n_samples).
+
+    Drawn once per process and shared read-only by every session, so the results page
+    only pays for the matrix product and the percentiles.
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    draws = np.empty((len(BASE_INDEX), n_samples), dtype=np.float32)
+    for key, i in BASE_INDEX.items():
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(i,)))
+        rng.standard_normal(n_samples, dtype=np.float32, out=draws[i])
+        draws[i] *= SIGMA[key[0]]
+    np.exp(draws, out=draws)
+    draws.flags.writeable = False
+    return draws
+
+
+def sample_factors(n_samples, columns, seed=0):
+    """Multiplier samples (len(columns) x n_samples) for the given FACTORS columns, as float32."""
+    base = base_draws(n_samples, seed)
+    out = np.empty((len(columns), n_samples), dtype=np.float32)
+    for i, c in enumerate(columns):
+        key = FACTORS[c][1]
+        if key[0] == "pair":
+            np.multiply(base[BASE_INDEX[("device", key[1])]], base[BASE_INDEX[("eol", key[2])]], out=out[i])
+        else:
+            out[i] = base[BASE_INDEX[key]]
+    return out
+
+
+def bands(coef, n_samples=100_000, seed=0, chunk=64):
+    """P5/P50/P95 per category for each row of ``coef``, shape (n, 4, 3).
+
+    The same factor draws are used for every respondent: factor uncertainty is
+    systematic, so bands of different respondents stay comparable.
+    """
+    columns = np.flatnonzero(np.any(coef != 0, axis=0))
+    samples = sample_factors(n_samples, columns, seed)
+    out = np.zeros((len(coef), len(CATEGORIES), len(PERCENTILES)))
+    for k in range(len(CATEGORIES)):
+        in_cat = CATEGORY_OF[columns] == k
+        if not in_cat.any():
+            continue
+        cat_samples = samples[in_cat]
+        cat_coef = coef[:, columns[in_cat]].astype(np.float32)
+        for start in range(0, len(coef), chunk):
+            totals = cat_coef[start:start + chunk] @ cat_samples
+            out[start:start + chunk, k] = np.percentile(totals, PERCENTILES, axis=1).T
+    return out
+
+
+def bands_one(inputs, n_samples=100_000, seed=0, factors=None):
+    """Uncertainty bands for a single form submission: {category: (p5, p50, p95)}."""
+    res = bands(coefficients(*engine.batch_of_one(inputs), factors), n_samples, seed)[0]
+    return {cat: tuple(float(v) for v in res[k]) for k, cat in enumerate(CATEGORIES)}
+
@@ -0,0 +1,51 @@
+"""Every condition/ownership/end-of-life combination for many devices in one NumPy pass."""
+import numpy as np
+
+import engine
+from engine import DEVICES, EOL_OPTIONS, encode, shared_options, used_options
+
+EXTRA_YEARS = np.array([0.0, 1.0, 2.0, 3.0])
+
+
+def grid(device, years, extra_years=EXTRA_YEARS):
+    """kg CO₂e/year of each device for every option combination and lifespan ``years + extra``.
+
+    Shape ``(n_devices, 2, 2, len(EOL_OPTIONS), len(extra_years))``.
+    """
+    # Production plus end-of-life per kg of embodied impact and year of lifespan, indexed
+    # [used, shared, eol]; multiplying by impact / years gives what device_impacts adds up
+    factors = (1.0 + engine.EOL_MOD)[None, None, :] / engine.LIFESPAN_MULT[:, :, None]
+    impact = engine.DEVICE_EF[encode(device, DEVICES)]
+    lifespans = np.asarray(years, dtype=float)[:, None] + np.asarray(extra_years, dtype=float)
+    return impact[:, None, None, None, None] * factors[None, :, :, :, None] / lifespans[:, None, None, None, :]
+
+
+def best_options(device, years, used, shared, eol, extra_years=EXTRA_YEARS, free=("used", "shared", "eol")):
+    """Current yearly impact of each device and the best combination at each extra lifespan.
+
+    Only the choices named in ``free`` may differ from the current ones. Returns
+    ``current`` (n,), and ``best``, ``saving``, ``used``, ``shared`` and ``eol`` (option
+    codes of the best combination), each of shape ``(n, len(extra_years))``.
+    """
+    values = grid(device, years, extra_years)
+    n = len(values)
+    codes = {"used": encode(used, used_options), "shared": encode(shared, shared_options), "eol": encode(eol, EOL_OPTIONS)}
+    current = values[np.arange(n), codes["used"], codes["shared"], codes["eol"], 0]
+    for axis, name in enumerate(codes, start=1):
+        if name not in free:
+            shape = [1] * values.ndim
+            shape[axis] = values.shape[axis]
+            other = np.arange(values.shape[axis]).reshape(shape) != codes[name].reshape(-1, 1, 1, 1, 1)
+            values = np.where(other, np.inf, values)
+    flat = values.reshape(n, -1, values.shape[-1])
+    choice = flat.argmin(axis=1)
+    best_used, best_shared, best_eol = np.unravel_index(choice, values.shape[1:4])
+    best = np.take_along_axis(flat, choice[:, None, :], axis=1)[:, 0]
+    return {
+        "current": current,
+        "best": best,
+        "saving": current[:, None] - best,
+        "used": best_used,
+        "shared": best_shared,
+        "eol": best_eol
+    }